@@ -1,25 +1,69 @@
 from django.contrib import admin
+from django.db import transaction
+
+from . import regions
 from .models import (
+	ArchivedPickupOrder,
+	ArchivedScrapListing,
 	Bid,
 	BuyerProfile,
+	ChangeLogEntry,
+	GeocodeCache,
+	ListingFeedEntry,
+	NotificationOutbox,
 	PickupOrder,
 	ScrapCategory,
 	ScrapListing,
 	SellerProfile,
+	SellerSalesDaily,
+	SellerSalesMonthly,
 )
+from .notifications import notify_listing_status_change
+
+
+class RegionAdminMixin:
+	"""
+	For models stored per region: lists the rows of the region selected in
+	the session (see home.middleware.RegionMiddleware) and shows every
+	region's row count with a link to switch to it.
+	"""
+
+	change_list_template = "admin/home/region_change_list.html"
+
+	def changelist_view(self, request, extra_context=None):
+		counts = regions.fan_out(self.model._default_manager.count)
+		extra_context = {
+			**(extra_context or {}),
+			"region_counts": list(counts.items()),
+			"current_region": getattr(request, "region", regions.default_region()),
+		}
+		return super().changelist_view(request, extra_context=extra_context)
+
+
+class ChangeLoggedAdminMixin:
+	"""
+	"Delete selected" deletes row by row through delete_model, like the
+	delete view, in one transaction; each row and its cascade are change
+	logged (home.signals.log_deletion).
+	"""
+
+	def delete_queryset(self, request, queryset):
+		with transaction.atomic(using=queryset.db):
+			for obj in queryset:
+				self.delete_model(request, obj)
 
 
 @admin.register(BuyerProfile)
 class BuyerProfileAdmin(admin.ModelAdmin):
-	list_display = ("business_name", "user", "created_at")
-	list_filter = ("created_at",)
+	list_display = ("business_name", "user", "region", "created_at")
+	list_filter = ("region", "created_at")
 	search_fields = ("business_name", "user__username", "user__email")
 
 
 @admin.register(SellerProfile)
 class SellerProfileAdmin(admin.ModelAdmin):
-	list_display = ("business_name", "user", "pickup_address", "created_at")
-	list_filter = ("created_at",)
+	list_display = ("business_name", "user", "pickup_address", "region", "created_at")
+	list_filter = ("region", "created_at")
 	search_fields = ("business_name", "user__username", "user__email")
 
 
@@ -30,7 +74,7 @@ class ScrapCategoryAdmin(admin.ModelAdmin):
 
 
 @admin.register(ScrapListing)
-class ScrapListingAdmin(admin.ModelAdmin):
+class ScrapListingAdmin(ChangeLoggedAdminMixin, RegionAdminMixin, admin.ModelAdmin):
 	list_display = (
 		"id",
 		"seller",
@@ -40,14 +84,20 @@ class ScrapListingAdmin(admin.ModelAdmin):
 		"price_per_kg",
 		"location",
 		"status",
+		"region",
 		"created_at",
 	)
 	list_filter = ("status", "category", "created_at")
 	search_fields = ("seller__business_name", "category__name", "description", "location")
 
+	def save_model(self, request, obj, form, change):
+		super().save_model(request, obj, form, change)
+		if change and "status" in form.changed_data:
+			notify_listing_status_change(obj, form.initial.get("status"))
+
 
 @admin.register(Bid)
-class BidAdmin(admin.ModelAdmin):
+class BidAdmin(ChangeLoggedAdminMixin, RegionAdminMixin, admin.ModelAdmin):
 	list_display = (
 		"listing",
 		"buyer",
@@ -61,7 +111,7 @@ class BidAdmin(admin.ModelAdmin):
 
 
 @admin.register(PickupOrder)
-class PickupOrderAdmin(admin.ModelAdmin):
+class PickupOrderAdmin(ChangeLoggedAdminMixin, RegionAdminMixin, admin.ModelAdmin):
 	list_display = (
 		"id",
 		"listing",
@@ -77,3 +127,70 @@ class PickupOrderAdmin(admin.ModelAdmin):
 		"buyer__business_name",
 		"seller__business_name",
 	)
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(RegionAdminMixin, admin.ModelAdmin):
+	list_display = ("id", "recipient", "event", "created_at", "dispatched_at")
+	list_filter = ("event", "dispatched_at")
+	search_fields = ("recipient__username", "recipient__email")
+
+
+class ReadOnlyModelAdmin(admin.ModelAdmin):
+	def has_add_permission(self, request):
+		return False
+
+	def has_change_permission(self, request, obj=None):
+		return False
+
+
+@admin.register(ArchivedScrapListing)
+class ArchivedScrapListingAdmin(RegionAdminMixin, ReadOnlyModelAdmin):
+	list_display = ("id", "seller", "category", "quantity_kg", "price_per_kg", "status", "created_at", "archived_at")
+	list_filter = ("status", "category")
+	search_fields = ("seller__business_name", "category__name", "description", "location")
+
+
+@admin.register(ArchivedPickupOrder)
+class ArchivedPickupOrderAdmin(RegionAdminMixin, ReadOnlyModelAdmin):
+	list_display = ("id", "listing_id", "buyer", "seller", "status", "total_amount", "created_at", "archived_at")
+	list_filter = ("status",)
+	search_fields = ("buyer__business_name", "seller__business_name")
+
+
+@admin.register(ListingFeedEntry)
+class ListingFeedEntryAdmin(RegionAdminMixin, ReadOnlyModelAdmin):
+	list_display = ("listing_id", "seller_name", "category_name", "price_per_kg", "quantity_kg", "listed_at", "refreshed_at")
+	search_fields = ("seller_name", "category_name", "description", "location")
+
+
+@admin.register(SellerSalesDaily)
+class SellerSalesDailyAdmin(RegionAdminMixin, ReadOnlyModelAdmin):
+	list_display = ("day", "seller", "category", "orders_count", "quantity_kg", "revenue", "average_price_per_kg")
+	list_filter = ("category", "day")
+	search_fields = ("seller__business_name",)
+
+
+@admin.register(SellerSalesMonthly)
+class SellerSalesMonthlyAdmin(RegionAdminMixin, ReadOnlyModelAdmin):
+	list_display = ("month", "seller", "category", "orders_count", "quantity_kg", "revenue", "average_price_per_kg")
+	list_filter = ("category", "month")
+	search_fields = ("seller__business_name",)
+
+
+@admin.register(GeocodeCache)
+class GeocodeCacheAdmin(ReadOnlyModelAdmin):
+	list_display = ("address", "place", "latitude", "longitude", "resolved_at")
+	search_fields = ("address", "place")
+
+
+@admin.register(ChangeLogEntry)
+class ChangeLogEntryAdmin(RegionAdminMixin, ReadOnlyModelAdmin):
+	list_display = ("id", "model", "object_id", "action", "created_at")
+	list_filter = ("model", "action")
+	search_fields = ("object_id",)
+
+	# Unlike the feed, rollup and archive rows, nothing cascades into the
+	# log, so it can stay append-only without blocking listing deletes.
+	def has_delete_permission(self, request, obj=None):
+		return False
@@ -0,0 +1,114 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from . import regions
+from .models import ArchivedPickupOrder, ArchivedScrapListing, PickupOrder, ScrapListing
+
+COLD_LISTING_STATUSES = (ScrapListing.Status.SOLD, ScrapListing.Status.INACTIVE)
+COLD_ORDER_STATUSES = (PickupOrder.Status.COMPLETED, PickupOrder.Status.CANCELLED)
+
+
+def archive_cutoff(days=None):
+    days = settings.ARCHIVE_AFTER_DAYS if days is None else days
+    return timezone.now() - timedelta(days=days)
+
+
+def _cold_orders(cutoff):
+    return PickupOrder.objects.filter(status__in=COLD_ORDER_STATUSES, updated_at__lt=cutoff)
+
+
+def _cold_listings(cutoff):
+    # A listing can only move once no hot order points at it (PROTECT FK),
+    # which is why orders are always archived first.
+    return ScrapListing.objects.filter(
+        status__in=COLD_LISTING_STATUSES,
+        updated_at__lt=cutoff,
+    ).exclude(Exists(PickupOrder.objects.filter(listing=OuterRef("pk"))))
+
+
+def _archive_order_chunk(ids, cutoff):
+    with regions.atomic():
+        orders = list(
+            _cold_orders(cutoff).filter(pk__in=ids).select_related("bid", "listing")
+        )
+        ArchivedPickupOrder.objects.bulk_create(
+            [
+                ArchivedPickupOrder(
+                    id=order.pk,
+                    listing_id=order.listing_id,
+                    bid_id=order.bid_id,
+                    buyer_id=order.buyer_id,
+                    seller_id=order.seller_id,
+                    category_id=order.listing.category_id,
+                    quantity_kg=order.bid.quantity_kg,
+                    price_per_kg=order.bid.bid_price_per_kg,
+                    scheduled_pickup_at=order.scheduled_pickup_at,
+                    pickup_address=order.pickup_address,
+                    status=order.status,
+                    total_amount=order.total_amount,
+                    completed_at=order.completed_at,
+                    created_at=order.created_at,
+                    updated_at=order.updated_at,
+                )
+                for order in orders
+            ]
+        )
+        PickupOrder.objects.filter(pk__in=[order.pk for order in orders]).delete()
+    return len(orders)
+
+
+def _archive_listing_chunk(ids, cutoff):
+    with regions.atomic():
+        listings = list(_cold_listings(cutoff).filter(pk__in=ids))
+        ArchivedScrapListing.objects.bulk_create(
+            [
+                ArchivedScrapListing(
+                    id=listing.pk,
+                    seller_id=listing.seller_id,
+                    category_id=listing.category_id,
+                    description=listing.description,
+                    quantity_kg=listing.quantity_kg,
+                    price_per_kg=listing.price_per_kg,
+                    location=listing.location,
+                    status=listing.status,
+                    created_at=listing.created_at,
+                    updated_at=listing.updated_at,
+                )
+                for listing in listings
+            ]
+        )
+        # Bids and photos of the listing go with it (CASCADE); the accepted
+        # bid's quantity and price already live on the archived order.
+        ScrapListing.objects.filter(pk__in=[listing.pk for listing in listings]).delete()
+    return len(listings)
+
+
+def _run_in_chunks(queryset, archive_chunk, cutoff, chunk_size, pause):
+    archived = 0
+    last_pk = 0
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)[:chunk_size]
+        )
+        if not ids:
+            return archived
+        archived += archive_chunk(ids, cutoff)
+        last_pk = ids[-1]
+        if pause:
+            time.sleep(pause)
+
+
+def archive_cold_rows(days=None, chunk_size=500, pause=0.0):
+    """
+    Move old COMPLETED/CANCELLED orders and then old SOLD/INACTIVE listings
+    into the archive tables, one short transaction per chunk.
+    Returns (orders_archived, listings_archived).
+    """
+    cutoff = archive_cutoff(days)
+    orders = _run_in_chunks(_cold_orders(cutoff), _archive_order_chunk, cutoff, chunk_size, pause)
+    listings = _run_in_chunks(_cold_listings(cutoff), _archive_listing_chunk, cutoff, chunk_size, pause)
+    return orders, listings
@@ -0,0 +1,145 @@
+"""
+Competitive bidding for listings in auction mode.
+
+The current leader lives on the listing row itself (top_bid_price,
+top_bidder). A bid is accepted by a single conditional UPDATE that only
+matches while the offer beats the stored top bid, so concurrent bidders
+never read, compare and write back the leader themselves.
+"""
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import changelog, feed, regions
+from .models import Bid, ChangeLogEntry, ListingFeedEntry, PickupOrder, ScrapListing
+from .notifications import notify_listing_booked, notify_listing_status_change
+
+
+class BidRejected(Exception):
+    pass
+
+
+def open_auctions(now=None):
+    return ScrapListing.objects.filter(
+        sale_mode=ScrapListing.SaleMode.AUCTION,
+        status=ScrapListing.Status.AVAILABLE,
+        auction_ends_at__gt=now or timezone.now(),
+    )
+
+
+def place_bid(listing, buyer_profile, price_per_kg):
+    """Record a bid if it beats the current top bid; raises BidRejected otherwise."""
+    now = timezone.now()
+    with regions.atomic():
+        beats_top_bid = Q(top_bid_price__lt=price_per_kg) | Q(
+            top_bid_price__isnull=True,
+            price_per_kg__lte=price_per_kg,
+        )
+        won = open_auctions(now).filter(beats_top_bid, pk=listing.pk).update(
+            top_bid_price=price_per_kg,
+            top_bidder=buyer_profile,
+            bid_count=F("bid_count") + 1,
+            updated_at=now,
+        )
+        if not won:
+            raise BidRejected("Your bid must beat the current top bid of an open auction.")
+
+        # One row per buyer and listing; re-bidding raises the buyer's own bid.
+        Bid.objects.bulk_create(
+            [
+                Bid(
+                    listing_id=listing.pk,
+                    buyer=buyer_profile,
+                    quantity_kg=listing.remaining_kg,
+                    bid_price_per_kg=price_per_kg,
+                    status=Bid.Status.PENDING,
+                    message="Auction bid from buyer dashboard.",
+                )
+            ],
+            update_conflicts=True,
+            unique_fields=["listing", "buyer"],
+            update_fields=["quantity_kg", "bid_price_per_kg", "status", "message", "updated_at"],
+        )
+        changelog.record(ScrapListing.objects.filter(pk=listing.pk))
+        changelog.record(Bid.objects.filter(listing_id=listing.pk, buyer=buyer_profile))
+        ListingFeedEntry.objects.filter(listing_id=listing.pk).update(
+            top_bid_price=price_per_kg,
+            bid_count=F("bid_count") + 1,
+            refreshed_at=now,
+        )
+
+
+def close_due_auctions(batch_size=100, now=None):
+    """
+    Close one batch of auctions whose end time has passed, in one transaction.
+    The leader's bid is accepted and turned into a PickupOrder, other bids are
+    rejected, and auctions without bids become INACTIVE. Returns (won, unsold).
+    """
+    now = now or timezone.now()
+    with regions.atomic():
+        due = list(
+            ScrapListing.objects.filter(
+                sale_mode=ScrapListing.SaleMode.AUCTION,
+                status=ScrapListing.Status.AVAILABLE,
+                auction_ends_at__lte=now,
+            )
+            .select_related("seller__user", "category", "top_bidder")
+            .order_by("auction_ends_at", "pk")[:batch_size]
+        )
+        if not due:
+            return 0, 0
+
+        won = [listing for listing in due if listing.top_bidder_id]
+        unsold = [listing for listing in due if not listing.top_bidder_id]
+
+        # Guard on status so a concurrent closer cannot settle the same auction twice.
+        ScrapListing.objects.filter(
+            pk__in=[listing.pk for listing in won],
+            status=ScrapListing.Status.AVAILABLE,
+        ).update(status=ScrapListing.Status.RESERVED, remaining_kg=0, updated_at=now)
+        ScrapListing.objects.filter(
+            pk__in=[listing.pk for listing in unsold],
+            status=ScrapListing.Status.AVAILABLE,
+        ).update(status=ScrapListing.Status.INACTIVE, updated_at=now)
+
+        leaders = {(listing.pk, listing.top_bidder_id) for listing in won}
+        winning_bids = {
+            bid.listing_id: bid
+            for bid in Bid.objects.filter(listing_id__in=[listing.pk for listing in won])
+            if (bid.listing_id, bid.buyer_id) in leaders
+        }
+        Bid.objects.filter(pk__in=[bid.pk for bid in winning_bids.values()]).update(
+            status=Bid.Status.ACCEPTED,
+            updated_at=now,
+        )
+        Bid.objects.filter(
+            listing_id__in=[listing.pk for listing in due],
+            status=Bid.Status.PENDING,
+        ).update(status=Bid.Status.REJECTED, updated_at=now)
+
+        orders = PickupOrder.objects.bulk_create(
+            [
+                PickupOrder(
+                    listing=listing,
+                    bid=winning_bids[listing.pk],
+                    buyer=listing.top_bidder,
+                    seller=listing.seller,
+                    pickup_address=listing.seller.pickup_address,
+                    status=PickupOrder.Status.PLACED,
+                    total_amount=listing.remaining_kg * winning_bids[listing.pk].bid_price_per_kg,
+                )
+                for listing in won
+            ]
+        )
+        due_ids = [listing.pk for listing in due]
+        changelog.record(ScrapListing.objects.filter(pk__in=due_ids, updated_at=now))
+        changelog.record(Bid.objects.filter(listing_id__in=due_ids, updated_at=now))
+        changelog.record(PickupOrder.objects.filter(pk__in=[order.pk for order in orders]), ChangeLogEntry.Action.CREATED)
+        for order in orders:
+            notify_listing_booked(order)
+        for listing in unsold:
+            listing.status = ScrapListing.Status.INACTIVE
+            notify_listing_status_change(listing, ScrapListing.Status.AVAILABLE)
+        feed.sync_listings([listing.pk for listing in due])
+
+    return len(won), len(unsold)
@@ -0,0 +1,125 @@
+"""
+Helpers shared by the `bench_*` management commands.
+
+Benchmarks run against a throwaway test database so they never touch
+db.sqlite3, and seed a small but realistic marketplace first. That
+database is switched to WAL so readers do not queue behind the writer.
+"""
+
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.utils import timezone
+
+from . import feed
+from .models import BuyerProfile, ScrapCategory, ScrapListing, SellerProfile
+
+BENCH_PASSWORD = "benchpass123"
+
+
+def wal_journal(sender, connection, **kwargs):
+    """connection_created receiver: WAL with NORMAL syncing for SQLite connections."""
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+
+
+@contextmanager
+def benchmark_database(verbosity=0):
+    setup_test_environment()
+    # Connect before the test databases are created so every connection to
+    # them, including the ones opened by setup_databases, gets the pragmas.
+    connection_created.connect(wal_journal)
+    connections.close_all()
+    old_config = setup_databases(verbosity=verbosity, interactive=False, aliases=set(connections))
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=verbosity)
+        connection_created.disconnect(wal_journal)
+        teardown_test_environment()
+
+
+def seed_marketplace(sellers=5, buyers=5, listings_per_seller=20):
+    """Create users, profiles and AVAILABLE listings; returns (sellers, buyers)."""
+    user_model = get_user_model()
+    password = make_password(BENCH_PASSWORD)
+    categories = [
+        ScrapCategory.objects.get_or_create(name=name)[0]
+        for name in ("Paper", "Plastic", "Metal", "Glass", "E-waste")
+    ]
+
+    seller_profiles = []
+    for index in range(sellers):
+        user = user_model.objects.create(
+            username=f"bench-seller-{index}",
+            email=f"bench-seller-{index}@example.com",
+            password=password,
+        )
+        seller_profiles.append(
+            SellerProfile.objects.create(
+                user=user,
+                business_name=f"Bench Seller {index}",
+                phone_number="9000000000",
+                pickup_address=f"Yard {index}, Industrial Area",
+            )
+        )
+
+    buyer_profiles = []
+    for index in range(buyers):
+        user = user_model.objects.create(
+            username=f"bench-buyer-{index}",
+            email=f"bench-buyer-{index}@example.com",
+            password=password,
+        )
+        buyer_profiles.append(
+            BuyerProfile.objects.create(
+                user=user,
+                business_name=f"Bench Buyer {index}",
+                phone_number="8000000000",
+            )
+        )
+
+    ScrapListing.objects.bulk_create(
+        [
+            ScrapListing(
+                seller=seller,
+                category=categories[(seller_index + index) % len(categories)],
+                description=f"Lot {index} of mixed scrap from {seller.business_name}",
+                quantity_kg=Decimal("50.00") + index,
+                remaining_kg=Decimal("50.00") + index,
+                price_per_kg=Decimal("20.00") + seller_index,
+                location=f"Sector {index % 12}",
+                region=seller.region,
+            )
+            for seller_index, seller in enumerate(seller_profiles)
+            for index in range(listings_per_seller)
+        ]
+    )
+    # bulk_create skips the signals that maintain the buyer feed.
+    feed.rebuild()
+    return seller_profiles, buyer_profiles
+
+
+def pickup_time(days=1):
+    return (timezone.now() + timedelta(days=days)).strftime("%Y-%m-%dT%H:%M")
+
+
+def measure(func, iterations):
+    """Run func repeatedly; returns (cpu seconds per call, wall seconds per call, last result)."""
+    result = None
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for _ in range(iterations):
+        result = func()
+    cpu = (time.process_time() - cpu_start) / iterations
+    wall = (time.perf_counter() - wall_start) / iterations
+    return cpu, wall, result
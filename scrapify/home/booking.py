@@ -0,0 +1,244 @@
+"""
+Fixed-price booking of a whole listing or part of it.
+
+The unbooked quantity is claimed with one guarded UPDATE
+(remaining_kg = remaining_kg - x WHERE remaining_kg >= x), so concurrent
+buyers can never oversell a lot; the listing flips to RESERVED only when
+the UPDATE leaves nothing behind.
+
+book_listings() books a whole pickup run at once: one transaction, one
+guarded UPDATE claiming every listing (a CASE per listing id), and one
+bulk statement each for the bids, orders and notifications, so thirty
+listings cost about as many queries as one.
+"""
+
+from collections import namedtuple
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, Value, When
+from django.utils import timezone
+
+from . import changelog, feed, regions
+from .models import Bid, ChangeLogEntry, PickupOrder, ScrapListing
+from .notifications import notify_listing_booked, notify_listings_booked
+
+BOOKING_MESSAGE = "Booked directly from buyer dashboard."
+MIN_QUANTITY_KG = Decimal("0.01")
+BATCH_BOOKING_MESSAGE = "Booked in a batch from the buyer API."
+
+# outcome is "booked", "already_booked" or "rejected"; order is set when booked.
+BookingResult = namedtuple("BookingResult", "listing_id outcome order error")
+
+
+class BookingError(Exception):
+    pass
+
+
+class AlreadyBooked(BookingError):
+    pass
+
+
+def bookable_listings():
+    return ScrapListing.objects.filter(
+        status=ScrapListing.Status.AVAILABLE,
+        sale_mode=ScrapListing.SaleMode.FIXED,
+    )
+
+
+def book_listing(listing, buyer_profile, scheduled_pickup_at, quantity_kg=None):
+    """
+    Book quantity_kg (default: everything left) of a fixed-price listing.
+    Returns the PickupOrder; raises BookingError when it cannot be booked.
+    """
+    if quantity_kg is None:
+        quantity_kg = listing.remaining_kg
+    if not quantity_kg.is_finite() or quantity_kg < MIN_QUANTITY_KG or quantity_kg % MIN_QUANTITY_KG:
+        raise BookingError("Please book a positive quantity in steps of 0.01 kg.")
+
+    now = timezone.now()
+    with regions.atomic():
+        claimed = bookable_listings().filter(pk=listing.pk, remaining_kg__gte=quantity_kg).update(
+            remaining_kg=F("remaining_kg") - quantity_kg,
+            updated_at=now,
+        )
+        # Checked after the UPDATE, which holds the write lock, so two
+        # concurrent submits from one buyer cannot both get past it; raising
+        # rolls the decrement back.
+        existing_booking = PickupOrder.objects.filter(
+            buyer=buyer_profile,
+            listing=listing,
+        ).exclude(status=PickupOrder.Status.CANCELLED).exists()
+        if existing_booking:
+            raise AlreadyBooked("You have already booked this listing.")
+        if not claimed:
+            raise BookingError("Not enough quantity is left on this listing.")
+        bookable_listings().filter(pk=listing.pk, remaining_kg=0).update(
+            status=ScrapListing.Status.RESERVED,
+            updated_at=now,
+        )
+        changelog.record(ScrapListing.objects.filter(pk=listing.pk))
+
+        bid, _ = Bid.objects.select_for_update().get_or_create(
+            listing=listing,
+            buyer=buyer_profile,
+            defaults={
+                "quantity_kg": quantity_kg,
+                "bid_price_per_kg": listing.price_per_kg,
+                "message": BOOKING_MESSAGE,
+                "status": Bid.Status.ACCEPTED,
+            },
+        )
+
+        if bid.status != Bid.Status.ACCEPTED or bid.quantity_kg != quantity_kg:
+            bid.quantity_kg = quantity_kg
+            bid.bid_price_per_kg = listing.price_per_kg
+            bid.status = Bid.Status.ACCEPTED
+            bid.message = BOOKING_MESSAGE
+            bid.save(update_fields=["quantity_kg", "bid_price_per_kg", "status", "message", "updated_at"])
+
+        order, _ = PickupOrder.objects.update_or_create(
+            bid=bid,
+            defaults={
+                "listing": listing,
+                "buyer": buyer_profile,
+                "seller": listing.seller,
+                "scheduled_pickup_at": scheduled_pickup_at,
+                "pickup_address": listing.seller.pickup_address,
+                "status": PickupOrder.Status.CONFIRMED,
+                "total_amount": bid.total_value,
+            },
+        )
+
+        feed.sync_listings([listing.pk])
+        notify_listing_booked(order)
+    return order
+
+
+def _active_order(bid):
+    order = getattr(bid, "order", None)
+    return order if order is not None and order.status != PickupOrder.Status.CANCELLED else None
+
+
+def book_listings(buyer_profile, scheduled_pickup_at, items):
+    """
+    Book several fixed-price listings for one pickup in a single transaction.
+    items is [(listing_id, quantity_kg or None for everything left), ...].
+    Returns a BookingResult per item, in order; bookable items are booked
+    even when others are rejected.
+    """
+    ids = [listing_id for listing_id, _ in items]
+    now = timezone.now()
+    with regions.atomic():
+        listings = (
+            bookable_listings().select_for_update(of=("self",)).select_related("seller__user", "category").in_bulk(ids)
+        )
+        bids = {
+            bid.listing_id: bid
+            for bid in Bid.objects.filter(buyer=buyer_profile, listing_id__in=ids).select_related("order")
+        }
+
+        claims = {}
+        rejections = {}
+        seen = set()
+        for index, (listing_id, quantity_kg) in enumerate(items):
+            listing = listings.get(listing_id)
+            if listing_id in seen:
+                rejections[index] = ("rejected", "This listing appears more than once in the batch.")
+            elif _active_order(bids.get(listing_id)):
+                rejections[index] = ("already_booked", "You have already booked this listing.")
+            elif listing is None:
+                rejections[index] = ("rejected", "This listing is not available for booking.")
+            elif quantity_kg is not None and quantity_kg <= 0:
+                rejections[index] = ("rejected", "Please book a positive quantity.")
+            elif quantity_kg is not None and quantity_kg > listing.remaining_kg:
+                rejections[index] = ("rejected", "Not enough quantity is left on this listing.")
+            else:
+                claims[listing_id] = listing.remaining_kg if quantity_kg is None else quantity_kg
+            seen.add(listing_id)
+
+        orders = {}
+        if claims:
+            claimed = Case(
+                *[When(pk=listing_id, then=Value(quantity_kg)) for listing_id, quantity_kg in claims.items()],
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+            )
+            updated = bookable_listings().filter(pk__in=claims, remaining_kg__gte=claimed).update(
+                remaining_kg=F("remaining_kg") - claimed,
+                status=Case(When(remaining_kg=claimed, then=Value(ScrapListing.Status.RESERVED)), default=F("status")),
+                updated_at=now,
+            )
+            # The rows are locked (on SQLite the write lock is taken at BEGIN),
+            # so every claim lands; the guard only backs that up.
+            if updated != len(claims):
+                raise BookingError("Some listings changed while booking. Please try again.")
+
+            # One row per buyer and listing; a cancelled booking's bid and order are reused.
+            booked_bids = Bid.objects.bulk_create(
+                [
+                    Bid(
+                        listing=listings[listing_id],
+                        buyer=buyer_profile,
+                        quantity_kg=quantity_kg,
+                        bid_price_per_kg=listings[listing_id].price_per_kg,
+                        message=BATCH_BOOKING_MESSAGE,
+                        status=Bid.Status.ACCEPTED,
+                    )
+                    for listing_id, quantity_kg in claims.items()
+                ],
+                update_conflicts=True,
+                unique_fields=["listing", "buyer"],
+                update_fields=["quantity_kg", "bid_price_per_kg", "status", "message", "updated_at"],
+            )
+            booked_orders = PickupOrder.objects.bulk_create(
+                [
+                    PickupOrder(
+                        listing=bid.listing,
+                        bid=bid,
+                        buyer=buyer_profile,
+                        seller=bid.listing.seller,
+                        scheduled_pickup_at=scheduled_pickup_at,
+                        pickup_address=bid.listing.seller.pickup_address,
+                        status=PickupOrder.Status.CONFIRMED,
+                        total_amount=bid.total_value,
+                    )
+                    for bid in booked_bids
+                ],
+                update_conflicts=True,
+                unique_fields=["bid"],
+                update_fields=[
+                    "listing",
+                    "buyer",
+                    "seller",
+                    "scheduled_pickup_at",
+                    "pickup_address",
+                    "status",
+                    "total_amount",
+                    "updated_at",
+                ],
+            )
+            orders = {order.listing_id: order for order in booked_orders}
+
+            reused_bids = [bid.pk for bid in booked_bids if bid.listing_id in bids]
+            reused_orders = [order.pk for order in booked_orders if getattr(bids.get(order.listing_id), "order", None)]
+            changelog.record(ScrapListing.objects.filter(pk__in=claims))
+            changelog.record(Bid.objects.filter(pk__in=reused_bids))
+            changelog.record(
+                Bid.objects.filter(pk__in=[bid.pk for bid in booked_bids]).exclude(pk__in=reused_bids),
+                ChangeLogEntry.Action.CREATED,
+            )
+            changelog.record(PickupOrder.objects.filter(pk__in=reused_orders))
+            changelog.record(
+                PickupOrder.objects.filter(pk__in=[order.pk for order in booked_orders]).exclude(pk__in=reused_orders),
+                ChangeLogEntry.Action.CREATED,
+            )
+            feed.sync_listings(claims)
+            notify_listings_booked(booked_orders)
+
+    results = []
+    for index, (listing_id, _) in enumerate(items):
+        if index in rejections:
+            outcome, error = rejections[index]
+            results.append(BookingResult(listing_id, outcome, None, error))
+        else:
+            results.append(BookingResult(listing_id, "booked", orders[listing_id], None))
+    return results
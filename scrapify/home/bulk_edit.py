@@ -0,0 +1,144 @@
+"""
+Bulk editing of a seller's listings: price, quantity, status and location.
+
+Rows come from the editor formset or from a CSV patch and are validated
+with BulkListingEditForm before anything is written. The changed rows are
+then re-read inside one write transaction (bookings may have landed since
+the page was rendered), saved with one bulk_update statement per batch,
+and the buyer feed is resynced because bulk_update sends no post_save.
+"""
+
+import csv
+import io
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import changelog, duplicates, feed, geocoding, regions
+from .forms import BulkListingEditForm
+from .models import ScrapListing
+
+EDITABLE_FIELDS = ("price_per_kg", "quantity_kg", "status", "location")
+PATCH_COLUMNS = ("id",) + EDITABLE_FIELDS
+
+
+class BulkEditError(Exception):
+    pass
+
+
+def editable_listings(seller_profile):
+    return (
+        ScrapListing.objects.filter(seller=seller_profile)
+        .exclude(status=ScrapListing.Status.SOLD)
+        .select_related("category")
+        .order_by("-created_at", "-id")
+    )
+
+
+def read_patch(uploaded_file):
+    """[(line number, row dict), ...] from a CSV patch upload."""
+    try:
+        text = uploaded_file.read().decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise BulkEditError("The patch must be a UTF-8 CSV file.")
+    reader = csv.DictReader(io.StringIO(text, newline=""))
+    if "id" not in (reader.fieldnames or []):
+        raise BulkEditError("The patch needs an id column.")
+    unknown = sorted(set(reader.fieldnames) - set(PATCH_COLUMNS))
+    if unknown:
+        raise BulkEditError(f"Unknown column(s): {', '.join(unknown)}.")
+    # Line 1 is the header.
+    return list(enumerate(reader, start=2))
+
+
+def patch_forms(seller_profile, rows):
+    """
+    Validate a CSV patch against the seller's listings. Blank cells keep
+    the current value. Returns (forms, errors); errors is a list of
+    (line number, message).
+    """
+    ids = {}
+    errors = []
+    for line_number, row in rows:
+        try:
+            ids[line_number] = int(row["id"])
+        except (TypeError, ValueError):
+            errors.append((line_number, f"id: {row['id']!r} is not a listing id."))
+    listings = editable_listings(seller_profile).in_bulk(set(ids.values()))
+
+    forms, seen = [], set()
+    for line_number, row in rows:
+        listing_id = ids.get(line_number)
+        if listing_id is None:
+            continue
+        listing = listings.get(listing_id)
+        if listing is None:
+            errors.append((line_number, f"id: listing {listing_id} is not one of your editable listings."))
+            continue
+        if listing_id in seen:
+            errors.append((line_number, f"id: listing {listing_id} appears more than once."))
+            continue
+        seen.add(listing_id)
+        data = {field: getattr(listing, field) for field in EDITABLE_FIELDS}
+        data.update({field: value.strip() for field, value in row.items() if field in EDITABLE_FIELDS and value and value.strip()})
+        form = BulkListingEditForm(data, instance=listing)
+        if not form.is_valid():
+            for field, field_errors in form.errors.items():
+                errors.extend((line_number, f"{field}: {error}") for error in field_errors)
+            continue
+        forms.append(form)
+    return forms, errors
+
+
+def apply_forms(forms, batch_size=None):
+    """
+    Write the listings changed by validated BulkListingEditForms. Returns
+    the number of listings updated; raises BulkEditError, writing nothing,
+    when a booking since validation makes a new quantity impossible.
+    """
+    changed = {form.instance.pk: form for form in forms if form.has_changed()}
+    if not changed:
+        return 0
+    # bulk_update sends no pre_save either, so resolve moved listings here,
+    # before the write transaction starts.
+    geocoding.locate([form.instance for form in changed.values() if "location" in form.changed_data], "location")
+    now = timezone.now()
+    with regions.atomic():
+        current = ScrapListing.objects.filter(pk__in=changed).in_bulk()
+        problems = []
+        for listing_id, form in changed.items():
+            listing, fresh = form.instance, current.get(listing_id)
+            if fresh is None:
+                problems.append(f"Listing {listing_id} no longer exists.")
+                continue
+            if "status" not in form.changed_data:
+                listing.status = fresh.status
+            elif fresh.status not in BulkListingEditForm.SELLER_STATUSES:
+                problems.append(f"Listing {listing_id} was {fresh.get_status_display().lower()} in the meantime.")
+                continue
+            if listing.quantity_kg < fresh.booked_kg:
+                problems.append(f"{fresh.booked_kg} kg of listing {listing_id} is booked now.")
+                continue
+            listing.remaining_kg = listing.quantity_kg - fresh.booked_kg
+            # A listing is RESERVED exactly while nothing is left to book.
+            if listing.status == ScrapListing.Status.AVAILABLE and not listing.remaining_kg:
+                listing.status = ScrapListing.Status.RESERVED
+            elif (
+                listing.status == ScrapListing.Status.RESERVED
+                and fresh.sale_mode == ScrapListing.SaleMode.FIXED
+                and listing.remaining_kg
+            ):
+                listing.status = ScrapListing.Status.AVAILABLE
+            # bulk_update skips auto_now; the dashboard etags read updated_at.
+            listing.updated_at = now
+        if problems:
+            raise BulkEditError(" ".join(problems))
+        ScrapListing.objects.bulk_update(
+            [form.instance for form in changed.values()],
+            [*EDITABLE_FIELDS, "remaining_kg", "latitude", "longitude", "updated_at"],
+            batch_size=batch_size or settings.BULK_EDIT_BATCH_SIZE,
+        )
+        changelog.record(ScrapListing.objects.filter(pk__in=changed))
+        feed.sync_listings(changed)
+        duplicates.index_listings(form.instance for form in changed.values() if "location" in form.changed_data)
+    return len(changed)
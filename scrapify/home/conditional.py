@@ -0,0 +1,137 @@
+import hashlib
+import os
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.db.models import Count, Max
+from django.template.loader import get_template
+from django.views.decorators.http import condition
+
+from .models import ListingFeedEntry, PickupOrder, ScrapCategory, ScrapListing
+
+
+def _has_pending_messages(request):
+    # len() loads the stored messages without marking them as consumed.
+    return len(messages.get_messages(request)) > 0
+
+
+def conditional_page(etag_func, last_modified_func=None):
+    """
+    Like django.views.decorators.http.condition, but only for GET/HEAD and
+    only when no flash messages are waiting: a 304 would otherwise hide them.
+    The validators run before the view, so a match skips all rendering.
+    """
+
+    def decorator(view_func):
+        conditional_view = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view_func)
+
+        @wraps(view_func)
+        def _wrapped(request, *args, **kwargs):
+            if request.method in ("GET", "HEAD") and not _has_pending_messages(request):
+                return conditional_view(request, *args, **kwargs)
+            return view_func(request, *args, **kwargs)
+
+        return _wrapped
+
+    return decorator
+
+
+def _viewer_parts(request):
+    # Pages embed the user's nav and CSRF tokens, so both belong in the tag.
+    user = request.user
+    return [
+        str(user.pk) if user.is_authenticated else "anon",
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""),
+    ]
+
+
+def _make_etag(parts):
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+
+def _stamp(aggregate):
+    latest = aggregate["latest"]
+    return f"{latest.timestamp() if latest else 0}:{aggregate['total']}"
+
+
+def _latest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def _template_mtime(template_names):
+    mtimes = [os.stat(get_template(name).origin.name).st_mtime for name in template_names]
+    return datetime.fromtimestamp(max(mtimes), tz=dt_timezone.utc)
+
+
+def static_page(*template_names):
+    """Validators for pages whose content only changes when their templates do."""
+    template_names = template_names + ("base.html",)
+
+    def etag(request, *args, **kwargs):
+        return _make_etag(_viewer_parts(request) + [str(_template_mtime(template_names).timestamp())])
+
+    def last_modified(request, *args, **kwargs):
+        return _template_mtime(template_names)
+
+    return conditional_page(etag, last_modified)
+
+
+def _memoize_on_request(func):
+    # The etag and last-modified callbacks share one set of aggregate queries.
+    attribute = f"_conditional_{func.__name__}"
+
+    @wraps(func)
+    def _wrapped(request):
+        if not hasattr(request, attribute):
+            setattr(request, attribute, func(request))
+        return getattr(request, attribute)
+
+    return _wrapped
+
+
+@_memoize_on_request
+def _buyer_dashboard_state(request):
+    # COUNT(*) rather than COUNT(listing_id): the feed key is not the rowid, so
+    # only COUNT(*) can be answered from the narrow refreshed_at index.
+    listings = ListingFeedEntry.objects.aggregate(latest=Max("refreshed_at"), total=Count("*"))
+    bookings = PickupOrder.objects.filter(buyer=request.user.buyer_profile).aggregate(
+        latest=Max("updated_at"), total=Count("id")
+    )
+    return listings, bookings
+
+
+def buyer_dashboard_etag(request, *args, **kwargs):
+    listings, bookings = _buyer_dashboard_state(request)
+    # The history filters and page cursor live in the query string.
+    parts = ["buyer", request.get_full_path()] + _viewer_parts(request)
+    return _make_etag(parts + [_stamp(listings), _stamp(bookings)])
+
+
+def buyer_dashboard_last_modified(request, *args, **kwargs):
+    listings, bookings = _buyer_dashboard_state(request)
+    return _latest(listings["latest"], bookings["latest"])
+
+
+@_memoize_on_request
+def _seller_dashboard_state(request):
+    seller_profile = request.user.seller_profile
+    listings = ScrapListing.objects.filter(seller=seller_profile).aggregate(
+        latest=Max("updated_at"), total=Count("id")
+    )
+    bookings = PickupOrder.objects.filter(seller=seller_profile).aggregate(
+        latest=Max("updated_at"), total=Count("id")
+    )
+    categories = ScrapCategory.objects.aggregate(latest=Max("updated_at"), total=Count("id"))
+    return listings, bookings, categories
+
+
+def seller_dashboard_etag(request, *args, **kwargs):
+    states = _seller_dashboard_state(request)
+    return _make_etag(["seller"] + _viewer_parts(request) + [_stamp(state) for state in states])
+
+
+def seller_dashboard_last_modified(request, *args, **kwargs):
+    return _latest(*(state["latest"] for state in _seller_dashboard_state(request)))
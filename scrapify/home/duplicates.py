@@ -0,0 +1,155 @@
+"""
+Near-duplicate listing detection with MinHash and locality-sensitive hashing.
+
+A listing's description and location are normalized and cut into
+character shingles; SIGNATURE_SIZE minimum hashes of those shingles form
+its signature (ListingFingerprint), and the share of equal positions in
+two signatures estimates the Jaccard similarity of their shingle sets.
+The signature is split into LSH_BANDS bands, and each band is hashed
+together with the seller and category into a ListingLshBucket row. Two
+listings of the same seller and category share a bucket with high
+probability once they are similar, so finding the reposts of a new
+listing is one indexed lookup of its LSH_BANDS buckets plus a signature
+comparison for the few candidates, however many listings exist.
+"""
+
+import hashlib
+import struct
+import zlib
+
+from django.conf import settings
+
+from . import regions
+from .geocoding import normalize
+from .models import ListingFingerprint, ListingLshBucket, ScrapListing
+
+try:
+    import numpy as np
+except ImportError:  # Signatures are computed in pure Python without NumPy.
+    np = None
+
+SIGNATURE_SIZE = 64
+LSH_BANDS = 16
+ROWS_PER_BAND = SIGNATURE_SIZE // LSH_BANDS
+SHINGLE_SIZE = 4
+# Universal hashing h(x) = (a * x + b) mod p stands in for a random
+# permutation of the shingle hashes.
+_PRIME = (1 << 31) - 1
+_SEEDS = [
+    (
+        int.from_bytes(hashlib.blake2b(b"a%d" % index, digest_size=4).digest(), "big") % (_PRIME - 1) + 1,
+        int.from_bytes(hashlib.blake2b(b"b%d" % index, digest_size=4).digest(), "big") % _PRIME,
+    )
+    for index in range(SIGNATURE_SIZE)
+]
+if np is not None:
+    _A = np.array([a for a, _ in _SEEDS], dtype=np.uint64)[:, None]
+    _B = np.array([b for _, b in _SEEDS], dtype=np.uint64)[:, None]
+_SIGNATURE_FORMAT = f"<{SIGNATURE_SIZE}I"
+
+
+def shingles(description, location):
+    text = f"{normalize(description)} | {normalize(location)}"
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[start:start + SHINGLE_SIZE] for start in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def signature(description, location):
+    """The MinHash signature (a tuple of SIGNATURE_SIZE ints) of a listing's text."""
+    hashes = [zlib.crc32(shingle.encode()) % _PRIME for shingle in shingles(description, location)]
+    if np is not None:
+        values = np.array(hashes, dtype=np.uint64)[None, :]
+        return tuple(int(value) for value in ((_A * values + _B) % _PRIME).min(axis=1))
+    return tuple(min((a * value + b) % _PRIME for value in hashes) for a, b in _SEEDS)
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(x == y for x, y in zip(first, second)) / SIGNATURE_SIZE
+
+
+def buckets(seller_id, category_id, signature):
+    keys = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(repr((seller_id, category_id, band, rows)).encode(), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "big", signed=True))
+    return keys
+
+
+def pack(signature):
+    return struct.pack(_SIGNATURE_FORMAT, *signature)
+
+
+def unpack(data):
+    return struct.unpack(_SIGNATURE_FORMAT, bytes(data))
+
+
+def find_duplicates(seller_id, category_id, description, location, exclude_pk=None, threshold=None):
+    """
+    Available or reserved listings of the seller in the category whose text
+    is at least `threshold` similar, as [(similarity, listing_id), ...],
+    most similar first.
+    """
+    threshold = settings.DUPLICATE_LISTING_THRESHOLD if threshold is None else threshold
+    candidate = signature(description, location)
+    candidates = (
+        ListingLshBucket.objects.filter(
+            bucket__in=buckets(seller_id, category_id, candidate),
+            listing__status__in=[ScrapListing.Status.AVAILABLE, ScrapListing.Status.RESERVED],
+        )
+        .exclude(listing_id=exclude_pk)
+        .values_list("listing_id", flat=True)
+        .distinct()
+    )
+    fingerprints = ListingFingerprint.objects.filter(listing_id__in=list(candidates)).values_list(
+        "listing_id", "signature"
+    )
+    matches = []
+    for listing_id, data in fingerprints:
+        score = similarity(candidate, unpack(data))
+        if score >= threshold:
+            matches.append((score, listing_id))
+    return sorted(matches, key=lambda match: (-match[0], match[1]))
+
+
+def index_listings(listings):
+    """(Re)write fingerprints and buckets of listings whose text or category changed. Returns how many."""
+    listings = list(listings)
+    stored = {
+        listing_id: (bytes(data), category_id)
+        for listing_id, data, category_id in ListingFingerprint.objects.filter(
+            listing_id__in=[listing.pk for listing in listings]
+        ).values_list("listing_id", "signature", "category_id")
+    }
+    changed = {}
+    for listing in listings:
+        listing_signature = signature(listing.description, listing.location)
+        if stored.get(listing.pk) != (pack(listing_signature), listing.category_id):
+            changed[listing.pk] = (listing, listing_signature)
+    if not changed:
+        return 0
+    with regions.atomic():
+        _write_index(changed)
+    return len(changed)
+
+
+def _write_index(changed):
+    ListingLshBucket.objects.filter(listing_id__in=changed).delete()
+    ListingFingerprint.objects.bulk_create(
+        [
+            ListingFingerprint(listing_id=pk, signature=pack(listing_signature), category_id=listing.category_id)
+            for pk, (listing, listing_signature) in changed.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["listing"],
+        update_fields=["signature", "category_id"],
+    )
+    ListingLshBucket.objects.bulk_create(
+        [
+            ListingLshBucket(listing_id=pk, bucket=bucket)
+            for pk, (listing, listing_signature) in changed.items()
+            for bucket in buckets(listing.seller_id, listing.category_id, listing_signature)
+        ]
+    )
@@ -0,0 +1,140 @@
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .models import ListingFeedEntry, ListingPhoto, ScrapListing
+
+ENTRY_FIELDS = [
+    "seller_id",
+    "seller_name",
+    "category_id",
+    "category_name",
+    "description",
+    "quantity_kg",
+    "remaining_kg",
+    "price_per_kg",
+    "location",
+    "thumbnail_url",
+    "sale_mode",
+    "auction_ends_at",
+    "top_bid_price",
+    "bid_count",
+    "listed_at",
+]
+
+
+def _feed_source():
+    return ScrapListing.objects.filter(status=ScrapListing.Status.AVAILABLE).select_related(
+        "seller", "category"
+    ).prefetch_related(
+        Prefetch(
+            "photos",
+            queryset=ListingPhoto.objects.exclude(thumbnail="").only("listing_id", "thumbnail"),
+            to_attr="thumbnails",
+        )
+    ).order_by("pk")
+
+
+def build_entry(listing):
+    thumbnails = getattr(listing, "thumbnails", None)
+    if thumbnails is None:
+        thumbnails = list(listing.photos.exclude(thumbnail="")[:1])
+    return ListingFeedEntry(
+        listing_id=listing.pk,
+        seller_id=listing.seller_id,
+        seller_name=listing.seller.business_name,
+        category_id=listing.category_id,
+        category_name=listing.category.name,
+        description=listing.description,
+        quantity_kg=listing.quantity_kg,
+        remaining_kg=listing.remaining_kg,
+        price_per_kg=listing.price_per_kg,
+        location=listing.location,
+        thumbnail_url=thumbnails[0].thumbnail.url if thumbnails else "",
+        sale_mode=listing.sale_mode,
+        auction_ends_at=listing.auction_ends_at,
+        top_bid_price=listing.top_bid_price,
+        bid_count=listing.bid_count,
+        listed_at=listing.created_at,
+    )
+
+
+def _upsert(entries):
+    ListingFeedEntry.objects.bulk_create(
+        entries,
+        update_conflicts=True,
+        unique_fields=["listing"],
+        update_fields=ENTRY_FIELDS + ["refreshed_at"],
+    )
+
+
+def sync_listings(listing_ids):
+    """Bring the feed rows of the given listings in line with the listings table."""
+    listing_ids = list(listing_ids)
+    if not listing_ids:
+        return
+    entries = [build_entry(listing) for listing in _feed_source().filter(pk__in=listing_ids)]
+    available_ids = {entry.listing_id for entry in entries}
+    ListingFeedEntry.objects.filter(listing_id__in=set(listing_ids) - available_ids).delete()
+    if entries:
+        _upsert(entries)
+
+
+def sync_seller(seller_profile):
+    ListingFeedEntry.objects.filter(seller_id=seller_profile.pk).exclude(
+        seller_name=seller_profile.business_name
+    ).update(seller_name=seller_profile.business_name, refreshed_at=timezone.now())
+
+
+def sync_category(category):
+    ListingFeedEntry.objects.filter(category_id=category.pk).exclude(
+        category_name=category.name
+    ).update(category_name=category.name, refreshed_at=timezone.now())
+
+
+def _iter_expected(chunk_size):
+    last_pk = 0
+    while True:
+        chunk = list(_feed_source().filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return
+        yield [build_entry(listing) for listing in chunk]
+        last_pk = chunk[-1].pk
+
+
+def rebuild(chunk_size=1000):
+    """Recreate every feed row from the source tables. Returns the row count."""
+    ListingFeedEntry.objects.all().delete()
+    total = 0
+    for entries in _iter_expected(chunk_size):
+        ListingFeedEntry.objects.bulk_create(entries)
+        total += len(entries)
+    return total
+
+
+def find_inconsistencies(chunk_size=1000):
+    """
+    Compare the feed against the source tables.
+    Returns (missing_ids, stale_ids, orphan_ids).
+    """
+    missing, stale = [], []
+    seen = set()
+    for expected_entries in _iter_expected(chunk_size):
+        ids = [entry.listing_id for entry in expected_entries]
+        actual = {
+            row["listing_id"]: row
+            for row in ListingFeedEntry.objects.filter(listing_id__in=ids).values("listing_id", *ENTRY_FIELDS)
+        }
+        for entry in expected_entries:
+            seen.add(entry.listing_id)
+            row = actual.get(entry.listing_id)
+            if row is None:
+                missing.append(entry.listing_id)
+            elif any(row[field] != getattr(entry, field) for field in ENTRY_FIELDS):
+                stale.append(entry.listing_id)
+
+    orphans = [
+        listing_id
+        for listing_id in ListingFeedEntry.objects.order_by("pk").values_list("listing_id", flat=True).iterator()
+        if listing_id not in seen
+    ]
+    return missing, stale, orphans
@@ -1,7 +1,15 @@
+from decimal import Decimal
+
 from django import forms
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.validators import FileExtensionValidator
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
 
-from .models import BuyerProfile, ScrapListing, SellerProfile
+from . import regions
+from .models import BuyerProfile, ListingPhoto, PickupOrder, ScrapListing, SellerProfile
+from .regions import default_region, region_choices
 
 
 class LoginForm(forms.Form):
@@ -16,6 +24,7 @@ class BuyerRegistrationForm(forms.Form):
     email = forms.EmailField()
     phone_number = forms.CharField(max_length=20)
     address = forms.CharField(required=False)
+    region = forms.ChoiceField(choices=region_choices, required=False)
     password = forms.CharField(widget=forms.PasswordInput)
     confirm_password = forms.CharField(widget=forms.PasswordInput)
 
@@ -41,6 +50,9 @@ class BuyerRegistrationForm(forms.Form):
             raise forms.ValidationError("Email already exists.")
         return email
 
+    def clean_region(self):
+        return self.cleaned_data["region"] or default_region()
+
 
 class SellerRegistrationForm(forms.Form):
     username = forms.CharField(max_length=150)
@@ -49,6 +61,7 @@ class SellerRegistrationForm(forms.Form):
     email = forms.EmailField()
     phone_number = forms.CharField(max_length=20)
     pickup_address = forms.CharField(required=False)
+    region = forms.ChoiceField(choices=region_choices, required=False)
     password = forms.CharField(widget=forms.PasswordInput)
     confirm_password = forms.CharField(widget=forms.PasswordInput)
 
@@ -74,21 +87,287 @@ class SellerRegistrationForm(forms.Form):
             raise forms.ValidationError("Email already exists.")
         return email
 
+    def clean_region(self):
+        return self.cleaned_data["region"] or default_region()
+
+
+class BookingHistoryFilterForm(forms.Form):
+    status = forms.ChoiceField(
+        required=False,
+        choices=[("", "All except cancelled")] + PickupOrder.Status.choices,
+    )
+    placed_from = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date"}))
+    placed_to = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date"}))
+
+
+class SalesReportForm(forms.Form):
+    start = forms.DateField(widget=forms.DateInput(attrs={"type": "date"}))
+    end = forms.DateField(widget=forms.DateInput(attrs={"type": "date"}))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get("start"), cleaned_data.get("end")
+        if start and end and start > end:
+            raise forms.ValidationError("The start date must not be after the end date.")
+        return cleaned_data
+
+
+class PriceSuggestionForm(forms.Form):
+    # A plain id: the suggestion index is keyed by it, so no category query is needed.
+    category = forms.IntegerField(min_value=1)
+    quantity_kg = forms.DecimalField(min_value=Decimal("0.01"), max_digits=10, decimal_places=2)
+    location = forms.CharField(required=False, max_length=255)
+
+
+class BookingQuantityForm(forms.Form):
+    # Blank books everything left on the listing.
+    quantity_kg = forms.DecimalField(min_value=Decimal("0.01"), max_digits=10, decimal_places=2, required=False)
+
+
+class BatchBookingForm(forms.Form):
+    """The JSON body of a batch booking: a pickup time and the listings to book."""
+
+    scheduled_pickup_at = forms.DateTimeField()
+    # [{"listing_id": 1, "quantity_kg": "12.50"}, ...]; no quantity books everything left.
+    items = forms.JSONField()
+
+    def clean_items(self):
+        items = self.cleaned_data["items"]
+        listing_id_field = forms.IntegerField(min_value=1)
+        quantity_field = forms.DecimalField(min_value=Decimal("0.01"), max_digits=10, decimal_places=2, required=False)
+        if not isinstance(items, list) or not items:
+            raise forms.ValidationError("Please list the listings to book.")
+        if len(items) > settings.BATCH_BOOKING_MAX_ITEMS:
+            raise forms.ValidationError(f"Please book at most {settings.BATCH_BOOKING_MAX_ITEMS} listings at once.")
+        cleaned = []
+        for position, item in enumerate(items, start=1):
+            if not isinstance(item, dict):
+                raise forms.ValidationError(f"Item {position}: expected an object with a listing_id.")
+            try:
+                cleaned.append(
+                    (
+                        listing_id_field.clean(item.get("listing_id")),
+                        quantity_field.clean(item.get("quantity_kg")),
+                    )
+                )
+            except forms.ValidationError as exc:
+                raise forms.ValidationError(f"Item {position}: {' '.join(exc.messages)}") from exc
+        return cleaned
+
+
+class ChangeFeedForm(forms.Form):
+    after = forms.IntegerField(min_value=0, required=False)
+    limit = forms.IntegerField(min_value=1, required=False)
+    region = forms.ChoiceField(choices=region_choices, required=False)
+
+    def clean_after(self):
+        return self.cleaned_data["after"] or 0
+
+    def clean_limit(self):
+        return min(self.cleaned_data["limit"] or settings.CHANGE_FEED_PAGE_SIZE, settings.CHANGE_FEED_PAGE_SIZE)
+
+    def clean_region(self):
+        return self.cleaned_data["region"] or default_region()
+
+
+class OnboardingRowMixin:
+    """
+    Registration field checks for one row of a bulk import. Uniqueness is
+    checked for the whole file at once by home.onboarding, so the per-row
+    iexact queries are skipped, and a blank password means "unusable".
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        del self.fields["confirm_password"]
+        self.fields["password"].required = False
+
+    def clean(self):
+        return forms.Form.clean(self)
+
+    def clean_username(self):
+        return self.cleaned_data["username"].strip()
+
+    def clean_email(self):
+        return self.cleaned_data["email"].strip().lower()
+
+
+class BuyerOnboardingForm(OnboardingRowMixin, BuyerRegistrationForm):
+    pass
+
+
+class SellerOnboardingForm(OnboardingRowMixin, SellerRegistrationForm):
+    pass
+
 
 class SellerDashboardListingForm(forms.ModelForm):
+    photo = forms.FileField(
+        required=False,
+        validators=[FileExtensionValidator(["jpg", "jpeg", "png", "webp"])],
+        help_text="Optional. A thumbnail is generated shortly after upload.",
+    )
+    post_duplicate = forms.BooleanField(
+        required=False,
+        label="Post anyway: this is a separate lot",
+        help_text="Only needed when the listing looks like a repost of one you already have open.",
+    )
+
     class Meta:
         model = ScrapListing
-        fields = ["category", "description", "price_per_kg", "quantity_kg", "location"]
+        fields = [
+            "category",
+            "description",
+            "price_per_kg",
+            "quantity_kg",
+            "location",
+            "sale_mode",
+            "auction_ends_at",
+        ]
         labels = {
             "price_per_kg": "Asking Price (₹ per kg)",
             "quantity_kg": "Weight (kg)",
             "location": "Address",
+            "sale_mode": "Sale Type",
+            "auction_ends_at": "Auction Ends At",
+        }
+        widgets = {
+            "auction_ends_at": forms.DateTimeInput(attrs={"type": "datetime-local"}, format="%Y-%m-%dT%H:%M"),
         }
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields["description"].required = True
         self.fields["location"].required = True
+        self.fields["sale_mode"].required = False
+        self._booked_kg = self.instance.booked_kg if self.instance.pk else 0
+        if self.instance.pk:
+            del self.fields["post_duplicate"]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        sale_mode = cleaned_data.get("sale_mode") or ScrapListing.SaleMode.FIXED
+        cleaned_data["sale_mode"] = sale_mode
+        auction_ends_at = cleaned_data.get("auction_ends_at")
+        if self.instance.pk and self.instance.bid_count and (
+            sale_mode != self.instance.sale_mode or auction_ends_at != self.instance.auction_ends_at
+        ):
+            raise forms.ValidationError("An auction that has received bids cannot be changed.")
+        if (
+            self.instance.pk
+            and sale_mode == ScrapListing.SaleMode.AUCTION
+            and self.instance.sale_mode != ScrapListing.SaleMode.AUCTION
+            and (self.instance.booked_kg or self.instance.orders.exists())
+        ):
+            raise forms.ValidationError("A listing that has been booked cannot be switched to an auction.")
+        if sale_mode == ScrapListing.SaleMode.AUCTION:
+            if not auction_ends_at:
+                raise forms.ValidationError("Please set when the auction ends.")
+            if auction_ends_at <= timezone.now():
+                raise forms.ValidationError("The auction end time must be in the future.")
+        else:
+            cleaned_data["auction_ends_at"] = None
+        return cleaned_data
+
+    def clean_quantity_kg(self):
+        quantity_kg = self.cleaned_data["quantity_kg"]
+        if quantity_kg < self._booked_kg:
+            raise forms.ValidationError(f"{self._booked_kg} kg of this listing is already booked.")
+        return quantity_kg
+
+    def save(self, commit=True):
+        """
+        Bookings may have landed since the form was loaded, so an edit is
+        rebased on the row as it is now: a guarded UPDATE (which takes the
+        write lock) moves quantity_kg and remaining_kg together only while
+        what is booked still fits, flipping AVAILABLE and RESERVED to match
+        the new remaining_kg, then the other fields are saved on top.
+        Raises ValidationError when it no longer fits.
+        """
+        if not self.instance.pk or not commit:
+            return super().save(commit=commit)
+        quantity_kg = self.instance.quantity_kg
+        # remaining_kg after the edit is remaining_kg - (quantity_kg - new quantity).
+        released = F("quantity_kg") - quantity_kg
+        status = Case(
+            When(
+                status=ScrapListing.Status.AVAILABLE,
+                remaining_kg=released,
+                then=Value(ScrapListing.Status.RESERVED),
+            ),
+            When(
+                status=ScrapListing.Status.RESERVED,
+                sale_mode=ScrapListing.SaleMode.FIXED,
+                remaining_kg__gt=released,
+                then=Value(ScrapListing.Status.AVAILABLE),
+            ),
+            default=F("status"),
+        )
+        with regions.atomic():
+            fits = ScrapListing.objects.filter(
+                pk=self.instance.pk,
+                remaining_kg__gte=released,
+            ).update(
+                remaining_kg=F("remaining_kg") + quantity_kg - F("quantity_kg"),
+                quantity_kg=quantity_kg,
+                status=status,
+            )
+            current = ScrapListing.objects.get(pk=self.instance.pk)
+            if not fits:
+                raise forms.ValidationError(f"{current.booked_kg} kg of this listing is booked now.")
+            # Fields the form does not edit are kept as the bookings and bids left them.
+            for field in ("remaining_kg", "status", "top_bid_price", "top_bidder_id", "bid_count"):
+                setattr(self.instance, field, getattr(current, field))
+            return super().save()
+
+    def clean_photo(self):
+        photo = self.cleaned_data.get("photo")
+        if photo and photo.size > settings.LISTING_PHOTO_MAX_BYTES:
+            raise forms.ValidationError("Photo is too large.")
+        return photo
+
+    def save_photo(self, listing):
+        photo = self.cleaned_data.get("photo")
+        if not photo:
+            return None
+        return ListingPhoto.objects.create(listing=listing, original=photo)
+
+
+class BulkListingEditForm(forms.ModelForm):
+    """One row of the bulk listing editor (formset or CSV patch)."""
+
+    # Reserved and sold listings follow their bookings; only these two are
+    # the seller's to switch between.
+    SELLER_STATUSES = (ScrapListing.Status.AVAILABLE, ScrapListing.Status.INACTIVE)
+
+    class Meta:
+        model = ScrapListing
+        fields = ["price_per_kg", "quantity_kg", "status", "location"]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.booked_kg = self.instance.booked_kg
+        if self.instance.status in self.SELLER_STATUSES:
+            self.fields["status"].choices = [
+                (value, label) for value, label in ScrapListing.Status.choices if value in self.SELLER_STATUSES
+            ]
+        else:
+            self.fields["status"].disabled = True
+
+    def clean_quantity_kg(self):
+        quantity_kg = self.cleaned_data["quantity_kg"]
+        if quantity_kg < self.booked_kg:
+            raise forms.ValidationError(f"{self.booked_kg} kg of this listing is already booked.")
+        return quantity_kg
+
+
+BulkListingFormSet = forms.modelformset_factory(ScrapListing, form=BulkListingEditForm, extra=0)
+
+
+class BulkListingPatchForm(forms.Form):
+    patch = forms.FileField(
+        validators=[FileExtensionValidator(["csv"])],
+        help_text="Columns: id, price_per_kg, quantity_kg, status, location. Blank cells keep the current value.",
+    )
 
 
 def create_user_and_buyer_profile(cleaned_data):
@@ -110,6 +389,7 @@ def create_user_and_buyer_profile(cleaned_data):
         business_name=cleaned_data["business_name"].strip(),
         phone_number=cleaned_data["phone_number"].strip(),
         address=cleaned_data.get("address", "").strip(),
+        region=cleaned_data.get("region") or default_region(),
     )
     return user
 
@@ -133,5 +413,6 @@ def create_user_and_seller_profile(cleaned_data):
         business_name=cleaned_data["business_name"].strip(),
         phone_number=cleaned_data["phone_number"].strip(),
         pickup_address=cleaned_data.get("pickup_address", "").strip(),
+        region=cleaned_data.get("region") or default_region(),
     )
     return user
@@ -0,0 +1,166 @@
+"""
+Offline geocoding of pickup addresses and listing locations.
+
+settings.GEOCODER_GAZETTEER points at a CSV file with a name, latitude,
+longitude header; each row is either a six-digit pincode or a locality
+name with its centroid. Pincodes go into a dict, locality names into a
+word trie, so resolving an address is one dict probe per word plus a trie
+walk from each word, independent of the gazetteer's size. A pincode in the
+address wins; otherwise the locality matching the most words does, the
+earliest one on a tie (addresses run from the most to the least specific).
+
+Every distinct normalized address is resolved once and memoized in
+GeocodeCache, misses included. Clear that table (geocode_addresses
+--refresh) after replacing the gazetteer.
+"""
+
+import csv
+import hashlib
+import re
+from collections import namedtuple
+from decimal import Decimal
+from functools import lru_cache
+
+from django.conf import settings
+
+from .models import GeocodeCache
+
+Place = namedtuple("Place", "name latitude longitude")
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+PINCODE_RE = re.compile(r"\d{6}")
+COORDINATE_PLACES = Decimal("0.000001")
+LOOKUP_CHUNK_SIZE = 500
+# Trie nodes are dicts keyed by word; this key holds the place ending there.
+_PLACE = None
+
+
+def normalize(address):
+    return " ".join(WORD_RE.findall((address or "").lower()))
+
+
+def address_hash(normalized):
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+class Gazetteer:
+    def __init__(self, rows):
+        self.pincodes = {}
+        self.trie = {}
+        self.size = 0
+        for name, latitude, longitude in rows:
+            words = normalize(name).split()
+            if not words:
+                continue
+            place = Place(
+                name.strip(),
+                Decimal(latitude).quantize(COORDINATE_PLACES),
+                Decimal(longitude).quantize(COORDINATE_PLACES),
+            )
+            if len(words) == 1 and PINCODE_RE.fullmatch(words[0]):
+                self.pincodes[words[0]] = place
+            else:
+                node = self.trie
+                for word in words:
+                    node = node.setdefault(word, {})
+                node[_PLACE] = place
+            self.size += 1
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, newline="", encoding="utf-8-sig") as handle:
+            return cls((row["name"], row["latitude"], row["longitude"]) for row in csv.DictReader(handle))
+
+    def lookup(self, normalized):
+        """The Place for a normalized address, or None."""
+        words = normalized.split()
+        for word in words:
+            if word in self.pincodes:
+                return self.pincodes[word]
+        best, best_length = None, 0
+        for start in range(len(words)):
+            node = self.trie
+            for end in range(start, len(words)):
+                node = node.get(words[end])
+                if node is None:
+                    break
+                if _PLACE in node and end + 1 - start > best_length:
+                    best, best_length = node[_PLACE], end + 1 - start
+        return best
+
+
+@lru_cache(maxsize=1)
+def _load(path, mtime):
+    return Gazetteer.from_file(path)
+
+
+def gazetteer():
+    """The configured Gazetteer, reloaded when the file changes; None without one."""
+    path = settings.GEOCODER_GAZETTEER
+    try:
+        mtime = path.stat().st_mtime
+    except (AttributeError, OSError):
+        return None
+    return _load(path, mtime)
+
+
+def geocode_many(addresses):
+    """{address: Place or None} for the given addresses, through GeocodeCache."""
+    index = gazetteer()
+    if index is None:
+        return dict.fromkeys(addresses)
+    keys, address_keys = {}, {}
+    for address in addresses:
+        normalized = normalize(address)
+        if normalized:
+            address_keys[address] = address_hash(normalized)
+            keys[address_keys[address]] = normalized
+
+    resolved = {}
+    hashes = list(keys)
+    for start in range(0, len(hashes), LOOKUP_CHUNK_SIZE):
+        rows = GeocodeCache.objects.filter(address_hash__in=hashes[start:start + LOOKUP_CHUNK_SIZE]).values_list(
+            "address_hash", "place", "latitude", "longitude"
+        )
+        for key, place, latitude, longitude in rows:
+            resolved[key] = Place(place, latitude, longitude) if place else None
+
+    missing = [key for key in keys if key not in resolved]
+    for key in missing:
+        resolved[key] = index.lookup(keys[key])
+    GeocodeCache.objects.bulk_create(
+        [
+            GeocodeCache(
+                address_hash=key,
+                address=keys[key],
+                place=resolved[key].name if resolved[key] else "",
+                latitude=resolved[key].latitude if resolved[key] else None,
+                longitude=resolved[key].longitude if resolved[key] else None,
+            )
+            for key in missing
+        ],
+        batch_size=LOOKUP_CHUNK_SIZE,
+        ignore_conflicts=True,
+    )
+    return {address: resolved.get(address_keys.get(address)) for address in addresses}
+
+
+def geocode(address):
+    return geocode_many([address])[address]
+
+
+def locate(instances, address_field):
+    """
+    Set latitude/longitude on instances from their address_field. Returns
+    how many resolved; without a gazetteer the instances are left alone.
+    """
+    if gazetteer() is None:
+        return 0
+    places = geocode_many({getattr(instance, address_field) for instance in instances})
+    located = 0
+    for instance in instances:
+        place = places[getattr(instance, address_field)]
+        instance.latitude = place.latitude if place else None
+        instance.longitude = place.longitude if place else None
+        located += place is not None
+    return located
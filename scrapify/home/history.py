@@ -0,0 +1,162 @@
+"""
+Read paths that span the hot tables and the archive tables.
+
+Both sides are projected onto the same named columns and combined with
+UNION ALL, so callers get one ordered queryset of dicts regardless of
+where a row currently lives.
+"""
+
+from datetime import datetime, time, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
+from django.db.models import BooleanField, Count, F, Q, Sum, Value
+from django.utils import timezone
+
+from .models import ArchivedPickupOrder, ArchivedScrapListing, PickupOrder, ScrapListing
+
+
+def _order_columns(category_path, quantity_path, archived):
+    return {
+        "order_id": F("id"),
+        "order_listing_id": F("listing_id"),
+        "order_status": F("status"),
+        "category_name": F(category_path),
+        "buyer_name": F("buyer__business_name"),
+        "seller_name": F("seller__business_name"),
+        "quantity": F(quantity_path),
+        "amount": F("total_amount"),
+        "pickup_at": F("scheduled_pickup_at"),
+        "placed_at": F("created_at"),
+        "is_archived": Value(archived, output_field=BooleanField()),
+    }
+
+
+def order_history(hot_orders, archived_orders):
+    # Clear the models' default ordering: SQLite rejects ORDER BY inside
+    # the branches of a compound statement.
+    hot = hot_orders.order_by().values(**_order_columns("listing__category__name", "bid__quantity_kg", False))
+    cold = archived_orders.order_by().values(**_order_columns("category__name", "quantity_kg", True))
+    return hot.union(cold, all=True).order_by("-placed_at", "-order_id")
+
+
+def _filter_buyer_orders(queryset, status, placed_from, placed_to):
+    # An explicit status filter may ask for cancelled orders; by default
+    # they are hidden, as on the dashboard.
+    if status:
+        queryset = queryset.filter(status=status)
+    else:
+        queryset = queryset.exclude(status=PickupOrder.Status.CANCELLED)
+    tz = timezone.get_current_timezone()
+    if placed_from:
+        queryset = queryset.filter(created_at__gte=datetime.combine(placed_from, time.min, tzinfo=tz))
+    if placed_to:
+        queryset = queryset.filter(created_at__lt=datetime.combine(placed_to + timedelta(days=1), time.min, tzinfo=tz))
+    return queryset
+
+
+def _buyer_branches(buyer_profile, status=None, placed_from=None, placed_to=None):
+    return (
+        _filter_buyer_orders(PickupOrder.objects.filter(buyer=buyer_profile), status, placed_from, placed_to),
+        _filter_buyer_orders(ArchivedPickupOrder.objects.filter(buyer=buyer_profile), status, placed_from, placed_to),
+    )
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def encode_cursor(row):
+    """Opaque position after `row`: its placement time in microseconds and its id."""
+    microseconds = (row["placed_at"] - _EPOCH) // timedelta(microseconds=1)
+    return f"{microseconds}-{row['order_id']}"
+
+
+def decode_cursor(cursor):
+    try:
+        microseconds, order_id = (int(part) for part in cursor.split("-"))
+    except (AttributeError, ValueError):
+        return None
+    return _EPOCH + timedelta(microseconds=microseconds), order_id
+
+
+def buyer_order_page(buyer_profile, status=None, placed_from=None, placed_to=None, before=None, page_size=20):
+    """
+    One page of the buyer's history, newest first, and the cursor of the
+    next page (None on the last one). Paging is keyset-based on
+    (placed_at, order_id): each branch of the UNION only reads rows older
+    than the cursor, so deep pages cost the same as the first.
+    """
+    hot, cold = _buyer_branches(buyer_profile, status, placed_from, placed_to)
+    position = decode_cursor(before) if before else None
+    if position:
+        placed_at, order_id = position
+        older = Q(created_at__lt=placed_at) | Q(created_at=placed_at, id__lt=order_id)
+        hot, cold = hot.filter(older), cold.filter(older)
+    rows = list(order_history(hot, cold)[:page_size + 1])
+    if len(rows) > page_size:
+        return rows[:page_size], encode_cursor(rows[page_size - 1])
+    return rows, None
+
+
+def _to_decimal(value):
+    return Decimal(str(value or 0)).quantize(Decimal("0.01"))
+
+
+def buyer_order_summary(buyer_profile, status=None, placed_from=None, placed_to=None):
+    """
+    Order count, kg and amount per status over hot and archived orders.
+    Each side is grouped by status in SQL (walking the (buyer, status)
+    index, so no sort) and the two halves come back in one UNION ALL.
+    """
+    hot, cold = _buyer_branches(buyer_profile, status, placed_from, placed_to)
+    hot = hot.order_by().values("status").annotate(
+        count=Count("pk"), quantity=Sum("bid__quantity_kg"), amount=Sum("total_amount")
+    )
+    cold = cold.order_by().values("status").annotate(
+        count=Count("pk"), quantity=Sum("quantity_kg"), amount=Sum("total_amount")
+    )
+    totals = {}
+    for row in hot.union(cold, all=True):
+        total = totals.setdefault(row["status"], [0, Decimal("0.00"), Decimal("0.00")])
+        total[0] += row["count"]
+        total[1] += _to_decimal(row["quantity"])
+        total[2] += _to_decimal(row["amount"])
+    labels = dict(PickupOrder.Status.choices)
+    return [
+        {
+            "status": order_status,
+            "label": labels.get(order_status, order_status),
+            "count": count,
+            "quantity": quantity,
+            "amount": amount,
+        }
+        for order_status, (count, quantity, amount) in sorted(totals.items())
+    ]
+
+
+def seller_order_history(seller_profile, include_cancelled=False):
+    hot = PickupOrder.objects.filter(seller=seller_profile)
+    cold = ArchivedPickupOrder.objects.filter(seller=seller_profile)
+    if not include_cancelled:
+        hot = hot.exclude(status=PickupOrder.Status.CANCELLED)
+        cold = cold.exclude(status=PickupOrder.Status.CANCELLED)
+    return order_history(hot, cold)
+
+
+def _listing_columns(archived):
+    return {
+        "listing_id": F("id"),
+        "listing_status": F("status"),
+        "category_name": F("category__name"),
+        "listing_description": F("description"),
+        "price": F("price_per_kg"),
+        "quantity": F("quantity_kg"),
+        "listed_at": F("created_at"),
+        "is_archived": Value(archived, output_field=BooleanField()),
+    }
+
+
+def seller_listing_history(seller_profile):
+    hot = ScrapListing.objects.filter(seller=seller_profile).order_by().values(**_listing_columns(False))
+    cold = ArchivedScrapListing.objects.filter(seller=seller_profile).order_by().values(**_listing_columns(True))
+    return hot.union(cold, all=True).order_by("-listed_at", "-listing_id")
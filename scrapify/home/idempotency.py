@@ -0,0 +1,145 @@
+"""
+Idempotency keys for form POSTs (bookings, bids, new listings, sign-ups).
+
+Forms carry a hidden idempotency_key, a fresh random value per rendered
+form (the idempotency_key context processor). The first POST with a key
+claims an IdempotencyKey row and runs the view; if the view redirects, as
+every completed submission here does, the redirect and the flash messages
+it queued are stored on the row. A repeated POST (a double click, a mobile
+retry) finds the row with one unique-index lookup and replays that
+redirect and its messages instead of running the booking transaction
+again; one that arrives while the first is still running waits up to
+IDEMPOTENCY_WAIT_SECONDS for it. Other responses (form errors rendered in
+place) and exceptions release the key, so a corrected resubmission runs
+normally. A key still incomplete after IDEMPOTENCY_LEASE belongs to a
+process that died mid-request; the next repeat takes it over.
+Rows expire after IDEMPOTENCY_KEY_TTL and are purged by sweep_marketplace.
+"""
+
+import re
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, HttpResponseRedirect
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+FIELD_NAME = "idempotency_key"
+KEY_RE = re.compile(r"[0-9a-f]{32}")
+POLL_INTERVAL = 0.05
+
+
+def new_key():
+    return uuid.uuid4().hex
+
+
+def idempotency_key(request):
+    """Context processor: {{ idempotency_key }} renders a new key wherever it is used."""
+    return {"idempotency_key": new_key}
+
+
+def _scope(request):
+    return f"user:{request.user.pk}" if request.user.is_authenticated else "anonymous"
+
+
+def _claim(scope, key, path):
+    """(True, new row) for a first submission, else (False, the existing row or None)."""
+    # Look first: repeats, the case this exists for, then cost one indexed read.
+    record = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+    if record is not None:
+        now = timezone.now()
+        expired = record.created_at < now - settings.IDEMPOTENCY_KEY_TTL
+        abandoned = record.completed_at is None and record.created_at < now - settings.IDEMPOTENCY_LEASE
+        if not (expired or abandoned):
+            return False, record
+        record.delete()
+    try:
+        with transaction.atomic():
+            return True, IdempotencyKey.objects.create(scope=scope, key=key, path=path)
+    except IntegrityError:
+        # A twin request claimed it in between.
+        return False, IdempotencyKey.objects.filter(scope=scope, key=key).first()
+
+
+def _wait_for_completion(record):
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while record is not None and record.completed_at is None and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        record = IdempotencyKey.objects.filter(pk=record.pk).first()
+    return record
+
+
+def _replay(request, record):
+    for message in record.messages:
+        messages.add_message(request, message["level"], message["message"], extra_tags=message["extra_tags"])
+    response = HttpResponseRedirect(record.location)
+    response.status_code = record.status_code
+    return response
+
+
+def _queued_messages(request):
+    storage = messages.get_messages(request)
+    queued = [
+        {"level": message.level, "message": str(message.message), "extra_tags": message.extra_tags}
+        for message in storage
+    ]
+    # Iterating marks the messages as shown; keep them for the redirect target.
+    storage.used = False
+    return queued
+
+
+def idempotent(view_func):
+    """Replay the stored outcome of POSTs that repeat an idempotency key."""
+
+    @wraps(view_func)
+    def _wrapped(request, *args, **kwargs):
+        key = request.POST.get(FIELD_NAME, "") if request.method == "POST" else ""
+        if not KEY_RE.fullmatch(key):
+            return view_func(request, *args, **kwargs)
+
+        claimed, record = _claim(_scope(request), key, request.path)
+        if not claimed:
+            record = _wait_for_completion(record)
+            if record is None or record.path != request.path:
+                return view_func(request, *args, **kwargs)
+            if record.completed_at is None:
+                return HttpResponse("This form is still being submitted. Please wait a moment.", status=409)
+            return _replay(request, record)
+
+        try:
+            response = view_func(request, *args, **kwargs)
+        except BaseException:
+            record.delete()
+            raise
+        if response.status_code in (301, 302, 303, 307, 308):
+            record.status_code = response.status_code
+            record.location = response["Location"]
+            record.messages = _queued_messages(request)
+            record.completed_at = timezone.now()
+            record.save(update_fields=["status_code", "location", "messages", "completed_at"])
+        else:
+            record.delete()
+        return response
+
+    return _wrapped
+
+
+def purge_expired(chunk_size=1000, pause=0.0):
+    """Delete expired keys in small transactions. Returns how many were deleted."""
+    cutoff = timezone.now() - settings.IDEMPOTENCY_KEY_TTL
+    deleted = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(created_at__lt=cutoff).order_by("pk").values_list("pk", flat=True)[:chunk_size]
+        )
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            deleted += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
+        if pause:
+            time.sleep(pause)
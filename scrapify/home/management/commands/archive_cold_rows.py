@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from home import regions
+from home.archival import archive_cold_rows
+
+
+class Command(BaseCommand):
+    help = "Move old completed/cancelled orders and sold/inactive listings into the archive tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.ARCHIVE_AFTER_DAYS,
+            help="Only archive rows untouched for this many days.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument("--pause", type=float, default=0.05, help="Seconds to sleep between chunks.")
+
+    def handle(self, *args, **options):
+        archived = regions.fan_out(
+            lambda: archive_cold_rows(
+                days=options["days"],
+                chunk_size=options["chunk_size"],
+                pause=options["pause"],
+            )
+        )
+        for region, (orders, listings) in archived.items():
+            self.stdout.write(self.style.SUCCESS(f"{region}: archived {orders} orders and {listings} listings."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from home import regions, rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the seller sales rollup tables from completed (hot and archived) orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for region, (daily, monthly) in regions.fan_out(lambda: rollups.rebuild(batch_size=options["batch_size"])).items():
+            self.stdout.write(self.style.SUCCESS(f"{region}: rebuilt {daily} daily and {monthly} monthly sales rows."))
@@ -0,0 +1,319 @@
+import asyncio
+import logging
+import random
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.signals import got_request_exception
+from django.db import OperationalError
+from django.test import override_settings
+from django.urls import reverse
+
+from home.benchmarks import BENCH_PASSWORD, benchmark_database, pickup_time, seed_marketplace
+from home.models import PickupOrder, ScrapCategory, ScrapListing
+
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 20000]
+BOOKABLE_ID = re.compile(r'value="book_listing" />\s*<input type="hidden" name="listing_id" value="(\d+)"')
+
+
+class LoadServer(ThreadedWSGIServer):
+    # socketserver's default backlog of 5 refuses connections long before
+    # the application is the bottleneck.
+    request_queue_size = 1024
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class LockTimeoutCounter:
+    """Counts requests that died on "database is locked", per URL name."""
+
+    def __init__(self):
+        self.counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def __call__(self, sender, request=None, **kwargs):
+        exc = sys.exc_info()[1]
+        if isinstance(exc, OperationalError) and "locked" in str(exc):
+            match = getattr(request, "resolver_match", None)
+            with self._lock:
+                self.counts[match.url_name if match else request.path] += 1
+
+
+@contextmanager
+def local_server(host, port):
+    server = LoadServer((host, port), QuietRequestHandler)
+    server.set_app(WSGIHandler())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server.server_address[1]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@contextmanager
+def quiet_loggers(*names):
+    loggers = [logging.getLogger(name) for name in names]
+    levels = [logger.level for logger in loggers]
+    for logger in loggers:
+        logger.setLevel(logging.CRITICAL)
+    try:
+        yield
+    finally:
+        for logger, level in zip(loggers, levels):
+            logger.setLevel(level)
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, endpoint, seconds, ok):
+        self.latencies[endpoint].append(seconds * 1000)
+        if not ok:
+            self.errors[endpoint] += 1
+
+
+class VirtualUser:
+    """One browser: a cookie jar and a fresh connection per request."""
+
+    def __init__(self, host, port, stats):
+        self.host = host
+        self.port = port
+        self.stats = stats
+        self.cookies = {}
+
+    async def request(self, endpoint, method, path, data=None, expect=(200, 302)):
+        body = urlencode(data).encode() if data is not None else b""
+        headers = [
+            f"{method} {path} HTTP/1.1",
+            f"Host: {self.host}:{self.port}",
+            "Connection: close",
+        ]
+        if self.cookies:
+            headers.append("Cookie: " + "; ".join(f"{name}={value}" for name, value in self.cookies.items()))
+        if data is not None:
+            headers.append("Content-Type: application/x-www-form-urlencoded")
+            headers.append(f"Content-Length: {len(body)}")
+
+        started = time.perf_counter()
+        status, response_body = 0, b""
+        try:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+            writer.write("\r\n".join(headers).encode() + b"\r\n\r\n" + body)
+            await writer.drain()
+            raw = await reader.read()
+            writer.close()
+            head, _, response_body = raw.partition(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            status = int(lines[0].split()[1])
+            for line in lines[1:]:
+                name, _, value = line.partition(":")
+                if name.lower() == "set-cookie":
+                    for morsel in SimpleCookie(value.strip()).values():
+                        self.cookies[morsel.key] = morsel.value
+        except (OSError, ValueError, IndexError):
+            pass
+        self.stats.record(endpoint, time.perf_counter() - started, status in expect)
+        return status, response_body.decode("utf-8", "replace")
+
+    async def post_form(self, endpoint, path, data):
+        payload = {"csrfmiddlewaretoken": self.cookies.get("csrftoken", ""), **data}
+        return await self.request(endpoint, "POST", path, payload, expect=(302,))
+
+    async def login(self, auth_url, username):
+        await self.request("login", "GET", auth_url, expect=(200,))
+        await self.post_form(
+            "login",
+            auth_url,
+            {"action": "login", "username_or_email": username, "password": BENCH_PASSWORD},
+        )
+
+
+async def buyer_session(user, deadline, book_ratio, quantity_kg):
+    dashboard = reverse("buyer_dashboard")
+    bookable = []
+    while time.perf_counter() < deadline:
+        if bookable and random.random() < book_ratio:
+            await user.post_form(
+                "book_listing",
+                dashboard,
+                {
+                    "action": "book_listing",
+                    "listing_id": random.choice(bookable),
+                    "quantity_kg": quantity_kg,
+                    "scheduled_pickup_at": pickup_time(),
+                },
+            )
+        else:
+            _, page = await user.request("feed", "GET", dashboard, expect=(200,))
+            bookable = BOOKABLE_ID.findall(page) or bookable
+
+
+async def seller_session(user, deadline, create_ratio, category_ids):
+    dashboard = reverse("seller_dashboard")
+    while time.perf_counter() < deadline:
+        if random.random() < create_ratio:
+            await user.post_form(
+                "create_listing",
+                dashboard,
+                {
+                    "action": "create_listing",
+                    "category": random.choice(category_ids),
+                    "description": "Load test lot",
+                    "price_per_kg": "25.00",
+                    "quantity_kg": "100.00",
+                    "location": "Load test yard",
+                    "sale_mode": ScrapListing.SaleMode.FIXED,
+                    # Every lot looks alike; the repost check still runs, but
+                    # the seller confirms each one is a separate lot.
+                    "post_duplicate": "on",
+                },
+            )
+        else:
+            await user.request("seller_dashboard", "GET", dashboard, expect=(200,))
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive buyer/seller traffic over real HTTP at a locally started server and report "
+        "throughput, errors, latency histograms and SQLite lock timeouts per endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--buyers", type=int, default=200, help="Concurrent buyer sessions.")
+        parser.add_argument("--sellers", type=int, default=10, help="Concurrent seller sessions.")
+        parser.add_argument("--duration", type=float, default=30.0, help="Seconds of traffic after login.")
+        parser.add_argument("--book-ratio", type=float, default=0.3, help="Share of buyer requests that book.")
+        parser.add_argument("--create-ratio", type=float, default=0.3, help="Share of seller requests that list.")
+        parser.add_argument("--quantity-kg", default="5.00", help="Quantity each booking asks for.")
+        parser.add_argument("--listings-per-seller", type=int, default=20)
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=0, help="0 picks a free port.")
+        parser.add_argument(
+            "--fast-passwords",
+            action="store_true",
+            help="Hash seeded passwords with MD5 so logging in hundreds of users is quick.",
+        )
+        parser.add_argument("--seed", type=int, default=None, help="Random seed for a repeatable mix.")
+
+    async def run_load(self, port, options, sellers, buyers, category_ids):
+        """Log everyone in, then run the traffic mix. Returns [(phase, stats, seconds)]."""
+        host = options["host"]
+        login_stats, stats = Stats(), Stats()
+        buyer_users = [(VirtualUser(host, port, login_stats), buyer) for buyer in buyers]
+        seller_users = [(VirtualUser(host, port, login_stats), seller) for seller in sellers]
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            *[user.login(reverse("buyer_auth"), buyer.user.username) for user, buyer in buyer_users],
+            *[user.login(reverse("seller_auth"), seller.user.username) for user, seller in seller_users],
+        )
+        login_elapsed = time.perf_counter() - started
+
+        for user, _ in buyer_users + seller_users:
+            user.stats = stats
+        deadline = time.perf_counter() + options["duration"]
+        started = time.perf_counter()
+        await asyncio.gather(
+            *[
+                buyer_session(user, deadline, options["book_ratio"], options["quantity_kg"])
+                for user, _ in buyer_users
+            ],
+            *[
+                seller_session(user, deadline, options["create_ratio"], category_ids)
+                for user, _ in seller_users
+            ],
+        )
+        return [("login", login_stats, login_elapsed), ("traffic", stats, time.perf_counter() - started)]
+
+    def handle(self, *args, **options):
+        if options["seed"] is not None:
+            random.seed(options["seed"])
+        lock_timeouts = LockTimeoutCounter()
+
+        hashers = settings.PASSWORD_HASHERS
+        if options["fast_passwords"]:
+            hashers = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+        with benchmark_database(), override_settings(PASSWORD_HASHERS=hashers):
+            sellers, buyers = seed_marketplace(
+                sellers=options["sellers"],
+                buyers=options["buyers"],
+                listings_per_seller=options["listings_per_seller"],
+            )
+            category_ids = list(ScrapCategory.objects.values_list("pk", flat=True))
+            got_request_exception.connect(lock_timeouts, dispatch_uid="bench_booking_load")
+            try:
+                with override_settings(ALLOWED_HOSTS=[options["host"]]), quiet_loggers(
+                    "django.request", "django.server"
+                ), local_server(options["host"], options["port"]) as port:
+                    self.stdout.write(
+                        f"{len(buyers)} buyers and {len(sellers)} sellers against "
+                        f"http://{options['host']}:{port}/ for {options['duration']:.0f}s ..."
+                    )
+                    phases = asyncio.run(self.run_load(port, options, sellers, buyers, category_ids))
+            finally:
+                got_request_exception.disconnect(dispatch_uid="bench_booking_load")
+
+            self.report(phases, lock_timeouts.counts)
+            self.stdout.write(
+                f"Orders created: {PickupOrder.objects.count()}; "
+                f"listings sold out: {ScrapListing.objects.filter(status=ScrapListing.Status.RESERVED).count()}"
+            )
+        self.stdout.write(
+            "The server runs in this process, so client work shares the GIL with it; "
+            "treat throughput as a floor."
+        )
+
+    def report(self, phases, lock_timeouts):
+        self.stdout.write(
+            f"\n{'endpoint':<18}{'requests':>9}{'req/s':>8}{'errors':>8}{'err %':>7}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+        )
+        for _, stats, elapsed in phases:
+            for endpoint in sorted(stats.latencies):
+                latencies = sorted(stats.latencies[endpoint])
+                errors = stats.errors[endpoint]
+                self.stdout.write(
+                    f"{endpoint:<18}{len(latencies):>9}{len(latencies) / elapsed:>8.1f}{errors:>8}"
+                    f"{100 * errors / len(latencies):>7.1f}{percentile(latencies, 0.5):>9.0f}"
+                    f"{percentile(latencies, 0.95):>9.0f}{percentile(latencies, 0.99):>9.0f}{latencies[-1]:>9.0f}"
+                )
+        for phase, _, elapsed in phases:
+            self.stdout.write(f"{phase} phase took {elapsed:.1f}s")
+
+        self.stdout.write("\nLatency histogram (requests finishing within each bound, ms):")
+        bounds = [f"<={bound}" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}"]
+        self.stdout.write(f"{'endpoint':<18}" + "".join(f"{bound:>8}" for bound in bounds))
+        for _, stats, _ in phases:
+            for endpoint in sorted(stats.latencies):
+                counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+                for latency in stats.latencies[endpoint]:
+                    counts[bisect_left(LATENCY_BUCKETS_MS, latency)] += 1
+                self.stdout.write(f"{endpoint:<18}" + "".join(f"{count:>8}" for count in counts))
+
+        self.stdout.write(f"\nLock timeouts ('database is locked'): {sum(lock_timeouts.values())}")
+        for url_name in sorted(lock_timeouts):
+            self.stdout.write(f"  {url_name:<18}{lock_timeouts[url_name]:>6}")
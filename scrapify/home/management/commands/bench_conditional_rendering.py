@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from home.benchmarks import benchmark_database, measure, seed_marketplace
+
+
+class Command(BaseCommand):
+    help = "Compare bytes and CPU for full, gzipped and 304 responses of the main pages."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--listings-per-seller", type=int, default=40)
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        with benchmark_database():
+            sellers, buyers = seed_marketplace(listings_per_seller=options["listings_per_seller"])
+            pages = [
+                ("landing", None),
+                ("about", None),
+                ("buyer_dashboard", buyers[0].user),
+                ("seller_dashboard", sellers[0].user),
+            ]
+
+            self.stdout.write(
+                f"{'page':<18}{'full B':>10}{'gzip B':>10}{'304 B':>8}"
+                f"{'full ms':>10}{'gzip ms':>10}{'304 ms':>9}{'CPU saved':>11}"
+            )
+            for url_name, user in pages:
+                client = Client()
+                if user is not None:
+                    client.force_login(user)
+                url = reverse(url_name)
+                # The first response sets the CSRF cookie, which is part of the
+                # ETag, so take the validator from the second one.
+                client.get(url)
+                etag = client.get(url)["ETag"]
+
+                full_cpu, _, full = measure(lambda: client.get(url), iterations)
+                gzip_cpu, _, gzipped = measure(
+                    lambda: client.get(url, HTTP_ACCEPT_ENCODING="gzip"), iterations
+                )
+                cond_cpu, _, not_modified = measure(
+                    lambda: client.get(url, HTTP_IF_NONE_MATCH=etag), iterations
+                )
+                if not_modified.status_code != 304:
+                    self.stderr.write(f"{url_name}: expected 304, got {not_modified.status_code}")
+
+                saved = 1 - cond_cpu / full_cpu if full_cpu else 0
+                self.stdout.write(
+                    f"{url_name:<18}{len(full.content):>10}{len(gzipped.content):>10}"
+                    f"{len(not_modified.content):>8}{full_cpu * 1000:>10.2f}{gzip_cpu * 1000:>10.2f}"
+                    f"{cond_cpu * 1000:>9.2f}{saved:>10.0%}"
+                )
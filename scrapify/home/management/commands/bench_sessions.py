@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from home.benchmarks import BENCH_PASSWORD, benchmark_database, pickup_time, seed_marketplace
+from home.models import ScrapListing
+
+CONFIGURATIONS = [
+    ("db", "fallback"),
+    ("db", "cookie"),
+    ("cached_db", "cookie"),
+    ("cache", "cookie"),
+    ("signed_cookies", "cookie"),
+]
+WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE")
+
+
+def _classify(queries):
+    session_reads = session_writes = other_writes = 0
+    for query in queries:
+        sql = query["sql"].lstrip().upper()
+        is_write = sql.startswith(WRITE_PREFIXES)
+        if "DJANGO_SESSION" in sql:
+            if is_write:
+                session_writes += 1
+            else:
+                session_reads += 1
+        elif is_write:
+            other_writes += 1
+    return session_reads, session_writes, other_writes
+
+
+class Command(BaseCommand):
+    help = "Count database traffic per booking flow for each session/message backend."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bookings", type=int, default=5, help="Bookings made per login.")
+
+    def run_flow(self, buyer, listings):
+        client = Client()
+        client.post(
+            reverse("buyer_auth"),
+            {"action": "login", "username_or_email": buyer.user.username, "password": BENCH_PASSWORD},
+        )
+        for listing in listings:
+            client.get(reverse("buyer_dashboard"))
+            client.post(
+                reverse("buyer_dashboard"),
+                {
+                    "action": "book_listing",
+                    "listing_id": listing.pk,
+                    "scheduled_pickup_at": pickup_time(),
+                },
+                follow=True,
+            )
+
+    def handle(self, *args, **options):
+        bookings = options["bookings"]
+        with benchmark_database():
+            _, buyers = seed_marketplace(
+                buyers=len(CONFIGURATIONS),
+                listings_per_seller=bookings * len(CONFIGURATIONS),
+            )
+            available = list(ScrapListing.objects.filter(status=ScrapListing.Status.AVAILABLE))
+
+            self.stdout.write(
+                f"{'sessions':<16}{'messages':<10}{'session reads':>15}"
+                f"{'session writes':>16}{'other writes':>14}"
+            )
+            for index, (session_backend, message_backend) in enumerate(CONFIGURATIONS):
+                listings = available[index * bookings:(index + 1) * bookings]
+                with override_settings(
+                    SESSION_ENGINE=settings.SESSION_ENGINES[session_backend],
+                    MESSAGE_STORAGE=settings.MESSAGE_STORAGES[message_backend],
+                    # Keep benchmark sessions out of the shared session cache.
+                    SESSION_CACHE_ALIAS="default",
+                ), CaptureQueriesContext(connection) as queries:
+                    self.run_flow(buyers[index], listings)
+
+                reads, writes, other = _classify(queries.captured_queries)
+                self.stdout.write(
+                    f"{session_backend:<16}{message_backend:<10}"
+                    f"{reads / bookings:>15.1f}{writes / bookings:>16.1f}{other / bookings:>14.1f}"
+                )
+            self.stdout.write("Figures are per booking (dashboard GET + booking POST + redirect), login included.")
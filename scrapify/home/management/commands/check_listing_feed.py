@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from home import feed, regions
+
+
+class Command(BaseCommand):
+    help = "Verify the buyer feed matches the AVAILABLE listings; optionally repair it."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--repair", action="store_true", help="Resync every inconsistent listing.")
+
+    def handle(self, *args, **options):
+        inconsistent = []
+        for region in regions.region_names():
+            with regions.use_region(region):
+                missing, stale, orphans = feed.find_inconsistencies(chunk_size=options["chunk_size"])
+                problems = missing + stale + orphans
+                self.stdout.write(
+                    f"{region}: missing: {len(missing)}  stale: {len(stale)}  orphaned: {len(orphans)}"
+                )
+                if problems and options["repair"]:
+                    with regions.atomic():
+                        feed.sync_listings(problems)
+                    self.stdout.write(self.style.SUCCESS(f"{region}: resynced {len(problems)} listings."))
+                else:
+                    inconsistent.extend(problems)
+
+        if inconsistent:
+            raise CommandError(f"Listing feed is inconsistent for listing ids: {sorted(inconsistent)[:50]}")
+        self.stdout.write(self.style.SUCCESS("Listing feed is consistent."))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from home import regions
+from home.auctions import close_due_auctions
+
+
+class Command(BaseCommand):
+    help = "Close auctions past their end time and create the winner's pickup order."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running, closing auctions as they expire.",
+        )
+        parser.add_argument("--interval", type=float, default=30.0, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        total_won = 0
+        total_unsold = 0
+
+        while True:
+            batches = regions.fan_out(lambda: close_due_auctions(batch_size=options["batch_size"]))
+            won = sum(won for won, _ in batches.values())
+            unsold = sum(unsold for _, unsold in batches.values())
+            total_won += won
+            total_unsold += unsold
+            if won or unsold:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Closed {total_won + total_unsold} auctions ({total_won} won, {total_unsold} unsold).")
+        )
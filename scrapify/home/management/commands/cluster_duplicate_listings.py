@@ -0,0 +1,116 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from home import changelog, duplicates, feed, regions
+from home.models import ListingFingerprint, ListingLshBucket, ScrapListing
+from home.notifications import notify_listing_status_change
+
+
+def _index_missing(batch_size):
+    indexed = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            ScrapListing.objects.filter(pk__gt=last_pk, fingerprint__isnull=True)
+            .only("pk", "seller_id", "category_id", "description", "location")
+            .order_by("pk")[:batch_size]
+        )
+        if not batch:
+            return indexed
+        indexed += duplicates.index_listings(batch)
+        last_pk = batch[-1].pk
+
+
+def _available_listings():
+    # Auctions end on their own; switching one off would strand its bids.
+    return ScrapListing.objects.filter(status=ScrapListing.Status.AVAILABLE, sale_mode=ScrapListing.SaleMode.FIXED)
+
+
+def _clusters(threshold):
+    """Groups of available listings that are near-duplicates of each other, oldest first."""
+    available = _available_listings()
+    shared = (
+        ListingLshBucket.objects.filter(listing__in=available)
+        .values("bucket")
+        .annotate(listings=Count("listing_id"))
+        .filter(listings__gt=1)
+        .values_list("bucket", flat=True)
+    )
+    pairs = set()
+    members = {}
+    for bucket, listing_id in ListingLshBucket.objects.filter(bucket__in=shared, listing__in=available).values_list(
+        "bucket", "listing_id"
+    ).order_by("bucket"):
+        members.setdefault(bucket, []).append(listing_id)
+    for listing_ids in members.values():
+        for index, first in enumerate(listing_ids):
+            pairs.update((first, second) for second in listing_ids[index + 1:])
+
+    signatures = {
+        listing_id: duplicates.unpack(data)
+        for listing_id, data in ListingFingerprint.objects.filter(
+            listing_id__in={listing_id for pair in pairs for listing_id in pair}
+        ).values_list("listing_id", "signature")
+    }
+    # Union-find over the candidate pairs that really are similar.
+    parent = {}
+
+    def root(listing_id):
+        while parent.get(listing_id, listing_id) != listing_id:
+            listing_id = parent[listing_id]
+        return listing_id
+
+    for first, second in pairs:
+        if duplicates.similarity(signatures[first], signatures[second]) >= threshold:
+            first_root, second_root = root(first), root(second)
+            if first_root != second_root:
+                parent[max(first_root, second_root)] = min(first_root, second_root)
+
+    groups = {}
+    for listing_id in parent:
+        groups.setdefault(root(listing_id), set()).add(listing_id)
+    return [sorted(group | {key}) for key, group in sorted(groups.items())]
+
+
+class Command(BaseCommand):
+    help = (
+        "Fingerprint listings that have none yet and report groups of near-duplicate available listings; "
+        "--deactivate keeps the oldest listing of each group and marks the reposts inactive."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--threshold", type=float, default=settings.DUPLICATE_LISTING_THRESHOLD)
+        parser.add_argument("--deactivate", action="store_true")
+
+    def handle(self, *args, **options):
+        def cluster():
+            indexed = _index_missing(options["batch_size"])
+            clusters = _clusters(options["threshold"])
+            reposts = [listing_id for group in clusters for listing_id in group[1:]]
+            if options["deactivate"] and reposts:
+                now = timezone.now()
+                with regions.atomic():
+                    listings = list(
+                        _available_listings().filter(pk__in=reposts).select_related("seller__user", "category")
+                    )
+                    ScrapListing.objects.filter(pk__in=[listing.pk for listing in listings]).update(
+                        status=ScrapListing.Status.INACTIVE,
+                        updated_at=now,
+                    )
+                    changelog.record(ScrapListing.objects.filter(pk__in=[listing.pk for listing in listings]))
+                    for listing in listings:
+                        previous_status, listing.status = listing.status, ScrapListing.Status.INACTIVE
+                        notify_listing_status_change(listing, previous_status)
+                    feed.sync_listings([listing.pk for listing in listings])
+            return indexed, clusters
+
+        for region, (indexed, clusters) in regions.fan_out(cluster).items():
+            self.stdout.write(f"{region}: fingerprinted {indexed} listings.")
+            for group in clusters:
+                self.stdout.write(f"  listing #{group[0]} reposted as " + ", ".join(f"#{pk}" for pk in group[1:]))
+            reposts = sum(len(group) - 1 for group in clusters)
+            verb = "deactivated" if options["deactivate"] else "found"
+            self.stdout.write(self.style.SUCCESS(f"{region}: {verb} {reposts} reposts in {len(clusters)} groups."))
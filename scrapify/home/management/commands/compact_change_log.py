@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from home import changelog, regions
+
+
+class Command(BaseCommand):
+    help = "Drop change log entries that a later entry for the same row supersedes, and old deletion entries."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.CHANGE_LOG_COMPACT_AFTER_DAYS,
+            help="Only compact entries older than this many days.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--pause", type=float, default=0.05, help="Seconds to sleep between chunks.")
+
+    def handle(self, *args, **options):
+        dropped = regions.fan_out(
+            lambda: changelog.compact(
+                days=options["days"],
+                chunk_size=options["chunk_size"],
+                pause=options["pause"],
+            )
+        )
+        for region, count in dropped.items():
+            self.stdout.write(self.style.SUCCESS(f"{region}: dropped {count} change log entries."))
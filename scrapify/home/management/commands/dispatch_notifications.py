@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from home import regions
+from home.notifications import dispatch_pending
+
+
+class Command(BaseCommand):
+    help = "Deliver queued booking and listing notifications in per-recipient batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=settings.NOTIFICATION_BATCH_SIZE)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling the outbox instead of exiting once it is drained.",
+        )
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        connection = get_connection(settings.NOTIFICATION_EMAIL_BACKEND)
+        total_notifications = 0
+        total_messages = 0
+
+        while True:
+            batches = regions.fan_out(lambda: dispatch_pending(options["batch_size"], connection=connection))
+            notifications = sum(count for count, _ in batches.values())
+            sent = sum(sent for _, sent in batches.values())
+            total_notifications += notifications
+            total_messages += sent
+            if notifications:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Dispatched {total_notifications} notifications in {total_messages} messages."
+            )
+        )
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from home import changelog, geocoding, regions
+from home.models import GeocodeCache, ScrapListing, SellerProfile
+
+
+def _backfill(queryset, address_field, batch_size, save_batch):
+    """Geocode queryset rows in primary-key batches. Returns (seen, located)."""
+    seen = located = 0
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).only("pk", address_field).order_by("pk")[:batch_size])
+        if not batch:
+            return seen, located
+        located += geocoding.locate(batch, address_field)
+        save_batch(batch)
+        seen += len(batch)
+        last_pk = batch[-1].pk
+
+
+class Command(BaseCommand):
+    help = "Resolve coordinates for seller pickup addresses and listing locations from the offline gazetteer."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Re-resolve rows that already have coordinates, not just the missing ones.",
+        )
+        parser.add_argument(
+            "--refresh",
+            action="store_true",
+            help="Empty the geocode cache first; use after replacing the gazetteer. Implies --all.",
+        )
+
+    def handle(self, *args, **options):
+        index = geocoding.gazetteer()
+        if index is None:
+            raise CommandError("No gazetteer file found; set DJANGO_GEOCODER_GAZETTEER.")
+        self.stdout.write(f"Loaded {index.size} gazetteer places.")
+        if options["refresh"]:
+            GeocodeCache.objects.all().delete()
+        batch_size = options["batch_size"]
+        pending = {} if options["all"] or options["refresh"] else {"latitude__isnull": True}
+
+        def save_profiles(batch):
+            SellerProfile.objects.bulk_update(batch, ["latitude", "longitude"])
+            # bulk_update sends no post_save, so refresh the region copies here.
+            regions.replicate(SellerProfile.objects.filter(pk__in=[profile.pk for profile in batch]))
+
+        seen, located = _backfill(SellerProfile.objects.filter(**pending), "pickup_address", batch_size, save_profiles)
+        self.stdout.write(self.style.SUCCESS(f"Located {located} of {seen} seller pickup addresses."))
+
+        def backfill_listings():
+            def save_listings(batch):
+                with regions.atomic():
+                    ScrapListing.objects.bulk_update(batch, ["latitude", "longitude"])
+                    changelog.record(ScrapListing.objects.filter(pk__in=[listing.pk for listing in batch]))
+
+            return _backfill(ScrapListing.objects.filter(**pending), "location", batch_size, save_listings)
+
+        for region, (seen, located) in regions.fan_out(backfill_listings).items():
+            self.stdout.write(self.style.SUCCESS(f"{region}: located {located} of {seen} listing locations."))
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from home import regions, thumbnails
+from home.thumbnails import process_pending
+
+
+class Command(BaseCommand):
+    help = "Generate resized, compressed thumbnails for newly uploaded listing photos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new uploads instead of exiting once the queue is empty.",
+        )
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        if thumbnails.Image is None:
+            # Leave the uploads pending for a worker that has Pillow.
+            raise CommandError("Pillow is required to generate listing thumbnails.")
+
+        total_processed = 0
+        total_failed = 0
+
+        while True:
+            batches = regions.fan_out(lambda: process_pending(options["batch_size"]))
+            processed = sum(processed for processed, _ in batches.values())
+            failed = sum(failed for _, failed in batches.values())
+            total_processed += processed
+            total_failed += failed
+            if processed or failed:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Processed {total_processed} photos ({total_failed} unreadable).")
+        )
@@ -0,0 +1,61 @@
+import glob
+import os
+import pstats
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+SORT_KEYS = ("cumulative", "tottime", "ncalls")
+
+
+def _shorten(name):
+    """Trim site-packages/project prefixes so rows stay readable."""
+    for marker in ("site-packages" + os.sep, str(settings.BASE_DIR) + os.sep):
+        if marker in name:
+            return name.split(marker, 1)[1]
+    return name
+
+
+class Command(BaseCommand):
+    help = "Merge the cProfile dumps written by ProfilingMiddleware and rank the hottest functions per URL name."
+
+    def add_arguments(self, parser):
+        parser.add_argument("url_names", nargs="*", help="Only report these URL names (default: all).")
+        parser.add_argument("--dir", default=str(settings.PROFILING_DIR), help="Directory holding the dumps.")
+        parser.add_argument("--sort", choices=SORT_KEYS, default="tottime")
+        parser.add_argument("--limit", type=int, default=20, help="Functions to show per URL name.")
+        parser.add_argument("--delete", action="store_true", help="Remove the dumps once reported.")
+
+    def handle(self, *args, **options):
+        dumps = defaultdict(list)
+        for path in sorted(glob.glob(os.path.join(options["dir"], "*.prof"))):
+            url_name = os.path.basename(path).split(".", 1)[0]
+            if not options["url_names"] or url_name in options["url_names"]:
+                dumps[url_name].append(path)
+
+        if not dumps:
+            self.stdout.write(f"No profile dumps found in {options['dir']}.")
+            return
+
+        sort_index = {"ncalls": 0, "tottime": 1, "cumulative": 2}[options["sort"]]
+        for url_name, paths in sorted(dumps.items()):
+            stats = pstats.Stats(*paths)
+            requests = len(paths)
+            self.stdout.write(
+                f"\n== {url_name}: {requests} request(s), "
+                f"{stats.total_tt / requests * 1000:.1f} ms profiled per request =="
+            )
+            self.stdout.write(f"{'calls/req':>10}{'own ms/req':>12}{'cum ms/req':>12}  function")
+            rows = [
+                (calls / requests, own / requests * 1000, cumulative / requests * 1000, pstats.func_std_string(func))
+                for func, (_, calls, own, cumulative, _) in stats.stats.items()
+            ]
+            rows.sort(key=lambda row: row[sort_index], reverse=True)
+            for calls, own, cumulative, name in rows[:options["limit"]]:
+                self.stdout.write(f"{calls:>10.1f}{own:>12.2f}{cumulative:>12.2f}  {_shorten(name)}")
+
+        if options["delete"]:
+            for paths in dumps.values():
+                for path in paths:
+                    os.remove(path)
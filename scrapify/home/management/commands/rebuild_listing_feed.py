@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from home import feed, regions
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized buyer feed (ListingFeedEntry) from the listing tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for region in regions.region_names():
+            with regions.use_region(region), regions.atomic():
+                total = feed.rebuild(chunk_size=options["chunk_size"])
+            self.stdout.write(self.style.SUCCESS(f"{region}: rebuilt {total} feed entries."))
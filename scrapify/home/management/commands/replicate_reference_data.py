@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from home import regions
+from home.signals import REFERENCE_MODELS
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy users, profiles and categories from 'default' into every region database. "
+        "Run after creating or migrating a region database; saves keep the copies current from then on."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not regions.is_sharded():
+            self.stdout.write("Only one region is configured; nothing to copy.")
+            return
+        for model in REFERENCE_MODELS:
+            copied = 0
+            last_pk = 0
+            while True:
+                chunk = list(model._base_manager.filter(pk__gt=last_pk).order_by("pk")[:options["chunk_size"]])
+                if not chunk:
+                    break
+                regions.replicate(chunk)
+                copied += len(chunk)
+                last_pk = chunk[-1].pk
+            self.stdout.write(self.style.SUCCESS(f"Copied {copied} {model._meta.verbose_name_plural}."))
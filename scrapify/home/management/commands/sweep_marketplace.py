@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from home import idempotency, regions
+from home.sweeper import sweep_marketplace
+
+
+class Command(BaseCommand):
+    help = (
+        "Cancel confirmed orders whose pickup is long overdue, giving the quantity back to their listings, "
+        "and deactivate fixed-price listings nobody has touched for a long time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--listing-ttl-days",
+            type=int,
+            default=settings.LISTING_TTL_DAYS,
+            help="Deactivate available listings untouched for this many days.",
+        )
+        parser.add_argument(
+            "--no-show-hours",
+            type=int,
+            default=settings.NO_SHOW_GRACE_HOURS,
+            help="Cancel confirmed orders this many hours past their scheduled pickup.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=200)
+        parser.add_argument("--pause", type=float, default=0.05, help="Seconds to sleep between chunks.")
+
+    def handle(self, *args, **options):
+        swept = regions.fan_out(
+            lambda: sweep_marketplace(
+                listing_ttl_days=options["listing_ttl_days"],
+                no_show_hours=options["no_show_hours"],
+                chunk_size=options["chunk_size"],
+                pause=options["pause"],
+            )
+        )
+        for region, (orders, listings) in swept.items():
+            self.stdout.write(
+                self.style.SUCCESS(f"{region}: cancelled {orders} no-show orders and deactivated {listings} stale listings.")
+            )
+        purged = idempotency.purge_expired(chunk_size=options["chunk_size"], pause=options["pause"])
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} expired idempotency keys."))
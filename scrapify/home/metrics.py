@@ -0,0 +1,169 @@
+"""
+A small Prometheus-style metrics registry that works across worker processes.
+
+Each process keeps its samples in memory and snapshots them to its own
+JSON file in METRICS_DIR at most every METRICS_FLUSH_INTERVAL seconds
+(write to a temp file, then rename, so readers never see half a file).
+The /metrics view sums every process file, so any gunicorn worker can
+answer a scrape for the whole server.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = {}
+_samples = {}
+_lock = threading.Lock()
+_process_file = f"{os.getpid()}-{time.time_ns()}.json"
+_last_flush = 0.0
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _registry[name] = self
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return json.dumps([self.name, [[label, str(labels[label])] for label in self.labelnames]])
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            _samples[key] = _samples.get(key, 0) + amount
+        _maybe_flush()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            # [per-bucket counts..., +Inf count, sum]
+            sample = _samples.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+            sample[bisect_left(self.buckets, value)] += 1
+            sample[-1] += value
+        _maybe_flush()
+
+
+def _maybe_flush(force=False):
+    global _last_flush
+    now = time.monotonic()
+    if not force and now - _last_flush < settings.METRICS_FLUSH_INTERVAL:
+        return
+    with _lock:
+        snapshot = json.dumps(_samples)
+        _last_flush = now
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    path = os.path.join(settings.METRICS_DIR, _process_file)
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w") as handle:
+        handle.write(snapshot)
+    os.replace(temp_path, path)
+
+
+atexit.register(_maybe_flush, force=True)
+
+
+def _collect():
+    """Sum the samples of every process file; this process is flushed first."""
+    _maybe_flush(force=True)
+    totals = {}
+    for name in os.listdir(settings.METRICS_DIR):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(settings.METRICS_DIR, name)) as handle:
+                samples = json.load(handle)
+        except (OSError, ValueError):
+            continue
+        for key, value in samples.items():
+            if isinstance(value, list):
+                current = totals.setdefault(key, [0] * len(value))
+                totals[key] = [left + right for left, right in zip(current, value)]
+            else:
+                totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{label}="{_escape(value)}"' for label, value in pairs) + "}"
+
+
+def render():
+    """Return every registered metric in the Prometheus text exposition format."""
+    by_metric = {}
+    for key, value in _collect().items():
+        name, pairs = json.loads(key)
+        by_metric.setdefault(name, []).append((pairs, value))
+
+    lines = []
+    for name, metric in sorted(_registry.items()):
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for pairs, value in sorted(by_metric.get(name, [])):
+            if metric.kind == "counter":
+                lines.append(f"{name}{_format_labels(pairs)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip([*metric.buckets, "+Inf"], value[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels([*pairs, ['le', str(bound)]])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(pairs)} {value[-1]}")
+            lines.append(f"{name}_count{_format_labels(pairs)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+bookings = Counter(
+    "scrapify_bookings_total",
+    "Booking attempts from the buyer dashboard, by outcome.",
+    ["outcome"],
+)
+listings_created = Counter(
+    "scrapify_listings_created_total",
+    "Listings created from the seller dashboard, by sale mode.",
+    ["sale_mode"],
+)
+logins = Counter(
+    "scrapify_logins_total",
+    "Login attempts through the buyer and seller auth pages, by outcome.",
+    ["role", "outcome"],
+)
+request_duration = Histogram(
+    "scrapify_request_duration_seconds",
+    "Wall time spent handling a request, by URL name.",
+    ["view"],
+)
+request_db_duration = Histogram(
+    "scrapify_request_db_duration_seconds",
+    "Time spent in database queries while handling a request, by URL name.",
+    ["view"],
+)
@@ -0,0 +1,239 @@
+import cProfile
+import hmac
+import mimetypes
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import FileResponse, HttpResponseNotModified
+from django.middleware.gzip import GZipMiddleware
+from django.urls import reverse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+
+from . import metrics, regions
+
+
+HASHED_NAME_RE = re.compile(r"\.[0-9a-f]{12}\.[A-Za-z0-9]+$")
+ENCODING_SUFFIXES = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _accepted_encodings(header):
+    accepted = set()
+    for part in header.split(","):
+        token, *params = part.split(";")
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(token.strip().lower())
+    return accepted
+
+
+class StaticAssetMiddleware:
+    """
+    Serve collected static files from STATIC_ROOT ahead of the URL resolver.
+
+    Hashed (fingerprinted) names get far-future immutable caching, and the
+    precompressed `.br` / `.gz` sibling written by collectstatic is picked
+    from Accept-Encoding, so nothing is compressed per request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.static_url = settings.STATIC_URL or ""
+        if not self.static_url.startswith("/"):
+            self.static_url = "/" + self.static_url
+        self.static_root = str(settings.STATIC_ROOT) if settings.STATIC_ROOT else ""
+
+    def __call__(self, request):
+        if (
+            self.static_root
+            and request.method in ("GET", "HEAD")
+            and request.path_info.startswith(self.static_url)
+        ):
+            response = self.serve(request, request.path_info[len(self.static_url):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        if not name or name.endswith((".gz", ".br")):
+            return None
+        try:
+            path = safe_join(self.static_root, name)
+        except ValueError:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        stat = os.stat(path)
+        headers = {
+            "Cache-Control": self.cache_control(name),
+            "Last-Modified": http_date(stat.st_mtime),
+            "Vary": "Accept-Encoding",
+        }
+        if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+        if if_modified_since is not None and int(stat.st_mtime) <= if_modified_since:
+            response = HttpResponseNotModified()
+            for header, value in headers.items():
+                response[header] = value
+            return response
+
+        content_type, _ = mimetypes.guess_type(name)
+        content_type = content_type or "application/octet-stream"
+        serve_path, encoding = path, None
+        accepted = _accepted_encodings(request.headers.get("Accept-Encoding", ""))
+        for candidate, suffix in ENCODING_SUFFIXES:
+            if candidate in accepted and os.path.isfile(path + suffix):
+                serve_path, encoding = path + suffix, candidate
+                break
+
+        response = FileResponse(
+            open(serve_path, "rb"),
+            content_type=content_type,
+            filename=os.path.basename(name),
+        )
+        for header, value in headers.items():
+            response[header] = value
+        if encoding:
+            response["Content-Encoding"] = encoding
+        return response
+
+    def cache_control(self, name):
+        if HASHED_NAME_RE.search(name):
+            return f"public, max-age={settings.STATIC_HASHED_MAX_AGE}, immutable"
+        return f"public, max-age={settings.STATIC_UNHASHED_MAX_AGE}"
+
+
+class HtmlGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware limited to HTML. Static assets are already precompressed
+    by StaticAssetMiddleware, and streaming responses are compressed chunk
+    by chunk by the parent class rather than buffered.
+    """
+
+    def process_response(self, request, response):
+        if not response.get("Content-Type", "").startswith("text/html"):
+            return response
+        return super().process_response(request, response)
+
+
+class ProfilingMiddleware:
+    """
+    Run cProfile around a sampled share of requests, or around any request
+    whose X-Profile header carries PROFILING_TOKEN, and write the pstats dump
+    to PROFILING_DIR named after the URL name it resolved to. Forced
+    requests get the dump file name back in an X-Profile-Dump header.
+
+    Only one profiler may be active per interpreter, so a request that
+    overlaps one already being profiled is served unprofiled.
+    """
+
+    profiling = threading.Lock()
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.token = settings.PROFILING_TOKEN
+        if self.sample_rate <= 0 and not self.token:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        forced = bool(self.token) and hmac.compare_digest(
+            request.headers.get("X-Profile", "").encode(),
+            self.token.encode(),
+        )
+        if not forced and random.random() >= self.sample_rate:
+            return self.get_response(request)
+        if not self.profiling.acquire(blocking=False):
+            return self.get_response(request)
+
+        try:
+            profiler = cProfile.Profile()
+            response = profiler.runcall(self.get_response, request)
+        finally:
+            self.profiling.release()
+        match = getattr(request, "resolver_match", None)
+        url_name = match.url_name if match and match.url_name else "unresolved"
+        dump_name = f"{url_name}.{int(time.time())}.{uuid.uuid4().hex[:8]}.prof"
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(settings.PROFILING_DIR, dump_name))
+        if forced:
+            response["X-Profile-Dump"] = dump_name
+        return response
+
+
+class MetricsMiddleware:
+    """Record request wall time and the share of it spent in SQL, per URL name."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        db_seconds = 0.0
+
+        def time_query(execute, sql, params, many, context):
+            nonlocal db_seconds
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                db_seconds += time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(time_query))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, "resolver_match", None)
+        view = match.url_name if match and match.url_name else "unresolved"
+        metrics.request_duration.observe(elapsed, view=view)
+        metrics.request_db_duration.observe(db_seconds, view=view)
+        return response
+
+
+class RegionMiddleware:
+    """
+    Select the region database for the request: the signed-in buyer's or
+    seller's region, or for staff in the admin the region picked with
+    ?set_region=, remembered in the session. Must come after
+    AuthenticationMiddleware.
+    """
+
+    session_key = "admin_region"
+    switch_param = "set_region"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not regions.is_sharded():
+            return self.get_response(request)
+        if request.user.is_staff and request.path_info.startswith(reverse("admin:index")):
+            if self.switch_param in request.GET:
+                # Not a changelist filter; take it out before the admin sees it.
+                request.GET = request.GET.copy()
+                region = request.GET.pop(self.switch_param)[-1]
+                if region in regions.region_names():
+                    request.session[self.session_key] = region
+            region = request.session.get(self.session_key)
+        else:
+            region = regions.region_of(request.user)
+        request.region = region or regions.default_region()
+        with regions.use_region(request.region):
+            return self.get_response(request)
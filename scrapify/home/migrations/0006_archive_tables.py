@@ -0,0 +1,58 @@
+# Generated by Django 6.0.2 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0005_listingphoto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPickupOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('listing_id', models.BigIntegerField(db_index=True)),
+                ('bid_id', models.BigIntegerField(blank=True, null=True)),
+                ('quantity_kg', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('price_per_kg', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('scheduled_pickup_at', models.DateTimeField(blank=True, null=True)),
+                ('pickup_address', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('placed', 'Placed'), ('confirmed', 'Confirmed'), ('picked_up', 'Picked Up'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], max_length=15)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('buyer', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_orders', to='home.buyerprofile')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_orders', to='home.scrapcategory')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_orders', to='home.sellerprofile')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['buyer', '-created_at'], name='home_archiv_buyer_i_8cbac0_idx'), models.Index(fields=['seller', '-created_at'], name='home_archiv_seller__4b0ced_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedScrapListing',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('description', models.TextField()),
+                ('quantity_kg', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('price_per_kg', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('location', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('available', 'Available'), ('reserved', 'Reserved'), ('sold', 'Sold'), ('inactive', 'Inactive')], max_length=15)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_listings', to='home.scrapcategory')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_listings', to='home.sellerprofile')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['seller', '-created_at'], name='home_archiv_seller__03122d_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 6.0.2 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_feed(apps, schema_editor):
+    ScrapListing = apps.get_model('home', 'ScrapListing')
+    ListingFeedEntry = apps.get_model('home', 'ListingFeedEntry')
+    ListingPhoto = apps.get_model('home', 'ListingPhoto')
+    thumbnails = {}
+    for photo in ListingPhoto.objects.exclude(thumbnail='').order_by('-created_at'):
+        thumbnails[photo.listing_id] = photo.thumbnail.url
+    listings = ScrapListing.objects.filter(status='available').select_related('seller', 'category')
+    ListingFeedEntry.objects.bulk_create(
+        [
+            ListingFeedEntry(
+                listing_id=listing.pk,
+                seller_id=listing.seller_id,
+                seller_name=listing.seller.business_name,
+                category_id=listing.category_id,
+                category_name=listing.category.name,
+                description=listing.description,
+                quantity_kg=listing.quantity_kg,
+                price_per_kg=listing.price_per_kg,
+                location=listing.location,
+                thumbnail_url=thumbnails.get(listing.pk, ''),
+                listed_at=listing.created_at,
+            )
+            for listing in listings.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0006_archive_tables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingFeedEntry',
+            fields=[
+                ('listing', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='feed_entry', serialize=False, to='home.scraplisting')),
+                ('seller_id', models.BigIntegerField(db_index=True)),
+                ('seller_name', models.CharField(max_length=255)),
+                ('category_id', models.BigIntegerField()),
+                ('category_name', models.CharField(max_length=120)),
+                ('description', models.TextField()),
+                ('quantity_kg', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('price_per_kg', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('location', models.CharField(max_length=255)),
+                ('thumbnail_url', models.CharField(blank=True, max_length=500)),
+                ('listed_at', models.DateTimeField()),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Listing feed entries',
+                'ordering': ['-listed_at'],
+                'indexes': [models.Index(fields=['-listed_at'], name='feed_listed_at_idx'), models.Index(fields=['category_id', '-listed_at'], name='feed_category_listed_idx')],
+            },
+        ),
+        migrations.RunPython(populate_feed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 6.0.2 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0007_listingfeedentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listingfeedentry',
+            name='auction_ends_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='listingfeedentry',
+            name='bid_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='listingfeedentry',
+            name='sale_mode',
+            field=models.CharField(choices=[('fixed', 'Fixed price'), ('auction', 'Auction')], default='fixed', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='listingfeedentry',
+            name='top_bid_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='scraplisting',
+            name='auction_ends_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='scraplisting',
+            name='bid_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='scraplisting',
+            name='sale_mode',
+            field=models.CharField(choices=[('fixed', 'Fixed price'), ('auction', 'Auction')], default='fixed', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='scraplisting',
+            name='top_bid_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='scraplisting',
+            name='top_bidder',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='leading_auctions', to='home.buyerprofile'),
+        ),
+        migrations.AddIndex(
+            model_name='scraplisting',
+            index=models.Index(fields=['sale_mode', 'status', 'auction_ends_at'], name='home_scrapl_sale_mo_2ec54a_idx'),
+        ),
+    ]
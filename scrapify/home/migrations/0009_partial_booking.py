@@ -0,0 +1,38 @@
+# Generated by Django 6.0.2 on 2026-10-18 10:00
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def fill_remaining_kg(apps, schema_editor):
+    ScrapListing = apps.get_model('home', 'ScrapListing')
+    ListingFeedEntry = apps.get_model('home', 'ListingFeedEntry')
+    ScrapListing.objects.exclude(status__in=['reserved', 'sold']).update(remaining_kg=models.F('quantity_kg'))
+    ListingFeedEntry.objects.update(remaining_kg=models.F('quantity_kg'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0008_auction_mode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scraplisting',
+            name='remaining_kg',
+            field=models.DecimalField(blank=True, decimal_places=2, default=Decimal('0.00'), max_digits=10),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='listingfeedentry',
+            name='remaining_kg',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.RunPython(fill_remaining_kg, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='scraplisting',
+            constraint=models.CheckConstraint(condition=models.Q(('remaining_kg__gte', Decimal('0.00')), ('remaining_kg__lte', models.F('quantity_kg'))), name='listing_remaining_within_quantity'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 6.0.2 on 2026-10-18 23:26
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def date_completed_orders(apps, schema_editor):
+    # The best record of when an already completed order completed.
+    for model_name in ('PickupOrder', 'ArchivedPickupOrder'):
+        model = apps.get_model('home', model_name)
+        model.objects.filter(status='completed', completed_at__isnull=True).update(completed_at=models.F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0009_partial_booking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedpickuporder',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pickuporder',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='SellerSalesDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders_count', models.PositiveIntegerField(default=0)),
+                ('quantity_kg', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('day', models.DateField()),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='home.scrapcategory')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='home.sellerprofile')),
+            ],
+            options={
+                'verbose_name_plural': 'Seller sales (daily)',
+                'ordering': ['-day'],
+                'constraints': [models.UniqueConstraint(fields=('seller', 'day', 'category'), name='sales_daily_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SellerSalesMonthly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders_count', models.PositiveIntegerField(default=0)),
+                ('quantity_kg', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('month', models.DateField(help_text='First day of the month.')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='home.scrapcategory')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='home.sellerprofile')),
+            ],
+            options={
+                'verbose_name_plural': 'Seller sales (monthly)',
+                'ordering': ['-month'],
+                'constraints': [models.UniqueConstraint(fields=('seller', 'month', 'category'), name='sales_monthly_unique')],
+            },
+        ),
+        migrations.RunPython(date_completed_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0.2 on 2026-10-18 23:33
+
+import home.regions
+from django.db import migrations, models
+
+
+def copy_seller_regions(apps, schema_editor):
+    ScrapListing = apps.get_model('home', 'ScrapListing')
+    SellerProfile = apps.get_model('home', 'SellerProfile')
+    db_alias = schema_editor.connection.alias
+    ScrapListing.objects.using(db_alias).update(
+        region=models.Subquery(
+            SellerProfile.objects.using(db_alias).filter(pk=models.OuterRef('seller_id')).values('region')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0010_seller_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='buyerprofile',
+            name='region',
+            field=models.CharField(db_index=True, default=home.regions.default_region, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='scraplisting',
+            name='region',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='sellerprofile',
+            name='region',
+            field=models.CharField(db_index=True, default=home.regions.default_region, max_length=32),
+        ),
+        migrations.RunPython(copy_seller_regions, migrations.RunPython.noop, hints={'regional': True}),
+    ]
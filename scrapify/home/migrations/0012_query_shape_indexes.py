@@ -0,0 +1,81 @@
+# Generated by Django 6.0.2 on 2026-10-18 23:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0011_regions'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='archivedpickuporder',
+            name='home_archiv_buyer_i_8cbac0_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='archivedpickuporder',
+            name='home_archiv_seller__4b0ced_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='archivedscraplisting',
+            name='home_archiv_seller__03122d_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='pickuporder',
+            name='home_pickup_buyer_i_82da19_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='pickuporder',
+            name='home_pickup_seller__dedad9_idx',
+        ),
+        migrations.AddIndex(
+            model_name='archivedpickuporder',
+            index=models.Index(fields=['buyer', 'created_at', 'id'], name='archived_order_buyer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedpickuporder',
+            index=models.Index(fields=['buyer', 'status'], name='archived_buyer_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedpickuporder',
+            index=models.Index(fields=['seller', 'created_at', 'id'], name='archived_order_seller_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedscraplisting',
+            index=models.Index(fields=['seller', 'created_at', 'id'], name='archived_listing_seller_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listingfeedentry',
+            index=models.Index(fields=['refreshed_at'], name='feed_refreshed_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pickuporder',
+            index=models.Index(fields=['buyer', 'status', 'created_at'], name='order_buyer_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pickuporder',
+            index=models.Index(fields=['seller', 'status', 'created_at'], name='order_seller_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pickuporder',
+            index=models.Index(condition=models.Q(('status', 'cancelled'), _negated=True), fields=['buyer', 'created_at'], name='order_buyer_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pickuporder',
+            index=models.Index(condition=models.Q(('status', 'cancelled'), _negated=True), fields=['seller', 'created_at'], name='order_seller_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scrapcategory',
+            index=models.Index(fields=['updated_at'], name='category_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scraplisting',
+            index=models.Index(fields=['seller', 'created_at'], name='listing_seller_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scraplisting',
+            index=models.Index(fields=['seller', 'status'], name='listing_seller_status_idx'),
+        ),
+    ]
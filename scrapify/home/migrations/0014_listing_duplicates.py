@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-18 23:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0013_geocoding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingFingerprint',
+            fields=[
+                ('listing', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fingerprint', serialize=False, to='home.scraplisting')),
+                ('signature', models.BinaryField()),
+                ('category_id', models.BigIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ListingLshBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.BigIntegerField()),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lsh_buckets', to='home.scraplisting')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket'], name='lsh_bucket_idx')],
+            },
+        ),
+    ]
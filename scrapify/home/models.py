@@ -1,8 +1,12 @@
 from decimal import Decimal
 
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, router, transaction
+from django.utils import timezone
+
+from .regions import default_region
 
 
 class TimeStampedModel(models.Model):
@@ -13,6 +17,25 @@ class TimeStampedModel(models.Model):
 		abstract = True
 
 
+class ChangeLoggedModel(models.Model):
+	"""
+	Saves also append a ChangeLogEntry, in the same transaction. Deletes,
+	including queryset delete() and cascades, are logged by the pre_delete
+	receiver in home.signals. Queryset update(), bulk_create() and
+	bulk_update() bypass both; their callers log with home.changelog.record.
+	"""
+
+	class Meta:
+		abstract = True
+
+	def save(self, *args, **kwargs):
+		using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+		action = ChangeLogEntry.Action.CREATED if self._state.adding else ChangeLogEntry.Action.UPDATED
+		with transaction.atomic(using=using, savepoint=False):
+			super().save(*args, **kwargs)
+			ChangeLogEntry.record([self], action, using=using)
+
+
 class BuyerProfile(TimeStampedModel):
 	user = models.OneToOneField(
 		settings.AUTH_USER_MODEL,
@@ -22,6 +45,7 @@ class BuyerProfile(TimeStampedModel):
 	business_name = models.CharField(max_length=255)
 	phone_number = models.CharField(max_length=20)
 	address = models.TextField(blank=True)
+	region = models.CharField(max_length=32, default=default_region, db_index=True)
 
 	def __str__(self):
 		return self.business_name
@@ -36,6 +60,11 @@ class SellerProfile(TimeStampedModel):
 	business_name = models.CharField(max_length=255)
 	phone_number = models.CharField(max_length=20, blank=True)
 	pickup_address = models.TextField()
+	# Decides which region database holds the seller's listings and orders.
+	region = models.CharField(max_length=32, default=default_region, db_index=True)
+	# Centroid of the gazetteer place the pickup address resolved to (home.geocoding).
+	latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, editable=False)
+	longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, editable=False)
 
 	def __str__(self):
 		return self.business_name
@@ -48,18 +77,26 @@ class ScrapCategory(TimeStampedModel):
 	class Meta:
 		verbose_name_plural = "Scrap categories"
 		ordering = ["name"]
+		indexes = [
+			# Covers MAX(updated_at)/COUNT(*) for the seller dashboard etag.
+			models.Index(fields=["updated_at"], name="category_updated_idx"),
+		]
 
 	def __str__(self):
 		return self.name
 
 
-class ScrapListing(TimeStampedModel):
+class ScrapListing(ChangeLoggedModel, TimeStampedModel):
 	class Status(models.TextChoices):
 		AVAILABLE = "available", "Available"
 		RESERVED = "reserved", "Reserved"
 		SOLD = "sold", "Sold"
 		INACTIVE = "inactive", "Inactive"
 
+	class SaleMode(models.TextChoices):
+		FIXED = "fixed", "Fixed price"
+		AUCTION = "auction", "Auction"
+
 	seller = models.ForeignKey(
 		SellerProfile,
 		on_delete=models.CASCADE,
@@ -76,6 +113,13 @@ class ScrapListing(TimeStampedModel):
 		decimal_places=2,
 		validators=[MinValueValidator(Decimal("0.01"))],
 	)
+	# Unbooked part of quantity_kg. Decremented with a guarded UPDATE by
+	# home.booking.book_listing; the listing is RESERVED once it reaches 0.
+	remaining_kg = models.DecimalField(
+		max_digits=10,
+		decimal_places=2,
+		blank=True,
+	)
 	price_per_kg = models.DecimalField(
 		max_digits=10,
 		decimal_places=2,
@@ -87,12 +131,40 @@ class ScrapListing(TimeStampedModel):
 		choices=Status.choices,
 		default=Status.AVAILABLE,
 	)
+	sale_mode = models.CharField(
+		max_length=10,
+		choices=SaleMode.choices,
+		default=SaleMode.FIXED,
+	)
+	auction_ends_at = models.DateTimeField(null=True, blank=True)
+	# Current leader of an auction, maintained with conditional UPDATEs by
+	# home.auctions.place_bid rather than read-compare-write.
+	top_bid_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+	top_bidder = models.ForeignKey(
+		BuyerProfile,
+		on_delete=models.SET_NULL,
+		null=True,
+		blank=True,
+		related_name="leading_auctions",
+	)
+	bid_count = models.PositiveIntegerField(default=0)
+	# Copied from the seller on save; home.routers.RegionRouter stores the
+	# listing, its bids and its orders in this region's database.
+	region = models.CharField(max_length=32, blank=True, editable=False)
+	# Centroid of the gazetteer place the location resolved to (home.geocoding).
+	latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, editable=False)
+	longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, editable=False)
 
 	class Meta:
 		ordering = ["-created_at"]
 		indexes = [
 			models.Index(fields=["status"]),
 			models.Index(fields=["category", "status"]),
+			models.Index(fields=["sale_mode", "status", "auction_ends_at"]),
+			# Ascending columns scanned backwards give ORDER BY -created_at, -id
+			# for free: the rowid is the implicit last column of every index.
+			models.Index(fields=["seller", "created_at"], name="listing_seller_created_idx"),
+			models.Index(fields=["seller", "status"], name="listing_seller_status_idx"),
 		]
 		constraints = [
 			models.CheckConstraint(
@@ -104,13 +176,28 @@ class ScrapListing(TimeStampedModel):
 				condition=models.Q(price_per_kg__gt=Decimal("0.00")),
 				name="listing_price_gt_0",
 			),
+			models.CheckConstraint(
+				condition=models.Q(remaining_kg__gte=Decimal("0.00"), remaining_kg__lte=models.F("quantity_kg")),
+				name="listing_remaining_within_quantity",
+			),
 		]
 
+	def save(self, *args, **kwargs):
+		if self.remaining_kg is None:
+			self.remaining_kg = self.quantity_kg
+		if not self.region:
+			self.region = self.seller.region
+		super().save(*args, **kwargs)
+
+	@property
+	def booked_kg(self):
+		return self.quantity_kg - self.remaining_kg
+
 	def __str__(self):
 		return f"{self.category.name} - {self.seller.business_name}"
 
 
-class Bid(TimeStampedModel):
+class Bid(ChangeLoggedModel, TimeStampedModel):
 	class Status(models.TextChoices):
 		PENDING = "pending", "Pending"
 		ACCEPTED = "accepted", "Accepted"
@@ -169,7 +256,7 @@ class Bid(TimeStampedModel):
 		return f"Bid by {self.buyer.business_name} on {self.listing.category.name}"
 
 
-class PickupOrder(TimeStampedModel):
+class PickupOrder(ChangeLoggedModel, TimeStampedModel):
 	class Status(models.TextChoices):
 		PLACED = "placed", "Placed"
 		CONFIRMED = "confirmed", "Confirmed"
@@ -209,13 +296,26 @@ class PickupOrder(TimeStampedModel):
 		decimal_places=2,
 		validators=[MinValueValidator(Decimal("0.01"))],
 	)
+	completed_at = models.DateTimeField(null=True, blank=True)
 
 	class Meta:
 		ordering = ["-created_at"]
 		indexes = [
 			models.Index(fields=["status"]),
-			models.Index(fields=["buyer", "status"]),
-			models.Index(fields=["seller", "status"]),
+			# Status-filtered history pages and the per-status summary.
+			models.Index(fields=["buyer", "status", "created_at"], name="order_buyer_status_idx"),
+			models.Index(fields=["seller", "status", "created_at"], name="order_seller_status_idx"),
+			# The default history pages, which hide cancelled orders.
+			models.Index(
+				fields=["buyer", "created_at"],
+				condition=~models.Q(status="cancelled"),
+				name="order_buyer_active_idx",
+			),
+			models.Index(
+				fields=["seller", "created_at"],
+				condition=~models.Q(status="cancelled"),
+				name="order_seller_active_idx",
+			),
 		]
 		constraints = [
 			models.CheckConstraint(
@@ -226,3 +326,392 @@ class PickupOrder(TimeStampedModel):
 
 	def __str__(self):
 		return f"Order #{self.pk} - {self.listing.category.name}"
+
+	@classmethod
+	def from_db(cls, db, field_names, values):
+		instance = super().from_db(db, field_names, values)
+		instance._loaded_status = instance.__dict__.get("status")
+		return instance
+
+	def save(self, *args, **kwargs):
+		# completed_at dates the sale for the seller sales rollups, which the
+		# post_save handler adjusts when an order enters or leaves COMPLETED.
+		previous_status = getattr(self, "_loaded_status", None)
+		self._completion_change = None
+		if self.status == self.Status.COMPLETED and previous_status != self.Status.COMPLETED:
+			self.completed_at = self.completed_at or timezone.now()
+			self._completion_change = (1, self.completed_at)
+		elif self.status != self.Status.COMPLETED and previous_status == self.Status.COMPLETED:
+			self._completion_change = (-1, self.completed_at)
+			self.completed_at = None
+		if self._completion_change and kwargs.get("update_fields") is not None:
+			kwargs["update_fields"] = {*kwargs["update_fields"], "completed_at"}
+		super().save(*args, **kwargs)
+		self._loaded_status = self.status
+
+
+class ArchivedScrapListing(models.Model):
+	"""Cold copy of a SOLD/INACTIVE listing; keeps the original primary key."""
+
+	id = models.BigIntegerField(primary_key=True)
+	seller = models.ForeignKey(
+		SellerProfile,
+		on_delete=models.CASCADE,
+		related_name="archived_listings",
+	)
+	category = models.ForeignKey(
+		ScrapCategory,
+		on_delete=models.PROTECT,
+		related_name="archived_listings",
+	)
+	description = models.TextField()
+	quantity_kg = models.DecimalField(max_digits=10, decimal_places=2)
+	price_per_kg = models.DecimalField(max_digits=10, decimal_places=2)
+	location = models.CharField(max_length=255)
+	status = models.CharField(max_length=15, choices=ScrapListing.Status.choices)
+	created_at = models.DateTimeField()
+	updated_at = models.DateTimeField()
+	archived_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		ordering = ["-created_at"]
+		indexes = [
+			# id is not the rowid here, so it is spelled out for the -id tiebreak.
+			models.Index(fields=["seller", "created_at", "id"], name="archived_listing_seller_idx"),
+		]
+
+	def __str__(self):
+		return f"Archived listing #{self.pk}"
+
+
+class ArchivedPickupOrder(models.Model):
+	"""
+	Cold copy of a COMPLETED/CANCELLED order. The listing and bid are kept as
+	plain ids because they may live in either the hot or the archive table;
+	the accepted quantity and price are copied from the bid.
+	"""
+
+	id = models.BigIntegerField(primary_key=True)
+	listing_id = models.BigIntegerField(db_index=True)
+	bid_id = models.BigIntegerField(null=True, blank=True)
+	buyer = models.ForeignKey(
+		BuyerProfile,
+		on_delete=models.PROTECT,
+		related_name="archived_orders",
+	)
+	seller = models.ForeignKey(
+		SellerProfile,
+		on_delete=models.PROTECT,
+		related_name="archived_orders",
+	)
+	category = models.ForeignKey(
+		ScrapCategory,
+		on_delete=models.PROTECT,
+		related_name="archived_orders",
+	)
+	quantity_kg = models.DecimalField(max_digits=10, decimal_places=2)
+	price_per_kg = models.DecimalField(max_digits=10, decimal_places=2)
+	scheduled_pickup_at = models.DateTimeField(null=True, blank=True)
+	pickup_address = models.TextField(blank=True)
+	status = models.CharField(max_length=15, choices=PickupOrder.Status.choices)
+	total_amount = models.DecimalField(max_digits=12, decimal_places=2)
+	completed_at = models.DateTimeField(null=True, blank=True)
+	created_at = models.DateTimeField()
+	updated_at = models.DateTimeField()
+	archived_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		ordering = ["-created_at"]
+		indexes = [
+			models.Index(fields=["buyer", "created_at", "id"], name="archived_order_buyer_idx"),
+			models.Index(fields=["buyer", "status"], name="archived_buyer_status_idx"),
+			models.Index(fields=["seller", "created_at", "id"], name="archived_order_seller_idx"),
+		]
+
+	def __str__(self):
+		return f"Archived order #{self.pk}"
+
+
+class ListingPhoto(TimeStampedModel):
+	listing = models.ForeignKey(
+		ScrapListing,
+		on_delete=models.CASCADE,
+		related_name="photos",
+	)
+	original = models.FileField(upload_to="listing_photos/originals/%Y/%m/")
+	thumbnail = models.FileField(upload_to="listing_photos/thumbs/", blank=True)
+	content_hash = models.CharField(max_length=64, blank=True)
+	processed_at = models.DateTimeField(null=True, blank=True)
+
+	class Meta:
+		ordering = ["created_at"]
+		indexes = [
+			models.Index(
+				fields=["id"],
+				condition=models.Q(processed_at__isnull=True),
+				name="photo_unprocessed_idx",
+			),
+		]
+
+	def __str__(self):
+		return f"Photo #{self.pk} for listing #{self.listing_id}"
+
+
+class ListingFingerprint(models.Model):
+	"""MinHash signature of a listing's description and location (home.duplicates)."""
+
+	listing = models.OneToOneField(
+		ScrapListing,
+		on_delete=models.CASCADE,
+		primary_key=True,
+		related_name="fingerprint",
+	)
+	signature = models.BinaryField()
+	# The buckets are hashed with the category too, so a recategorized listing is re-indexed.
+	category_id = models.BigIntegerField()
+
+	def __str__(self):
+		return f"Fingerprint of listing #{self.listing_id}"
+
+
+class ListingLshBucket(models.Model):
+	"""One LSH band of a listing's signature, hashed with its seller and category."""
+
+	listing = models.ForeignKey(
+		ScrapListing,
+		on_delete=models.CASCADE,
+		related_name="lsh_buckets",
+	)
+	bucket = models.BigIntegerField()
+
+	class Meta:
+		indexes = [
+			models.Index(fields=["bucket"], name="lsh_bucket_idx"),
+		]
+
+	def __str__(self):
+		return f"Bucket {self.bucket} of listing #{self.listing_id}"
+
+
+class ListingFeedEntry(models.Model):
+	"""
+	Flattened, pre-joined copy of an AVAILABLE listing for the buyer feed.
+	Maintained by home.feed from the listing, seller, category and photo
+	write paths; rebuild with `manage.py rebuild_listing_feed`.
+	"""
+
+	listing = models.OneToOneField(
+		ScrapListing,
+		on_delete=models.CASCADE,
+		primary_key=True,
+		related_name="feed_entry",
+	)
+	seller_id = models.BigIntegerField(db_index=True)
+	seller_name = models.CharField(max_length=255)
+	category_id = models.BigIntegerField()
+	category_name = models.CharField(max_length=120)
+	description = models.TextField()
+	quantity_kg = models.DecimalField(max_digits=10, decimal_places=2)
+	remaining_kg = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
+	price_per_kg = models.DecimalField(max_digits=10, decimal_places=2)
+	location = models.CharField(max_length=255)
+	thumbnail_url = models.CharField(max_length=500, blank=True)
+	sale_mode = models.CharField(
+		max_length=10,
+		choices=ScrapListing.SaleMode.choices,
+		default=ScrapListing.SaleMode.FIXED,
+	)
+	auction_ends_at = models.DateTimeField(null=True, blank=True)
+	top_bid_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+	bid_count = models.PositiveIntegerField(default=0)
+	listed_at = models.DateTimeField()
+	refreshed_at = models.DateTimeField(auto_now=True)
+
+	class Meta:
+		ordering = ["-listed_at"]
+		verbose_name_plural = "Listing feed entries"
+		indexes = [
+			models.Index(fields=["-listed_at"], name="feed_listed_at_idx"),
+			models.Index(fields=["category_id", "-listed_at"], name="feed_category_listed_idx"),
+			models.Index(fields=["refreshed_at"], name="feed_refreshed_at_idx"),
+		]
+
+	def __str__(self):
+		return f"{self.category_name} - {self.seller_name}"
+
+
+class SellerSalesRollup(models.Model):
+	"""
+	Completed-order totals for one seller and category over one period.
+	Kept current by home.rollups as orders complete; rebuild with
+	`manage.py backfill_sales_rollups`.
+	"""
+
+	seller = models.ForeignKey(SellerProfile, on_delete=models.CASCADE, related_name="+")
+	category = models.ForeignKey(ScrapCategory, on_delete=models.CASCADE, related_name="+")
+	orders_count = models.PositiveIntegerField(default=0)
+	quantity_kg = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+	revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+	class Meta:
+		abstract = True
+
+	@property
+	def average_price_per_kg(self):
+		return (self.revenue / self.quantity_kg).quantize(Decimal("0.01")) if self.quantity_kg else None
+
+
+class SellerSalesDaily(SellerSalesRollup):
+	day = models.DateField()
+
+	class Meta:
+		ordering = ["-day"]
+		verbose_name_plural = "Seller sales (daily)"
+		constraints = [
+			models.UniqueConstraint(fields=["seller", "day", "category"], name="sales_daily_unique"),
+		]
+
+	def __str__(self):
+		return f"{self.seller} - {self.category} on {self.day}"
+
+
+class SellerSalesMonthly(SellerSalesRollup):
+	month = models.DateField(help_text="First day of the month.")
+
+	class Meta:
+		ordering = ["-month"]
+		verbose_name_plural = "Seller sales (monthly)"
+		constraints = [
+			models.UniqueConstraint(fields=["seller", "month", "category"], name="sales_monthly_unique"),
+		]
+
+	def __str__(self):
+		return f"{self.seller} - {self.category} in {self.month:%B %Y}"
+
+
+class NotificationOutbox(TimeStampedModel):
+	class Event(models.TextChoices):
+		LISTING_BOOKED = "listing_booked", "Listing booked"
+		LISTING_STATUS_CHANGED = "listing_status_changed", "Listing status changed"
+
+	recipient = models.ForeignKey(
+		settings.AUTH_USER_MODEL,
+		on_delete=models.CASCADE,
+		related_name="notifications",
+	)
+	event = models.CharField(max_length=40, choices=Event.choices)
+	payload = models.JSONField(default=dict, blank=True)
+	# Set by the dispatcher that is delivering the row (home.notifications).
+	claimed_at = models.DateTimeField(null=True, blank=True)
+	dispatched_at = models.DateTimeField(null=True, blank=True)
+
+	class Meta:
+		ordering = ["created_at"]
+		verbose_name_plural = "Notification outbox"
+		indexes = [
+			models.Index(
+				fields=["id"],
+				condition=models.Q(dispatched_at__isnull=True),
+				name="outbox_pending_idx",
+			),
+		]
+
+	def __str__(self):
+		return f"{self.get_event_display()} for {self.recipient}"
+
+
+class GeocodeCache(models.Model):
+	"""
+	Memoized result of resolving one normalized address against the
+	gazetteer; a row without coordinates records a miss.
+	"""
+
+	address_hash = models.CharField(max_length=64, unique=True)
+	address = models.TextField()
+	place = models.CharField(max_length=255, blank=True)
+	latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+	longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+	resolved_at = models.DateTimeField(auto_now=True)
+
+	class Meta:
+		verbose_name_plural = "Geocode cache"
+
+	def __str__(self):
+		return f"{self.address} -> {self.place or 'unresolved'}"
+
+
+class IdempotencyKey(models.Model):
+	"""
+	The outcome of one form submission, keyed by the idempotency key the
+	form was rendered with; repeats of the POST replay it (home.idempotency).
+	"""
+
+	scope = models.CharField(max_length=64)
+	key = models.CharField(max_length=64)
+	path = models.CharField(max_length=255)
+	status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+	location = models.CharField(max_length=2000, blank=True)
+	messages = models.JSONField(default=list, blank=True)
+	created_at = models.DateTimeField(auto_now_add=True)
+	completed_at = models.DateTimeField(null=True, blank=True)
+
+	class Meta:
+		constraints = [
+			models.UniqueConstraint(fields=["scope", "key"], name="idempotency_key_unique"),
+		]
+		indexes = [
+			models.Index(fields=["created_at"], name="idempotency_created_idx"),
+		]
+
+	def __str__(self):
+		return f"{self.key} ({self.scope})"
+
+
+class ChangeLogEntry(models.Model):
+	"""
+	One write to a listing, bid or order, with the row as it was afterwards
+	(before, for deletes). Appended in the transaction of the write, in the
+	row's region database; the primary key is the sequence number /changes
+	consumers resume from. Compacted by `manage.py compact_change_log`.
+	"""
+
+	class Action(models.TextChoices):
+		CREATED = "created", "Created"
+		UPDATED = "updated", "Updated"
+		DELETED = "deleted", "Deleted"
+
+	id = models.BigAutoField(primary_key=True)
+	model = models.CharField(max_length=40)
+	object_id = models.BigIntegerField()
+	action = models.CharField(max_length=10, choices=Action.choices)
+	data = models.JSONField(encoder=DjangoJSONEncoder)
+	created_at = models.DateTimeField(default=timezone.now)
+
+	class Meta:
+		ordering = ["id"]
+		verbose_name_plural = "Change log entries"
+		indexes = [
+			models.Index(fields=["model", "object_id"], name="changelog_object_idx"),
+			models.Index(fields=["created_at"], name="changelog_created_idx"),
+		]
+
+	def __str__(self):
+		return f"#{self.pk} {self.model} {self.object_id} {self.action}"
+
+	@staticmethod
+	def snapshot(instance):
+		deferred = instance.get_deferred_fields()
+		return {
+			field.attname: field.value_from_object(instance)
+			for field in instance._meta.concrete_fields
+			if field.attname not in deferred
+		}
+
+	@classmethod
+	def record(cls, instances, action, using=None):
+		cls.objects.using(using).bulk_create(
+			[
+				cls(model=instance._meta.model_name, object_id=instance.pk, action=action, data=cls.snapshot(instance))
+				for instance in instances
+			]
+		)
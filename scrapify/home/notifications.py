@@ -0,0 +1,147 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Q
+from django.utils import timezone
+
+from . import regions
+from .models import NotificationOutbox
+
+
+def enqueue(recipient, event, **payload):
+    """Queue a notification; call inside the transaction that made the change."""
+    return NotificationOutbox.objects.create(recipient=recipient, event=event, payload=payload)
+
+
+def _listing_booked_payload(order):
+    return {
+        "listing_id": order.listing.pk,
+        "order_id": order.pk,
+        "category": order.listing.category.name,
+        "buyer": order.buyer.business_name,
+        "quantity_kg": str(order.bid.quantity_kg),
+        "scheduled_pickup_at": order.scheduled_pickup_at.isoformat() if order.scheduled_pickup_at else "",
+        "total_amount": str(order.total_amount),
+    }
+
+
+def notify_listing_booked(order):
+    return enqueue(order.listing.seller.user, NotificationOutbox.Event.LISTING_BOOKED, **_listing_booked_payload(order))
+
+
+def notify_listings_booked(orders):
+    """notify_listing_booked for many orders with one INSERT."""
+    return NotificationOutbox.objects.bulk_create(
+        [
+            NotificationOutbox(
+                recipient=order.listing.seller.user,
+                event=NotificationOutbox.Event.LISTING_BOOKED,
+                payload=_listing_booked_payload(order),
+            )
+            for order in orders
+        ]
+    )
+
+
+def notify_listing_status_change(listing, previous_status):
+    if previous_status == listing.status:
+        return None
+    return enqueue(
+        listing.seller.user,
+        NotificationOutbox.Event.LISTING_STATUS_CHANGED,
+        listing_id=listing.pk,
+        category=listing.category.name,
+        previous_status=previous_status,
+        status=listing.status,
+    )
+
+
+def describe(notification):
+    payload = notification.payload
+    if notification.event == NotificationOutbox.Event.LISTING_BOOKED:
+        return (
+            f"{payload.get('buyer')} booked {payload.get('quantity_kg', 'all')} kg of your "
+            f"{payload.get('category')} listing "
+            f"for pickup at {payload.get('scheduled_pickup_at') or 'an unscheduled time'} "
+            f"(₹{payload.get('total_amount')})."
+        )
+    if notification.event == NotificationOutbox.Event.LISTING_STATUS_CHANGED:
+        return (
+            f"Your {payload.get('category')} listing moved from "
+            f"{payload.get('previous_status')} to {payload.get('status')}."
+        )
+    return notification.get_event_display()
+
+
+def _build_message(recipient, notifications):
+    count = len(notifications)
+    subject = "ScrapiFy: 1 new update" if count == 1 else f"ScrapiFy: {count} new updates"
+    body = "\n".join(f"- {describe(notification)}" for notification in notifications)
+    return EmailMessage(
+        subject=subject,
+        body=body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[recipient.email],
+    )
+
+
+def _claim_batch(batch_size):
+    """
+    Claim up to batch_size pending notifications for this dispatcher. The
+    guarded UPDATE only takes rows nobody holds (or whose claim outlived
+    NOTIFICATION_CLAIM_LEASE, a crashed dispatcher), so overlapping
+    dispatchers never send the same row twice.
+    """
+    now = timezone.now()
+    claimable = NotificationOutbox.objects.filter(dispatched_at__isnull=True).filter(
+        Q(claimed_at__isnull=True) | Q(claimed_at__lt=now - settings.NOTIFICATION_CLAIM_LEASE)
+    )
+    with regions.atomic():
+        ids = list(claimable.order_by("pk").values_list("pk", flat=True)[:batch_size])
+        claimable.filter(pk__in=ids).update(claimed_at=now)
+    return list(
+        NotificationOutbox.objects.filter(pk__in=ids, claimed_at=now, dispatched_at__isnull=True)
+        .select_related("recipient")
+        .order_by("pk")
+    )
+
+
+def dispatch_pending(batch_size=None, connection=None):
+    """
+    Deliver one batch of pending notifications, coalesced into a single
+    message per recipient. Returns (notifications_sent, messages_sent).
+    """
+    batch_size = batch_size or settings.NOTIFICATION_BATCH_SIZE
+    pending = _claim_batch(batch_size)
+    if not pending:
+        return 0, 0
+
+    by_recipient = defaultdict(list)
+    for notification in pending:
+        by_recipient[notification.recipient].append(notification)
+
+    email_messages = [
+        _build_message(recipient, notifications)
+        for recipient, notifications in by_recipient.items()
+        if recipient.email
+    ]
+
+    connection = connection or get_connection(settings.NOTIFICATION_EMAIL_BACKEND)
+    if email_messages:
+        try:
+            connection.send_messages(email_messages)
+        except Exception:
+            # Hand the rows back so the next run retries them.
+            NotificationOutbox.objects.filter(pk__in=[notification.pk for notification in pending]).update(
+                claimed_at=None
+            )
+            raise
+
+    with regions.atomic():
+        NotificationOutbox.objects.filter(
+            pk__in=[notification.pk for notification in pending],
+            dispatched_at__isnull=True,
+        ).update(dispatched_at=timezone.now())
+
+    return len(pending), len(email_messages)
@@ -0,0 +1,186 @@
+"""
+Price suggestions for new listings from the k most similar recent trades.
+
+Every process keeps, per region database, a feature matrix of the trades
+(non-cancelled orders, hot and archived) placed in the last
+PRICE_SUGGESTION_WINDOW_DAYS, split by category. Each category holds one
+float32 row per feature (scaled log quantity, north and east offsets, the
+squared age term) plus the agreed price per kg, so a lookup is a handful
+of in-place vectorized passes over one category's trades and an
+argpartition for the k nearest; no SQL runs on the request path. A matrix older than
+PRICE_SUGGESTION_REFRESH_SECONDS keeps answering while a background thread
+rebuilds it.
+"""
+
+import math
+import threading
+import time
+from array import array
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from . import regions
+from .models import ArchivedPickupOrder, PickupOrder
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for price suggestions.
+    np = None
+
+Suggestion = namedtuple("Suggestion", "price_per_kg low high trades")
+
+# One unit of distance: a 2.7x larger or smaller quantity, this many km
+# apart, or this many days older.
+QUANTITY_SCALE = 1.0
+DISTANCE_SCALE_KM = 25.0
+AGE_SCALE_DAYS = 30.0
+# Distance term for a trade without coordinates when the query has them.
+UNKNOWN_DISTANCE = 1.0
+KM_PER_DEGREE = 111.2
+
+_matrices = {}
+_rebuilding = set()
+_lock = threading.Lock()
+
+
+class TradeMatrix:
+    def __init__(self, trades, built_at=None):
+        """trades: iterable of (category_id, quantity_kg, price_per_kg, latitude, longitude, created_at)."""
+        self.built_at = built_at or timezone.now()
+        self.loaded_at = time.monotonic()
+        # Typed arrays keep a million-row build to a few dozen MB.
+        columns = defaultdict(lambda: tuple(array("d") for _ in range(5)))
+        for category_id, quantity_kg, price_per_kg, latitude, longitude, created_at in trades:
+            log_quantity, lat, lng, age, price = columns[category_id]
+            log_quantity.append(math.log(quantity_kg) / QUANTITY_SCALE)
+            lat.append(math.nan if latitude is None else latitude * KM_PER_DEGREE / DISTANCE_SCALE_KM)
+            lng.append(math.nan if longitude is None else longitude * KM_PER_DEGREE / DISTANCE_SCALE_KM)
+            age.append(((self.built_at - created_at).total_seconds() / 86400 / AGE_SCALE_DAYS) ** 2)
+            price.append(price_per_kg)
+        # category_id -> (features[4, n], prices[n]); features are pre-scaled
+        # to distance units so a lookup only subtracts and squares.
+        self.categories = {
+            category_id: (
+                np.array([np.frombuffer(column) for column in values[:4]], dtype=np.float32),
+                np.frombuffer(values[4]).copy(),
+            )
+            for category_id, values in columns.items()
+        }
+        self.size = sum(len(prices) for _, prices in self.categories.values())
+
+    def suggest(self, category_id, quantity_kg, latitude=None, longitude=None, k=None):
+        """A Suggestion from the k nearest trades of the category, or None without any."""
+        if category_id not in self.categories:
+            return None
+        features, prices = self.categories[category_id]
+        k = min(k or settings.PRICE_SUGGESTION_NEIGHBOURS, len(prices))
+
+        # Squared distance, computed in place to spare allocations.
+        distance = np.subtract(features[0], math.log(quantity_kg) / QUANTITY_SCALE)
+        np.square(distance, out=distance)
+        distance += features[3]
+        if latitude is not None and longitude is not None:
+            latitude, longitude = float(latitude), float(longitude)
+            geo = np.subtract(features[1], latitude * KM_PER_DEGREE / DISTANCE_SCALE_KM)
+            np.square(geo, out=geo)
+            east = np.subtract(features[2], longitude * KM_PER_DEGREE / DISTANCE_SCALE_KM)
+            east *= math.cos(math.radians(latitude))
+            np.square(east, out=east)
+            geo += east
+            np.nan_to_num(geo, copy=False, nan=UNKNOWN_DISTANCE)
+            distance += geo
+
+        nearest = np.argpartition(distance, k - 1)[:k] if k < len(prices) else np.arange(k)
+        neighbour_prices = prices[nearest]
+        weights = 1.0 / (1.0 + np.sqrt(distance[nearest]))
+        price = float(np.dot(weights, neighbour_prices) / weights.sum())
+        return Suggestion(
+            _money(price),
+            _money(neighbour_prices.min()),
+            _money(neighbour_prices.max()),
+            int(k),
+        )
+
+
+def _money(value):
+    return Decimal(str(round(float(value), 2))).quantize(Decimal("0.01"))
+
+
+def recent_trades(since):
+    hot = (
+        PickupOrder.objects.exclude(status=PickupOrder.Status.CANCELLED)
+        .filter(created_at__gte=since)
+        .values_list(
+            "listing__category_id",
+            "bid__quantity_kg",
+            "bid__bid_price_per_kg",
+            "listing__latitude",
+            "listing__longitude",
+            "created_at",
+        )
+    )
+    for category_id, quantity_kg, price, latitude, longitude, created_at in hot.iterator(chunk_size=10000):
+        yield category_id, float(quantity_kg), float(price), _float(latitude), _float(longitude), created_at
+    archived = ArchivedPickupOrder.objects.filter(
+        status=PickupOrder.Status.COMPLETED, created_at__gte=since
+    ).values_list("category_id", "quantity_kg", "price_per_kg", "created_at")
+    for category_id, quantity_kg, price, created_at in archived.iterator(chunk_size=10000):
+        yield category_id, float(quantity_kg), float(price), None, None, created_at
+
+
+def _float(value):
+    return None if value is None else float(value)
+
+
+def build_matrix():
+    """A TradeMatrix of the current region's recent trades."""
+    now = timezone.now()
+    return TradeMatrix(recent_trades(now - timedelta(days=settings.PRICE_SUGGESTION_WINDOW_DAYS)), built_at=now)
+
+
+def _rebuild_in_background(alias):
+    try:
+        with regions.use_database(alias):
+            matrix = build_matrix()
+        with _lock:
+            _matrices[alias] = matrix
+    finally:
+        with _lock:
+            _rebuilding.discard(alias)
+        connections.close_all()
+
+
+def trade_matrix():
+    """
+    The current region's TradeMatrix. The first call in a process builds it
+    synchronously; a stale one is returned as-is while it is rebuilt.
+    """
+    alias = regions.current_database()
+    with _lock:
+        matrix = _matrices.get(alias)
+        stale = matrix is not None and time.monotonic() - matrix.loaded_at > settings.PRICE_SUGGESTION_REFRESH_SECONDS
+        if stale and alias not in _rebuilding:
+            _rebuilding.add(alias)
+            threading.Thread(target=_rebuild_in_background, args=(alias,), daemon=True).start()
+    if matrix is None:
+        matrix = build_matrix()
+        with _lock:
+            _matrices[alias] = matrix
+    return matrix
+
+
+def reset():
+    """Forget every loaded matrix; the next lookup rebuilds."""
+    with _lock:
+        _matrices.clear()
+
+
+def suggest_price(category_id, quantity_kg, latitude=None, longitude=None):
+    if np is None:
+        raise RuntimeError("NumPy is required for price suggestions.")
+    return trade_matrix().suggest(category_id, float(quantity_kg), latitude, longitude)
@@ -0,0 +1,111 @@
+"""
+Regions: which database holds a city's marketplace data.
+
+settings.REGION_DATABASES maps each region to a database alias. The
+current alias lives in a context variable that RegionMiddleware sets from
+the signed-in user's profile (or the admin's region switcher) and that
+commands set per region with use_region(); home.routers.RegionRouter reads
+it for every listing, bid and order query that has no instance to go by.
+
+Users, profiles and categories are reference data: written to 'default'
+and copied into every region database by replicate(), so foreign keys
+from regional rows still point at a local row.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import transaction
+
+_current_database = ContextVar("scrapify_region_database", default=None)
+
+
+def default_region():
+    return next(iter(settings.REGION_DATABASES))
+
+
+def region_names():
+    return list(settings.REGION_DATABASES)
+
+
+def region_choices():
+    return [(region, region.title()) for region in region_names()]
+
+
+def database_for_region(region):
+    return settings.REGION_DATABASES.get(region) or settings.REGION_DATABASES[default_region()]
+
+
+def is_sharded():
+    return any(alias != "default" for alias in settings.REGION_DATABASES.values())
+
+
+def replica_databases():
+    """Region databases that need their own copy of the reference data."""
+    return sorted({alias for alias in settings.REGION_DATABASES.values() if alias != "default"})
+
+
+def current_database():
+    return _current_database.get() or database_for_region(default_region())
+
+
+@contextmanager
+def use_database(alias):
+    token = _current_database.set(alias)
+    try:
+        yield alias
+    finally:
+        _current_database.reset(token)
+
+
+def use_region(region):
+    return use_database(database_for_region(region))
+
+
+def atomic():
+    """transaction.atomic() on the current region's database."""
+    return transaction.atomic(using=current_database())
+
+
+def region_of(user):
+    """The region of a buyer or seller account, or None."""
+    if not user.is_authenticated:
+        return None
+    for related_name in ("buyer_profile", "seller_profile"):
+        profile = getattr(user, related_name, None)
+        if profile is not None:
+            return profile.region
+    return None
+
+
+def fan_out(func):
+    """Call func() once per region with that region selected; returns {region: result}."""
+    results = {}
+    for region in region_names():
+        with use_region(region):
+            results[region] = func()
+    return results
+
+
+def replicate(instances):
+    """Insert or update copies of reference rows in every region database."""
+    instances = list(instances)
+    if not instances or not is_sharded():
+        return
+    model = type(instances[0])
+    fields = model._meta.concrete_fields
+    pk_name = model._meta.pk.name
+    update_fields = [field.name for field in fields if not field.primary_key]
+    for alias in replica_databases():
+        model._base_manager.using(alias).bulk_create(
+            [model(**{field.attname: getattr(instance, field.attname) for field in fields}) for instance in instances],
+            update_conflicts=True,
+            unique_fields=[pk_name],
+            update_fields=update_fields,
+        )
+
+
+def remove_replicas(model, pks):
+    for alias in replica_databases():
+        model._base_manager.using(alias).filter(pk__in=pks).delete()
@@ -0,0 +1,196 @@
+"""
+Seller sales rollups: completed-order count, kg and revenue per seller,
+category and day (SellerSalesDaily) or month (SellerSalesMonthly).
+
+Completing an order adds it to one daily and one monthly row; an order
+that leaves COMPLETED is subtracted again. Reports over any date range
+read whole months from the monthly table and only the partial months at
+either end from the daily table, so they touch a handful of rows instead
+of scanning orders.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import regions
+from .models import ArchivedPickupOrder, PickupOrder, SellerSalesDaily, SellerSalesMonthly
+
+TOTAL_FIELDS = ("orders_count", "quantity_kg", "revenue")
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def _next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _bump(model, key, deltas):
+    increments = {field: F(field) + value for field, value in deltas.items()}
+    if model.objects.filter(**key).update(**increments):
+        return
+    try:
+        with regions.atomic():
+            model.objects.create(**key, **deltas)
+    except IntegrityError:
+        # Somebody else created the row first; add to it instead.
+        model.objects.filter(**key).update(**increments)
+
+
+def record_completion_change(order, sign, completed_at):
+    """Add (sign=1) or remove (sign=-1) one completed order from the rollups."""
+    quantity_kg, category_id = PickupOrder.objects.filter(pk=order.pk).values_list(
+        "bid__quantity_kg", "listing__category_id"
+    ).get()
+    day = timezone.localdate(completed_at)
+    deltas = {
+        "orders_count": sign,
+        "quantity_kg": sign * quantity_kg,
+        "revenue": sign * order.total_amount,
+    }
+    with regions.atomic():
+        _bump(SellerSalesDaily, {"seller_id": order.seller_id, "category_id": category_id, "day": day}, deltas)
+        _bump(
+            SellerSalesMonthly,
+            {"seller_id": order.seller_id, "category_id": category_id, "month": month_start(day)},
+            deltas,
+        )
+
+
+def _completed_daily_totals():
+    totals = defaultdict(lambda: [0, Decimal("0.00"), Decimal("0.00")])
+    sources = [
+        (PickupOrder.objects, "listing__category_id", "bid__quantity_kg"),
+        (ArchivedPickupOrder.objects, "category_id", "quantity_kg"),
+    ]
+    for manager, category_path, quantity_path in sources:
+        rows = (
+            manager.filter(status=PickupOrder.Status.COMPLETED, completed_at__isnull=False)
+            .order_by()
+            .values("seller_id", rollup_category=F(category_path), day=TruncDate("completed_at"))
+            .annotate(count=Count("pk"), kg=Sum(quantity_path), amount=Sum("total_amount"))
+        )
+        for row in rows:
+            total = totals[(row["seller_id"], row["rollup_category"], row["day"])]
+            total[0] += row["count"]
+            total[1] += row["kg"]
+            total[2] += row["amount"]
+    return totals
+
+
+def rebuild(batch_size=1000):
+    """Recompute both rollup tables from completed hot and archived orders. Returns (daily, monthly) rows."""
+    daily = _completed_daily_totals()
+    monthly = defaultdict(lambda: [0, Decimal("0.00"), Decimal("0.00")])
+    for (seller_id, category_id, day), values in daily.items():
+        total = monthly[(seller_id, category_id, month_start(day))]
+        for index, value in enumerate(values):
+            total[index] += value
+
+    with regions.atomic():
+        SellerSalesDaily.objects.all().delete()
+        SellerSalesMonthly.objects.all().delete()
+        SellerSalesDaily.objects.bulk_create(
+            [
+                SellerSalesDaily(seller_id=seller_id, category_id=category_id, day=day, **dict(zip(TOTAL_FIELDS, values)))
+                for (seller_id, category_id, day), values in daily.items()
+            ],
+            batch_size=batch_size,
+        )
+        SellerSalesMonthly.objects.bulk_create(
+            [
+                SellerSalesMonthly(
+                    seller_id=seller_id, category_id=category_id, month=month, **dict(zip(TOTAL_FIELDS, values))
+                )
+                for (seller_id, category_id, month), values in monthly.items()
+            ],
+            batch_size=batch_size,
+        )
+    return len(daily), len(monthly)
+
+
+def _report_rows(queryset, period_field):
+    # Group by category_id rather than the joined name so the groups follow
+    # the (seller, period, category) unique index and need no sort.
+    return queryset.values(period_field, "category_id").annotate(
+        category_name=Max("category__name"), orders=Sum("orders_count"), kg=Sum("quantity_kg"), amount=Sum("revenue")
+    ).order_by()
+
+
+def sales_report(seller_profile, start, end):
+    """
+    Monthly totals per category for start..end (inclusive dates), plus
+    totals per category. Returns (months, categories): months is a list of
+    (month, [row, ...]) newest first; each row is a dict with category,
+    orders, quantity_kg, revenue and average_price_per_kg.
+    """
+    first_full = start if start.day == 1 else _next_month(start)
+    after_end = end + timedelta(days=1)
+    last_full = after_end if after_end.day == 1 else month_start(end)
+
+    if first_full < last_full:
+        month_rows = list(
+            _report_rows(
+                SellerSalesMonthly.objects.filter(
+                    seller=seller_profile, month__gte=first_full, month__lt=last_full
+                ),
+                "month",
+            )
+        )
+        edges = Q(day__gte=start, day__lt=first_full) | Q(day__gte=last_full, day__lte=end)
+    else:
+        month_rows = []
+        edges = Q(day__gte=start, day__lte=end)
+    day_rows = _report_rows(SellerSalesDaily.objects.filter(edges, seller=seller_profile), "day")
+
+    buckets = defaultdict(lambda: [0, Decimal("0.00"), Decimal("0.00")])
+    for row in month_rows:
+        _add(buckets[(row["month"], row["category_name"])], row)
+    for row in day_rows:
+        _add(buckets[(month_start(row["day"]), row["category_name"])], row)
+
+    months = defaultdict(list)
+    categories = defaultdict(lambda: [0, Decimal("0.00"), Decimal("0.00")])
+    for (month, category), values in sorted(buckets.items()):
+        months[month].append(_row(category, values))
+        totals = categories[category]
+        for index, value in enumerate(values):
+            totals[index] += value
+    return (
+        sorted(months.items(), reverse=True),
+        [_row(category, values) for category, values in sorted(categories.items())],
+    )
+
+
+def _add(bucket, row):
+    bucket[0] += row["orders"]
+    bucket[1] += row["kg"]
+    bucket[2] += row["amount"]
+
+
+def _row(category, values):
+    orders, quantity_kg, revenue = values
+    return {
+        "category": category,
+        "orders": orders,
+        "quantity_kg": quantity_kg,
+        "revenue": revenue,
+        "average_price_per_kg": (revenue / quantity_kg).quantize(Decimal("0.01")) if quantity_kg else None,
+    }
+
+
+def default_report_range(today=None):
+    """The last twelve months including the current one."""
+    today = today or timezone.localdate()
+    start = month_start(today)
+    for _ in range(11):
+        start = month_start(start - timedelta(days=1))
+    return start, today
+
@@ -0,0 +1,95 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import duplicates, feed, geocoding, regions, rollups
+from .models import (
+    Bid,
+    BuyerProfile,
+    ChangeLogEntry,
+    ListingPhoto,
+    PickupOrder,
+    ScrapCategory,
+    ScrapListing,
+    SellerProfile,
+)
+
+REFERENCE_MODELS = (get_user_model(), BuyerProfile, SellerProfile, ScrapCategory)
+
+
+def replicate_reference_row(sender, instance, raw=False, using=None, update_fields=None, **kwargs):
+    # Only writes to 'default' are copied; the copies themselves land here too.
+    # A login only touches last_login, which the region databases never read.
+    if raw or using != "default" or update_fields == frozenset({"last_login"}):
+        return
+    regions.replicate([instance])
+
+
+def remove_reference_row(sender, instance, using=None, **kwargs):
+    if using == "default":
+        regions.remove_replicas(sender, [instance.pk])
+
+
+for _model in REFERENCE_MODELS:
+    post_save.connect(replicate_reference_row, sender=_model, dispatch_uid=f"replicate_{_model._meta.label_lower}")
+    post_delete.connect(remove_reference_row, sender=_model, dispatch_uid=f"unreplicate_{_model._meta.label_lower}")
+
+
+@receiver(pre_save, sender=ScrapListing, dispatch_uid="geocode_listing")
+@receiver(pre_save, sender=SellerProfile, dispatch_uid="geocode_seller")
+def geocode_address(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Partial saves would not write the coordinates, so only full saves resolve.
+    if not raw and update_fields is None:
+        geocoding.locate([instance], "location" if sender is ScrapListing else "pickup_address")
+
+
+@receiver(post_save, sender=ScrapListing)
+def refresh_listing_feed_entry(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        with regions.use_database(using):
+            feed.sync_listings([instance.pk])
+
+
+@receiver(post_save, sender=ScrapListing, dispatch_uid="index_listing_duplicates")
+def index_listing_duplicates(sender, instance, raw=False, using=None, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not {"description", "location", "category"} & set(update_fields)):
+        return
+    with regions.use_database(using):
+        duplicates.index_listings([instance])
+
+
+@receiver(post_save, sender=ListingPhoto)
+def refresh_feed_thumbnail(sender, instance, raw=False, using=None, **kwargs):
+    if not raw and instance.thumbnail:
+        with regions.use_database(using):
+            feed.sync_listings([instance.listing_id])
+
+
+@receiver(post_save, sender=SellerProfile)
+def refresh_feed_seller_name(sender, instance, raw=False, created=False, using=None, **kwargs):
+    if not raw and not created and using == "default":
+        with regions.use_region(instance.region):
+            feed.sync_seller(instance)
+
+
+@receiver(post_save, sender=ScrapCategory)
+def refresh_feed_category_name(sender, instance, raw=False, created=False, using=None, **kwargs):
+    if not raw and not created and using == "default":
+        regions.fan_out(lambda: feed.sync_category(instance))
+
+
+@receiver(post_save, sender=PickupOrder)
+def update_sales_rollups(sender, instance, raw=False, using=None, **kwargs):
+    change = getattr(instance, "_completion_change", None)
+    if not raw and change:
+        with regions.use_database(using):
+            rollups.record_completion_change(instance, *change)
+
+
+@receiver(pre_delete, sender=ScrapListing, dispatch_uid="log_listing_deletion")
+@receiver(pre_delete, sender=Bid, dispatch_uid="log_bid_deletion")
+@receiver(pre_delete, sender=PickupOrder, dispatch_uid="log_order_deletion")
+def log_deletion(sender, instance, using=None, **kwargs):
+    # Sent inside the deletion's transaction for every row removed, whether
+    # by delete(), a queryset delete() or a cascade from the listing.
+    ChangeLogEntry.record([instance], ChangeLogEntry.Action.DELETED, using=using)
@@ -0,0 +1,47 @@
+// Suggests an asking price on the seller dashboard from recent similar
+// trades while the category, weight and address are being filled in.
+(function () {
+    var form = document.querySelector("[data-price-suggestion-url]");
+    if (!form) {
+        return;
+    }
+    var output = form.querySelector(".form__suggestion");
+    var fields = ["category", "quantity_kg", "location"].map(function (name) {
+        return form.elements[name];
+    });
+    var timer = null;
+    var latest = 0;
+
+    function refresh() {
+        var params = new URLSearchParams();
+        for (var i = 0; i < fields.length; i++) {
+            params.set(fields[i].name, fields[i].value);
+        }
+        if (!params.get("category") || !params.get("quantity_kg")) {
+            output.textContent = "";
+            return;
+        }
+        var request = ++latest;
+        fetch(form.dataset.priceSuggestionUrl + "?" + params.toString(), {credentials: "same-origin"})
+            .then(function (response) { return response.ok ? response.json() : null; })
+            .then(function (data) {
+                if (request !== latest) {
+                    return;
+                }
+                if (!data || !data.price_per_kg) {
+                    output.textContent = "";
+                    return;
+                }
+                output.textContent = "Suggested ₹" + data.price_per_kg + "/kg from " + data.trades +
+                    " similar recent trades (₹" + data.low + "–₹" + data.high + ").";
+            })
+            .catch(function () { output.textContent = ""; });
+    }
+
+    fields.forEach(function (field) {
+        field.addEventListener("input", function () {
+            clearTimeout(timer);
+            timer = setTimeout(refresh, 250);
+        });
+    });
+})();
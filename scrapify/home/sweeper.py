@@ -0,0 +1,124 @@
+"""
+Periodic clean-up of the live marketplace tables (manage.py sweep_marketplace).
+
+Fixed-price listings nobody touched for LISTING_TTL_DAYS are deactivated,
+and confirmed orders whose pickup is more than NO_SHOW_GRACE_HOURS overdue
+are cancelled, giving their quantity back to the listing and reopening it
+if it was fully reserved. As in home.archival, work is cut into
+primary-key chunks with one short transaction each, and every chunk
+re-checks its condition inside the transaction, so a booking or pickup
+that lands in between is never overridden and the booking path only ever
+waits for one small chunk.
+"""
+
+import time
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from . import changelog, feed, regions
+from .models import Bid, PickupOrder, ScrapListing
+from .notifications import notify_listing_status_change
+
+
+def stale_listings(cutoff):
+    # Auctions end on their own (close_auctions).
+    return ScrapListing.objects.filter(
+        status=ScrapListing.Status.AVAILABLE,
+        sale_mode=ScrapListing.SaleMode.FIXED,
+        updated_at__lt=cutoff,
+    )
+
+
+def no_show_orders(cutoff):
+    return PickupOrder.objects.filter(status=PickupOrder.Status.CONFIRMED, scheduled_pickup_at__lt=cutoff)
+
+
+def _expire_listing_chunk(ids, cutoff):
+    now = timezone.now()
+    with regions.atomic():
+        listings = list(stale_listings(cutoff).filter(pk__in=ids).select_related("seller__user", "category"))
+        ScrapListing.objects.filter(pk__in=[listing.pk for listing in listings]).update(
+            status=ScrapListing.Status.INACTIVE,
+            updated_at=now,
+        )
+        changelog.record(ScrapListing.objects.filter(pk__in=[listing.pk for listing in listings]))
+        for listing in listings:
+            previous_status, listing.status = listing.status, ScrapListing.Status.INACTIVE
+            notify_listing_status_change(listing, previous_status)
+        feed.sync_listings([listing.pk for listing in listings])
+    return len(listings)
+
+
+def _released_status(listing):
+    if listing.status != ScrapListing.Status.RESERVED:
+        return listing.status
+    # An auction that lost its winner is not reopened; the seller can relist it.
+    if listing.sale_mode == ScrapListing.SaleMode.AUCTION:
+        return ScrapListing.Status.INACTIVE
+    return ScrapListing.Status.AVAILABLE
+
+
+def _release_no_show_chunk(ids, cutoff):
+    now = timezone.now()
+    with regions.atomic():
+        orders = list(no_show_orders(cutoff).filter(pk__in=ids).select_related("bid"))
+        PickupOrder.objects.filter(pk__in=[order.pk for order in orders]).update(
+            status=PickupOrder.Status.CANCELLED,
+            updated_at=now,
+        )
+        Bid.objects.filter(pk__in=[order.bid_id for order in orders]).update(
+            status=Bid.Status.WITHDRAWN,
+            updated_at=now,
+        )
+        released = defaultdict(Decimal)
+        for order in orders:
+            released[order.listing_id] += order.bid.quantity_kg
+        for listing in ScrapListing.objects.filter(pk__in=released).select_related("seller__user", "category"):
+            previous_status, listing.status = listing.status, _released_status(listing)
+            ScrapListing.objects.filter(pk=listing.pk).update(
+                remaining_kg=F("remaining_kg") + released[listing.pk],
+                status=listing.status,
+                updated_at=now,
+            )
+            notify_listing_status_change(listing, previous_status)
+        changelog.record(PickupOrder.objects.filter(pk__in=[order.pk for order in orders]))
+        changelog.record(Bid.objects.filter(pk__in=[order.bid_id for order in orders]))
+        changelog.record(ScrapListing.objects.filter(pk__in=released))
+        feed.sync_listings(list(released))
+    return len(orders)
+
+
+def _run_in_chunks(queryset, sweep_chunk, cutoff, chunk_size, pause):
+    swept = 0
+    last_pk = 0
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)[:chunk_size]
+        )
+        if not ids:
+            return swept
+        swept += sweep_chunk(ids, cutoff)
+        last_pk = ids[-1]
+        if pause:
+            time.sleep(pause)
+
+
+def sweep_marketplace(listing_ttl_days=None, no_show_hours=None, chunk_size=200, pause=0.0):
+    """
+    Cancel no-show orders (releasing their listings), then deactivate stale
+    listings, in the current region. Returns (orders_cancelled, listings_deactivated).
+    """
+    now = timezone.now()
+    listing_ttl_days = settings.LISTING_TTL_DAYS if listing_ttl_days is None else listing_ttl_days
+    no_show_hours = settings.NO_SHOW_GRACE_HOURS if no_show_hours is None else no_show_hours
+    # Releases first: a reopened listing was just updated, so it is not stale.
+    no_show_cutoff = now - timedelta(hours=no_show_hours)
+    orders = _run_in_chunks(no_show_orders(no_show_cutoff), _release_no_show_chunk, no_show_cutoff, chunk_size, pause)
+    listing_cutoff = now - timedelta(days=listing_ttl_days)
+    listings = _run_in_chunks(stale_listings(listing_cutoff), _expire_listing_chunk, listing_cutoff, chunk_size, pause)
+    return orders, listings
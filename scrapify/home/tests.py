@@ -1,10 +1,63 @@
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from datetime import timedelta
 from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core import mail
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
-from .models import Bid, BuyerProfile, PickupOrder, ScrapCategory, ScrapListing, SellerProfile
+from . import feed, geocoding, idempotency, pricing, regions
+from .archival import archive_cold_rows
+from .benchmarks import wal_journal
+from .forms import SellerDashboardListingForm
+from .auctions import BidRejected, close_due_auctions, place_bid
+from .booking import AlreadyBooked, BookingError, book_listing
+from .history import buyer_order_page, buyer_order_summary
+from .middleware import ProfilingMiddleware
+from .rollups import sales_report
+from .models import (
+    ArchivedPickupOrder,
+    ArchivedScrapListing,
+    Bid,
+    BuyerProfile,
+    ChangeLogEntry,
+    IdempotencyKey,
+    ListingFeedEntry,
+    ListingFingerprint,
+    ListingLshBucket,
+    ListingPhoto,
+    NotificationOutbox,
+    PickupOrder,
+    ScrapCategory,
+    ScrapListing,
+    SellerProfile,
+    SellerSalesDaily,
+    SellerSalesMonthly,
+)
+from .notifications import dispatch_pending, notify_listing_status_change
+from .thumbnails import Image, process_pending
 
 
 class SimplifiedFlowTests(TestCase):
@@ -103,3 +156,1459 @@ class SimplifiedFlowTests(TestCase):
                 location="Block A",
             ).exists()
         )
+
+    def test_booking_queues_notification_for_seller(self):
+        self.client.force_login(self.buyer_user)
+        self.client.post(
+            reverse("buyer_dashboard"),
+            {
+                "action": "book_listing",
+                "listing_id": self.listing.id,
+                "scheduled_pickup_at": "2026-02-20T10:30",
+            },
+        )
+
+        notification = NotificationOutbox.objects.get()
+        self.assertEqual(notification.recipient, self.seller_user)
+        self.assertEqual(notification.event, NotificationOutbox.Event.LISTING_BOOKED)
+        self.assertIsNone(notification.dispatched_at)
+        self.assertEqual(len(mail.outbox), 0)
+
+    @override_settings(NOTIFICATION_EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+    def test_dispatch_coalesces_notifications_per_recipient(self):
+        previous_status = self.listing.status
+        for status in (ScrapListing.Status.INACTIVE, ScrapListing.Status.AVAILABLE):
+            self.listing.status = status
+            notify_listing_status_change(self.listing, previous_status)
+            previous_status = status
+
+        self.assertEqual(dispatch_pending(), (2, 1))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["seller@example.com"])
+        self.assertFalse(NotificationOutbox.objects.filter(dispatched_at__isnull=True).exists())
+        self.assertEqual(dispatch_pending(), (0, 0))
+
+    @override_settings(NOTIFICATION_EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+    def test_overlapping_dispatchers_never_send_a_notification_twice(self):
+        self.listing.status = ScrapListing.Status.INACTIVE
+        held = notify_listing_status_change(self.listing, ScrapListing.Status.AVAILABLE)
+        # Another dispatcher is busy sending this one.
+        NotificationOutbox.objects.filter(pk=held.pk).update(claimed_at=timezone.now())
+        self.assertEqual(dispatch_pending(), (0, 0))
+        self.assertEqual(len(mail.outbox), 0)
+
+        # Its claim lapses when it dies mid-send.
+        NotificationOutbox.objects.filter(pk=held.pk).update(claimed_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(dispatch_pending(), (1, 1))
+        self.assertEqual(len(mail.outbox), 1)
+
+    @unittest.skipIf(Image is None, "Pillow is not installed")
+    def test_listing_photo_is_thumbnailed_off_request(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+
+        buffer = BytesIO()
+        Image.new("RGB", (2400, 1800), "green").save(buffer, format="JPEG")
+        upload = SimpleUploadedFile("lot.jpg", buffer.getvalue(), content_type="image/jpeg")
+
+        with self.settings(MEDIA_ROOT=media_root):
+            self.client.force_login(self.seller_user)
+            self.client.post(
+                reverse("seller_dashboard"),
+                {
+                    "action": "create_listing",
+                    "category": self.category.id,
+                    "description": "Copper wire",
+                    "quantity_kg": "15.00",
+                    "price_per_kg": "400.00",
+                    "location": "Block C",
+                    "photo": upload,
+                },
+            )
+            photo = ListingPhoto.objects.get()
+            self.assertFalse(photo.thumbnail)
+
+            self.assertEqual(process_pending(), (1, 0))
+            photo.refresh_from_db()
+            self.assertEqual(photo.thumbnail.name, f"listing_photos/thumbs/{photo.content_hash[:20]}.jpg")
+            with Image.open(photo.thumbnail.path) as thumbnail:
+                self.assertLessEqual(max(thumbnail.size), 480)
+
+            self.client.force_login(self.buyer_user)
+            response = self.client.get(reverse("buyer_dashboard"))
+            self.assertContains(response, photo.thumbnail.url)
+            self.assertNotContains(response, photo.original.url)
+
+    @unittest.skipIf(Image is None, "Pillow is not installed")
+    def test_photos_that_cannot_be_thumbnailed_are_marked_failed(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        buffer = BytesIO()
+        Image.new("RGB", (400, 300), "green").save(buffer, format="JPEG")
+
+        with self.settings(MEDIA_ROOT=media_root):
+            for name in ("bomb.jpg", "pending.jpg"):
+                ListingPhoto.objects.create(
+                    listing=self.listing,
+                    original=SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg"),
+                )
+            with mock.patch.object(Image, "MAX_IMAGE_PIXELS", 1000):
+                self.assertEqual(process_pending(batch_size=1), (0, 1))
+            with mock.patch("home.thumbnails.Image", None):
+                with self.assertRaisesMessage(CommandError, "Pillow is required"):
+                    call_command("process_listing_photos", stdout=StringIO())
+
+        self.assertEqual(ListingPhoto.objects.filter(processed_at__isnull=True).count(), 1)
+        self.assertFalse(ListingPhoto.objects.exclude(thumbnail="").exists())
+
+    def test_dashboard_returns_304_until_listings_change(self):
+        self.client.force_login(self.buyer_user)
+        url = reverse("buyer_dashboard")
+        self.client.get(url)
+        etag = self.client.get(url)["ETag"]
+
+        with self.assertNumQueries(5):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.listing.price_per_kg = Decimal("55.00")
+        self.listing.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_dashboard_skips_304_while_messages_are_pending(self):
+        self.client.force_login(self.buyer_user)
+        url = reverse("buyer_dashboard")
+        self.client.get(url)
+        etag = self.client.get(url)["ETag"]
+
+        self.client.post(url, {"action": "book_listing", "listing_id": self.listing.id})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Please assign a pickup time before booking.")
+
+    def test_html_pages_are_gzipped(self):
+        response = self.client.get(reverse("landing"), HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertTrue(response.has_header("ETag"))
+
+    def test_cleanup_sessions_deletes_only_expired_rows_in_chunks(self):
+        for index in range(5):
+            session = SessionStore()
+            session["index"] = index
+            session.create()
+        Session.objects.filter(pk__in=list(Session.objects.values_list("pk", flat=True)[:3])).update(
+            expire_date=timezone.now() - timedelta(days=1)
+        )
+
+        call_command("cleanup_sessions", chunk_size=2, pause=0, stdout=StringIO())
+
+        self.assertEqual(Session.objects.count(), 2)
+        self.assertFalse(Session.objects.filter(expire_date__lt=timezone.now()).exists())
+
+    @override_settings(
+        SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies",
+        MESSAGE_STORAGE="django.contrib.messages.storage.cookie.CookieStorage",
+    )
+    def test_booking_flow_with_cookie_sessions_skips_session_table(self):
+        self.client.post(
+            reverse("buyer_auth"),
+            {"action": "login", "username_or_email": "buyer1", "password": "buyerpass123"},
+        )
+        response = self.client.post(
+            reverse("buyer_dashboard"),
+            {
+                "action": "book_listing",
+                "listing_id": self.listing.id,
+                "scheduled_pickup_at": "2026-02-20T10:30",
+            },
+            follow=True,
+        )
+
+        self.assertContains(response, "Booking confirmed. Pickup has been scheduled.")
+        self.assertFalse(Session.objects.exists())
+
+    def test_archival_moves_cold_rows_and_history_reads_both_tables(self):
+        bid = Bid.objects.create(
+            listing=self.listing,
+            buyer=self.buyer_profile,
+            quantity_kg=self.listing.quantity_kg,
+            bid_price_per_kg=self.listing.price_per_kg,
+            status=Bid.Status.ACCEPTED,
+        )
+        order = PickupOrder.objects.create(
+            listing=self.listing,
+            bid=bid,
+            buyer=self.buyer_profile,
+            seller=self.seller_profile,
+            status=PickupOrder.Status.COMPLETED,
+            total_amount=Decimal("5000.00"),
+        )
+        fresh_listing = ScrapListing.objects.create(
+            seller=self.seller_profile,
+            category=self.category,
+            description="Recently sold",
+            quantity_kg=Decimal("10.00"),
+            price_per_kg=Decimal("5.00"),
+            location="Area 18",
+            status=ScrapListing.Status.SOLD,
+        )
+        old = timezone.now() - timedelta(days=120)
+        ScrapListing.objects.filter(pk=self.listing.pk).update(status=ScrapListing.Status.SOLD, updated_at=old)
+        PickupOrder.objects.filter(pk=order.pk).update(updated_at=old)
+
+        self.assertEqual(archive_cold_rows(days=90, chunk_size=1), (1, 1))
+
+        self.assertFalse(PickupOrder.objects.exists())
+        self.assertFalse(Bid.objects.exists())
+        self.assertEqual(list(ScrapListing.objects.all()), [fresh_listing])
+        archived_order = ArchivedPickupOrder.objects.get(pk=order.pk)
+        self.assertEqual(archived_order.quantity_kg, Decimal("100.00"))
+        self.assertEqual(ArchivedScrapListing.objects.get().pk, self.listing.pk)
+
+        self.client.force_login(self.buyer_user)
+        response = self.client.get(reverse("buyer_dashboard"))
+        self.assertContains(response, "Total Amount: ₹5000.00")
+
+        self.client.force_login(self.seller_user)
+        response = self.client.get(reverse("seller_dashboard"))
+        self.assertContains(response, "(archived)")
+        self.assertEqual(response.context["total_listings_count"], 2)
+        self.assertEqual(response.context["bookings_count"], 1)
+
+    def test_feed_entries_follow_listing_seller_and_category_writes(self):
+        entry = ListingFeedEntry.objects.get(listing=self.listing)
+        self.assertEqual(entry.seller_name, "Seller Biz")
+        self.assertEqual(entry.category_name, "Metal")
+
+        self.seller_profile.business_name = "Renamed Biz"
+        self.seller_profile.save()
+        self.category.name = "Ferrous Metal"
+        self.category.save()
+        entry.refresh_from_db()
+        self.assertEqual((entry.seller_name, entry.category_name), ("Renamed Biz", "Ferrous Metal"))
+
+        self.listing.status = ScrapListing.Status.RESERVED
+        self.listing.save()
+        self.assertFalse(ListingFeedEntry.objects.exists())
+
+    def test_feed_checker_reports_and_repairs_drift(self):
+        ListingFeedEntry.objects.filter(listing=self.listing).update(price_per_kg=Decimal("1.00"))
+        self.assertEqual(feed.find_inconsistencies(), ([], [self.listing.pk], []))
+
+        call_command("check_listing_feed", repair=True, stdout=StringIO())
+        self.assertEqual(feed.find_inconsistencies(), ([], [], []))
+        self.assertEqual(ListingFeedEntry.objects.get().price_per_kg, Decimal("50.00"))
+
+        ListingFeedEntry.objects.all().delete()
+        call_command("rebuild_listing_feed", stdout=StringIO())
+        self.assertEqual(ListingFeedEntry.objects.get().listing_id, self.listing.pk)
+
+    def test_auction_bids_must_beat_the_top_bid(self):
+        ScrapListing.objects.filter(pk=self.listing.pk).update(
+            sale_mode=ScrapListing.SaleMode.AUCTION,
+            auction_ends_at=timezone.now() + timedelta(hours=1),
+        )
+        self.client.force_login(self.buyer_user)
+        url = reverse("buyer_dashboard")
+
+        self.client.post(url, {"action": "place_bid", "listing_id": self.listing.id, "bid_price_per_kg": "49.00"})
+        self.client.post(url, {"action": "place_bid", "listing_id": self.listing.id, "bid_price_per_kg": "52.00"})
+        self.client.post(url, {"action": "place_bid", "listing_id": self.listing.id, "bid_price_per_kg": "52.00"})
+        response = self.client.post(
+            url,
+            {"action": "book_listing", "listing_id": self.listing.id, "scheduled_pickup_at": "2026-02-20T10:30"},
+        )
+
+        self.assertEqual(response.status_code, 404)
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.top_bid_price, self.listing.bid_count), (Decimal("52.00"), 1))
+        bid = Bid.objects.get()
+        self.assertEqual((bid.bid_price_per_kg, bid.status), (Decimal("52.00"), Bid.Status.PENDING))
+        self.assertEqual(ListingFeedEntry.objects.get().top_bid_price, Decimal("52.00"))
+
+    def test_buyer_can_book_part_of_a_listing(self):
+        self.client.force_login(self.buyer_user)
+        self.client.post(
+            reverse("buyer_dashboard"),
+            {
+                "action": "book_listing",
+                "listing_id": self.listing.id,
+                "quantity_kg": "40.00",
+                "scheduled_pickup_at": "2026-02-20T10:30",
+            },
+        )
+
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.remaining_kg, Decimal("60.00"))
+        self.assertEqual(self.listing.status, ScrapListing.Status.AVAILABLE)
+        order = PickupOrder.objects.get()
+        self.assertEqual((order.bid.quantity_kg, order.total_amount), (Decimal("40.00"), Decimal("2000.00")))
+        self.assertEqual(ListingFeedEntry.objects.get().remaining_kg, Decimal("60.00"))
+
+        other_buyer = BuyerProfile.objects.create(
+            user=get_user_model().objects.create_user(username="buyer2", password="buyerpass123"),
+            business_name="Second Buyer",
+            phone_number="1",
+        )
+        with self.assertRaises(BookingError):
+            book_listing(self.listing, other_buyer, None, Decimal("60.01"))
+        book_listing(self.listing, other_buyer, None, Decimal("60.00"))
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.remaining_kg, self.listing.status), (Decimal("0.00"), ScrapListing.Status.RESERVED))
+        self.assertFalse(ListingFeedEntry.objects.exists())
+
+    def test_listing_edit_is_rebased_on_bookings_made_since_the_form_loaded(self):
+        def edit(quantity_kg):
+            # The seller opened the edit page before the booking below.
+            form = SellerDashboardListingForm(
+                {
+                    "category": self.category.pk,
+                    "description": "Mixed steel parts",
+                    "price_per_kg": "55.00",
+                    "quantity_kg": quantity_kg,
+                    "location": "Area 17",
+                    "sale_mode": ScrapListing.SaleMode.FIXED,
+                },
+                instance=stale,
+            )
+            self.assertTrue(form.is_valid(), form.errors)
+            return form
+
+        stale = ScrapListing.objects.get(pk=self.listing.pk)
+        book_listing(self.listing, self.buyer_profile, None, Decimal("30.00"))
+
+        edit("50.00").save()
+        self.listing.refresh_from_db()
+        self.assertEqual(
+            (self.listing.quantity_kg, self.listing.remaining_kg, self.listing.price_per_kg),
+            (Decimal("50.00"), Decimal("20.00"), Decimal("55.00")),
+        )
+
+        stale = ScrapListing.objects.get(pk=self.listing.pk)
+        stale.remaining_kg = stale.quantity_kg
+        with self.assertRaisesMessage(ValidationError, "30.00 kg of this listing is booked now."):
+            edit("20.00").save()
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.quantity_kg, self.listing.remaining_kg), (Decimal("50.00"), Decimal("20.00")))
+
+    def test_listing_edit_flips_status_with_what_is_left_to_book(self):
+        def edit(quantity_kg):
+            form = SellerDashboardListingForm(
+                {
+                    "category": self.category.pk,
+                    "description": "Mixed steel parts",
+                    "price_per_kg": "50.00",
+                    "quantity_kg": quantity_kg,
+                    "location": "Area 17",
+                    "sale_mode": ScrapListing.SaleMode.FIXED,
+                },
+                instance=ScrapListing.objects.get(pk=self.listing.pk),
+            )
+            self.assertTrue(form.is_valid(), form.errors)
+            form.save()
+            self.listing.refresh_from_db()
+            return self.listing.remaining_kg, self.listing.status
+
+        book_listing(self.listing, self.buyer_profile, None, Decimal("40.00"))
+
+        self.assertEqual(edit("40.00"), (Decimal("0.00"), ScrapListing.Status.RESERVED))
+        self.assertEqual(edit("70.00"), (Decimal("30.00"), ScrapListing.Status.AVAILABLE))
+
+    def test_booked_listing_cannot_be_switched_to_an_auction(self):
+        book_listing(self.listing, self.buyer_profile, None, Decimal("40.00"))
+        form = SellerDashboardListingForm(
+            {
+                "category": self.category.pk,
+                "description": "Mixed steel parts",
+                "price_per_kg": "50.00",
+                "quantity_kg": "100.00",
+                "location": "Area 17",
+                "sale_mode": ScrapListing.SaleMode.AUCTION,
+                "auction_ends_at": (timezone.now() + timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M"),
+            },
+            instance=ScrapListing.objects.get(pk=self.listing.pk),
+        )
+
+        self.assertFalse(form.is_valid())
+        self.assertIn("cannot be switched to an auction", str(form.errors))
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.sale_mode, ScrapListing.SaleMode.FIXED)
+
+    def test_invalid_booking_quantities_are_rejected(self):
+        self.client.force_login(self.buyer_user)
+        for quantity in ("NaN", "sNaN", "0", "0.001"):
+            response = self.client.post(
+                reverse("buyer_dashboard"),
+                {
+                    "action": "book_listing",
+                    "listing_id": self.listing.id,
+                    "quantity_kg": quantity,
+                    "scheduled_pickup_at": "2026-02-20T10:30",
+                },
+                follow=True,
+            )
+            self.assertContains(response, "Please provide a valid quantity.")
+        for quantity in ("NaN", "0", "0.001"):
+            with self.assertRaises(BookingError):
+                book_listing(self.listing, self.buyer_profile, None, Decimal(quantity))
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.remaining_kg, Decimal("100.00"))
+        self.assertFalse(PickupOrder.objects.exists())
+
+    def test_profile_header_dumps_stats_for_the_url_name(self):
+        profiling_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, profiling_dir, ignore_errors=True)
+        self.client.force_login(self.buyer_user)
+
+        with self.settings(PROFILING_DIR=profiling_dir, PROFILING_TOKEN="let-me-profile", PROFILING_SAMPLE_RATE=0):
+            unprofiled = self.client.get(reverse("buyer_dashboard"), HTTP_X_PROFILE="wrong")
+            profiled = self.client.get(reverse("buyer_dashboard"), HTTP_X_PROFILE="let-me-profile")
+
+            self.assertFalse(unprofiled.has_header("X-Profile-Dump"))
+            self.assertRegex(profiled["X-Profile-Dump"], r"^buyer_dashboard\.\d+\.[0-9a-f]{8}\.prof$")
+            output = StringIO()
+            call_command("profile_report", "buyer_dashboard", sort="cumulative", stdout=output)
+
+        self.assertIn("== buyer_dashboard: 1 request(s)", output.getvalue())
+        self.assertIn("home/views.py", output.getvalue())
+
+    def test_overlapping_profiled_requests_are_both_served(self):
+        profiling_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, profiling_dir, ignore_errors=True)
+        both_inside = threading.Barrier(2, timeout=5)
+
+        def view(request):
+            both_inside.wait()
+            return HttpResponse("ok")
+
+        with self.settings(PROFILING_DIR=profiling_dir, PROFILING_TOKEN="", PROFILING_SAMPLE_RATE=1):
+            middleware = ProfilingMiddleware(view)
+            responses, errors = [], []
+
+            def serve():
+                try:
+                    responses.append(middleware(RequestFactory().get("/")))
+                except Exception as error:
+                    errors.append(error)
+
+            threads = [threading.Thread(target=serve) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual([response.status_code for response in responses], [200, 200])
+        self.assertEqual(len(os.listdir(profiling_dir)), 1)
+
+    def test_metrics_endpoint_reports_hot_path_counters(self):
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir, ignore_errors=True)
+
+        with self.settings(METRICS_DIR=metrics_dir, METRICS_TOKEN=""):
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
+        with self.settings(METRICS_DIR=metrics_dir, METRICS_TOKEN="scrape-token"):
+            self.client.post(
+                reverse("buyer_auth"),
+                {"action": "login", "username_or_email": "buyer1", "password": "wrong-password"},
+            )
+            self.client.force_login(self.buyer_user)
+            self.client.post(
+                reverse("buyer_dashboard"),
+                {
+                    "action": "book_listing",
+                    "listing_id": self.listing.id,
+                    "scheduled_pickup_at": "2026-02-20T10:30",
+                },
+            )
+
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 401)
+            response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer scrape-token")
+
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        body = response.content.decode()
+        self.assertIn("# TYPE scrapify_bookings_total counter", body)
+        self.assertRegex(body, r'scrapify_bookings_total\{outcome="booked"\} [1-9]')
+        self.assertRegex(body, r'scrapify_logins_total\{role="buyer",outcome="failure"\} [1-9]')
+        self.assertRegex(body, r'scrapify_request_duration_seconds_bucket\{view="buyer_dashboard",le="\+Inf"\} [1-9]')
+        self.assertRegex(body, r'scrapify_request_db_duration_seconds_count\{view="buyer_dashboard"\} [1-9]')
+        self.assertEqual(len(os.listdir(metrics_dir)), 1)
+
+    def test_onboard_accounts_imports_valid_rows_in_bulk(self):
+        csv_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, csv_dir, ignore_errors=True)
+        csv_path = os.path.join(csv_dir, "coop.csv")
+        with open(csv_path, "w", newline="") as handle:
+            handle.write(
+                "username,full_name,business_name,email,phone_number,address,password\n"
+                "coop-a,Asha Rao,Coop A,A@Example.com,111,Ward 1,coop-pass-1\n"
+                "BUYER1,Dup User,Dup,dup@example.com,222,,coop-pass-2\n"
+                "coop-b,Bala,Coop B,a@example.com,333,,coop-pass-3\n"
+                "coop-c,Chitra Devi,Coop C,c@example.com,444,,\n"
+                ",No Name,Coop D,not-an-email,555,,x\n"
+            )
+
+        errors = StringIO()
+        with self.assertRaises(CommandError):
+            call_command("onboard_accounts", csv_path, role="buyer", stderr=errors)
+        self.assertIn("line 3: username: BUYER1 already exists.", errors.getvalue())
+        self.assertIn("line 4: email: a@example.com already exists.", errors.getvalue())
+        self.assertIn("line 6: username:", errors.getvalue())
+        self.assertFalse(get_user_model().objects.filter(username="coop-a").exists())
+
+        call_command("onboard_accounts", csv_path, role="buyer", workers=2, skip_invalid=True, stdout=StringIO(), stderr=StringIO())
+
+        created = BuyerProfile.objects.filter(user__username__startswith="coop-").select_related("user")
+        self.assertEqual(
+            sorted((profile.user.username, profile.user.email, profile.address) for profile in created),
+            [("coop-a", "a@example.com", "Ward 1"), ("coop-c", "c@example.com", "")],
+        )
+        coop_a = created.get(user__username="coop-a").user
+        self.assertEqual((coop_a.first_name, coop_a.last_name), ("Asha", "Rao"))
+        self.assertTrue(coop_a.check_password("coop-pass-1"))
+        self.assertFalse(created.get(user__username="coop-c").user.has_usable_password())
+
+    def test_booking_history_is_keyset_paginated_with_server_side_summary(self):
+        orders = []
+        for index in range(6):
+            listing = ScrapListing.objects.create(
+                seller=self.seller_profile,
+                category=self.category,
+                description=f"Lot {index}",
+                quantity_kg=Decimal("50.00"),
+                price_per_kg=Decimal("10.00"),
+                location="Area 17",
+            )
+            orders.append(book_listing(listing, self.buyer_profile, None, Decimal("10.00")))
+        now = timezone.now()
+        for index, order in enumerate(orders):
+            # Orders 1 and 2 share a timestamp, so the id breaks the tie.
+            PickupOrder.objects.filter(pk=order.pk).update(created_at=now - timedelta(hours=min(index, 1) + index // 2 * 2))
+        PickupOrder.objects.filter(pk=orders[5].pk).update(status=PickupOrder.Status.CANCELLED)
+
+        expected = [
+            order.pk
+            for order in PickupOrder.objects.exclude(status=PickupOrder.Status.CANCELLED).order_by("-created_at", "-id")
+        ]
+        seen, cursor = [], None
+        for _ in range(3):
+            rows, cursor = buyer_order_page(self.buyer_profile, before=cursor, page_size=2)
+            seen.extend(row["order_id"] for row in rows)
+        self.assertEqual(seen, expected)
+        self.assertIsNone(cursor)
+
+        summary = buyer_order_summary(self.buyer_profile)
+        self.assertEqual(
+            [(row["status"], row["count"], row["quantity"], row["amount"]) for row in summary],
+            [(PickupOrder.Status.CONFIRMED, 5, Decimal("50.00"), Decimal("500.00"))],
+        )
+
+        self.client.force_login(self.buyer_user)
+        with self.assertNumQueries(8):
+            response = self.client.get(reverse("buyer_dashboard"), {"status": "cancelled"})
+        self.assertContains(response, "Cancelled: 1 booking, 10.00 kg, ₹100.00")
+        self.assertEqual([row["order_id"] for row in response.context["my_bookings"]], [orders[5].pk])
+
+    def test_sales_rollups_follow_order_completion_and_match_backfill(self):
+        paper_listing = ScrapListing.objects.create(
+            seller=self.seller_profile,
+            category=ScrapCategory.objects.create(name="Paper"),
+            description="Old newspapers",
+            quantity_kg=Decimal("30.00"),
+            price_per_kg=Decimal("10.00"),
+            location="Area 17",
+        )
+        metal_order = book_listing(self.listing, self.buyer_profile, None, Decimal("40.00"))
+        paper_order = book_listing(paper_listing, self.buyer_profile, None, Decimal("20.00"))
+        self.assertFalse(SellerSalesDaily.objects.exists())
+
+        metal_order.status = PickupOrder.Status.COMPLETED
+        metal_order.save()
+        paper_order = PickupOrder.objects.get(pk=paper_order.pk)
+        paper_order.status = PickupOrder.Status.COMPLETED
+        paper_order.completed_at = timezone.now() - timedelta(days=45)
+        paper_order.save()
+        paper_order = PickupOrder.objects.get(pk=paper_order.pk)
+        paper_order.status = PickupOrder.Status.PICKED_UP
+        paper_order.save()
+        self.assertIsNone(paper_order.completed_at)
+        self.assertEqual(
+            SellerSalesMonthly.objects.get(category=paper_listing.category).orders_count,
+            0,
+        )
+        paper_order.status = PickupOrder.Status.COMPLETED
+        paper_order.completed_at = timezone.now() - timedelta(days=45)
+        paper_order.save(update_fields=["status", "updated_at"])
+
+        today = timezone.localdate()
+        months, categories = sales_report(self.seller_profile, today - timedelta(days=60), today)
+        self.assertEqual(
+            [(row["category"], row["orders"], row["quantity_kg"], row["revenue"], row["average_price_per_kg"]) for row in categories],
+            [
+                ("Metal", 1, Decimal("40.00"), Decimal("2000.00"), Decimal("50.00")),
+                ("Paper", 1, Decimal("20.00"), Decimal("200.00"), Decimal("10.00")),
+            ],
+        )
+        self.assertEqual([month for month, _ in months], [today.replace(day=1), paper_order.completed_at.date().replace(day=1)])
+        self.assertEqual(sales_report(self.seller_profile, today, today)[1][0]["category"], "Metal")
+
+        def snapshot():
+            return {
+                model: sorted(model.objects.filter(orders_count__gt=0).values_list(
+                    "seller_id", "category_id", period, "orders_count", "quantity_kg", "revenue"
+                ))
+                for model, period in ((SellerSalesDaily, "day"), (SellerSalesMonthly, "month"))
+            }
+
+        incremental = snapshot()
+        call_command("backfill_sales_rollups", stdout=StringIO())
+        self.assertEqual(snapshot(), incremental)
+
+        self.client.force_login(self.seller_user)
+        response = self.client.get(reverse("seller_sales_report"))
+        self.assertContains(response, "Metal: 1 order, 40.00 kg, ₹2000.00 (avg ₹50.00/kg)")
+
+    def test_seller_can_bulk_edit_listings_from_formset_and_csv_patch(self):
+        second = ScrapListing.objects.create(
+            seller=self.seller_profile,
+            category=self.category,
+            description="Copper wire",
+            quantity_kg=Decimal("30.00"),
+            price_per_kg=Decimal("400.00"),
+            location="Area 17",
+        )
+        book_listing(self.listing, self.buyer_profile, timezone.now() + timedelta(days=1), quantity_kg=Decimal("40.00"))
+        self.listing.refresh_from_db()
+        before = self.listing.updated_at
+
+        self.client.force_login(self.seller_user)
+        url = reverse("seller_listings_bulk_edit")
+        self.assertContains(self.client.get(url), "Copper wire")
+        data = {
+            "action": "save_listings",
+            "form-TOTAL_FORMS": "2",
+            "form-INITIAL_FORMS": "2",
+        }
+        rows = [
+            (second, "450.00", "30.00", ScrapListing.Status.AVAILABLE),
+            (self.listing, "55.00", "120.00", self.listing.status),
+        ]
+        for index, (listing, price, quantity, status) in enumerate(rows):
+            data.update({
+                f"form-{index}-id": listing.pk,
+                f"form-{index}-price_per_kg": price,
+                f"form-{index}-quantity_kg": quantity,
+                f"form-{index}-status": status,
+                f"form-{index}-location": listing.location,
+            })
+        response = self.client.post(url, data)
+        self.assertRedirects(response, reverse("seller_dashboard"))
+
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.price_per_kg, Decimal("55.00"))
+        self.assertEqual(self.listing.remaining_kg, Decimal("80.00"))
+        self.assertGreater(self.listing.updated_at, before)
+        entry = ListingFeedEntry.objects.get(listing=second)
+        self.assertEqual(entry.price_per_kg, Decimal("450.00"))
+
+        patch = "id,price_per_kg,quantity_kg\n{},60.00,\n{},,10.00\n".format(second.pk, self.listing.pk)
+        response = self.client.post(
+            url,
+            {"action": "apply_patch", "patch": SimpleUploadedFile("patch.csv", patch.encode())},
+            follow=True,
+        )
+        self.assertContains(response, "Line 3: quantity_kg:")
+        second.refresh_from_db()
+        self.assertEqual(second.price_per_kg, Decimal("450.00"))
+
+        patch = "id,price_per_kg,status\n{},60.00,inactive\n".format(second.pk)
+        response = self.client.post(url, {"action": "apply_patch", "patch": SimpleUploadedFile("patch.csv", patch.encode())})
+        self.assertRedirects(response, reverse("seller_dashboard"))
+        second.refresh_from_db()
+        self.assertEqual((second.price_per_kg, second.status), (Decimal("60.00"), ScrapListing.Status.INACTIVE))
+
+        patch = "id,quantity_kg\n{},40.00\n".format(self.listing.pk)
+        self.client.post(url, {"action": "apply_patch", "patch": SimpleUploadedFile("patch.csv", patch.encode())})
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.remaining_kg, self.listing.status), (Decimal("0.00"), ScrapListing.Status.RESERVED))
+
+    def test_addresses_are_geocoded_offline_and_memoized(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = Path(directory) / "gazetteer.csv"
+        path.write_text(
+            "name,latitude,longitude\n"
+            "Area 17,12.9716,77.5946\n"
+            "Warehouse,10.0,70.0\n"
+            "Gandhi Nagar,13.0012,77.5800\n"
+            "Gandhi Nagar East,13.0100,77.5900\n"
+            "560038,12.9784,77.6408\n"
+        )
+
+        with override_settings(GEOCODER_GAZETTEER=path):
+            index = geocoding.gazetteer()
+            self.assertEqual(index.lookup(geocoding.normalize("12, Gandhi Nagar East Block")).name, "Gandhi Nagar East")
+            self.assertEqual(index.lookup(geocoding.normalize("Gandhi Nagar, Indiranagar 560038")).name, "560038")
+            self.assertIsNone(index.lookup(geocoding.normalize("Somewhere else")))
+
+            listing = ScrapListing.objects.create(
+                seller=self.seller_profile,
+                category=self.category,
+                description="Aluminium cans",
+                quantity_kg=Decimal("10.00"),
+                price_per_kg=Decimal("90.00"),
+                location="Plot 4, area 17",
+            )
+            self.assertEqual((listing.latitude, listing.longitude), (Decimal("12.971600"), Decimal("77.594600")))
+            with self.assertNumQueries(1):
+                self.assertEqual(geocoding.geocode("plot 4 AREA 17").name, "Area 17")
+            with self.assertNumQueries(2):
+                self.assertIsNone(geocoding.geocode("Nowhere"))
+            with self.assertNumQueries(1):
+                self.assertIsNone(geocoding.geocode("nowhere!"))
+
+            # Rows from before the gazetteer existed are filled in by the backfill.
+            self.assertIsNone(self.listing.latitude)
+            out = StringIO()
+            call_command("geocode_addresses", stdout=out)
+            self.assertIn("Located 1 of 1 seller pickup addresses.", out.getvalue())
+            self.assertIn("located 1 of 1 listing locations.", out.getvalue())
+            self.listing.refresh_from_db()
+            self.seller_profile.refresh_from_db()
+            self.assertEqual(self.listing.latitude, Decimal("12.971600"))
+            self.assertEqual(self.seller_profile.longitude, Decimal("70.000000"))
+
+        self.assertIsNone(geocoding.gazetteer())
+        with self.assertRaises(CommandError):
+            call_command("geocode_addresses", stdout=StringIO())
+
+    @unittest.skipIf(pricing.np is None, "NumPy is not installed")
+    def test_price_suggestion_weighs_the_nearest_recent_trades(self):
+        pricing.reset()
+        self.addCleanup(pricing.reset)
+        pickup_at = timezone.now() + timedelta(days=1)
+        book_listing(self.listing, self.buyer_profile, pickup_at, quantity_kg=Decimal("40.00"))
+        for price, quantity in (("80.00", "1000.00"), ("55.00", "45.00")):
+            listing = ScrapListing.objects.create(
+                seller=self.seller_profile,
+                category=self.category,
+                description="Steel offcuts",
+                quantity_kg=Decimal(quantity),
+                price_per_kg=Decimal(price),
+                location="Area 17",
+            )
+            book_listing(listing, self.buyer_profile, pickup_at)
+
+        self.client.force_login(self.seller_user)
+        url = reverse("seller_price_suggestion")
+        response = self.client.get(url, {"category": self.category.pk, "quantity_kg": "42"})
+        data = response.json()
+        self.assertEqual((data["trades"], data["low"], data["high"]), (3, "50.00", "80.00"))
+        # The two trades of about the same weight outweigh the bulk one.
+        self.assertLess(Decimal(data["price_per_kg"]), Decimal("62.00"))
+        self.assertGreater(Decimal(data["price_per_kg"]), Decimal("50.00"))
+
+        # Served from memory: only the session and user lookups hit the database.
+        with self.assertNumQueries(3):
+            self.client.get(url, {"category": self.category.pk, "quantity_kg": "900"})
+        self.assertEqual(self.client.get(url, {"category": 999, "quantity_kg": "5"}).json(), {"price_per_kg": None, "trades": 0})
+        self.assertEqual(self.client.get(url, {"category": self.category.pk}).status_code, 400)
+
+    def test_reposted_listings_are_held_back_and_clustered(self):
+        self.client.force_login(self.seller_user)
+        repost = {
+            "action": "create_listing",
+            "category": self.category.id,
+            "description": "Mixed steel parts.",
+            "quantity_kg": "100.00",
+            "price_per_kg": "48.00",
+            "location": "area 17",
+        }
+        response = self.client.post(reverse("seller_dashboard"), repost, follow=True)
+        self.assertContains(response, f"This looks like a repost of your open listing #{self.listing.pk}.")
+        self.assertEqual(ScrapListing.objects.count(), 1)
+
+        other_lot = dict(repost, description="Copper wire offcuts", location="Block C, Sector 9")
+        self.client.post(reverse("seller_dashboard"), other_lot)
+        self.client.post(reverse("seller_dashboard"), dict(repost, post_duplicate="on"))
+        self.client.post(reverse("seller_dashboard"), dict(repost, post_duplicate="on"))
+        self.assertEqual(ScrapListing.objects.count(), 4)
+        # Open auctions are left to close on their own.
+        auction = ScrapListing.objects.latest("pk")
+        ScrapListing.objects.filter(pk=auction.pk).update(
+            sale_mode=ScrapListing.SaleMode.AUCTION,
+            auction_ends_at=timezone.now() + timedelta(hours=1),
+        )
+
+        # Listings from before the index existed are fingerprinted by the command.
+        ListingFingerprint.objects.filter(listing=self.listing).delete()
+        ListingLshBucket.objects.filter(listing=self.listing).delete()
+        out = StringIO()
+        call_command("cluster_duplicate_listings", "--deactivate", stdout=out)
+        self.assertIn("fingerprinted 1 listings.", out.getvalue())
+        self.assertIn("deactivated 1 reposts in 1 groups.", out.getvalue())
+        self.assertEqual(
+            list(ScrapListing.objects.order_by("pk").values_list("status", flat=True)),
+            [
+                ScrapListing.Status.AVAILABLE,
+                ScrapListing.Status.AVAILABLE,
+                ScrapListing.Status.INACTIVE,
+                ScrapListing.Status.AVAILABLE,
+            ],
+        )
+        self.assertEqual(ListingFeedEntry.objects.count(), 3)
+        self.assertEqual(
+            NotificationOutbox.objects.filter(event=NotificationOutbox.Event.LISTING_STATUS_CHANGED).count(),
+            1,
+        )
+
+    def test_sweeper_cancels_no_shows_and_expires_stale_listings(self):
+        overdue = book_listing(self.listing, self.buyer_profile, timezone.now() - timedelta(days=3))
+        self.assertEqual(ScrapListing.objects.get(pk=self.listing.pk).status, ScrapListing.Status.RESERVED)
+        upcoming_listing = ScrapListing.objects.create(
+            seller=self.seller_profile,
+            category=self.category,
+            description="Brass fittings",
+            quantity_kg=Decimal("20.00"),
+            price_per_kg=Decimal("300.00"),
+            location="Area 17",
+        )
+        upcoming = book_listing(upcoming_listing, self.buyer_profile, timezone.now() + timedelta(days=1), Decimal("5.00"))
+        stale = ScrapListing.objects.create(
+            seller=self.seller_profile,
+            category=self.category,
+            description="Old cardboard",
+            quantity_kg=Decimal("10.00"),
+            price_per_kg=Decimal("8.00"),
+            location="Area 17",
+        )
+        ScrapListing.objects.filter(pk=stale.pk).update(updated_at=timezone.now() - timedelta(days=90))
+
+        out = StringIO()
+        call_command("sweep_marketplace", "--chunk-size", "1", "--pause", "0", stdout=out)
+        self.assertIn("cancelled 1 no-show orders and deactivated 1 stale listings.", out.getvalue())
+
+        overdue.refresh_from_db()
+        upcoming.refresh_from_db()
+        self.listing.refresh_from_db()
+        self.assertEqual(overdue.status, PickupOrder.Status.CANCELLED)
+        self.assertEqual(Bid.objects.get(pk=overdue.bid_id).status, Bid.Status.WITHDRAWN)
+        self.assertEqual(upcoming.status, PickupOrder.Status.CONFIRMED)
+        self.assertEqual((self.listing.status, self.listing.remaining_kg), (ScrapListing.Status.AVAILABLE, Decimal("100.00")))
+        self.assertEqual(ScrapListing.objects.get(pk=stale.pk).status, ScrapListing.Status.INACTIVE)
+        self.assertEqual(
+            set(ListingFeedEntry.objects.values_list("listing_id", flat=True)), {self.listing.pk, upcoming_listing.pk}
+        )
+        self.assertEqual(
+            NotificationOutbox.objects.filter(event=NotificationOutbox.Event.LISTING_STATUS_CHANGED).count(),
+            2,
+        )
+        # The released lot can be booked again.
+        book_listing(self.listing, self.buyer_profile, timezone.now() + timedelta(days=1))
+
+    def test_repeated_booking_post_replays_the_first_outcome(self):
+        self.client.force_login(self.buyer_user)
+        page = self.client.get(reverse("buyer_dashboard"))
+        keys = re.findall(r'name="idempotency_key" value="([0-9a-f]{32})"', page.content.decode())
+        self.assertEqual(len(keys), len(set(keys)))
+        booking = {
+            "action": "book_listing",
+            "listing_id": self.listing.id,
+            "quantity_kg": "30.00",
+            "scheduled_pickup_at": "2026-02-20T10:30",
+            "idempotency_key": keys[0],
+        }
+        first = self.client.post(reverse("buyer_dashboard"), booking, follow=True)
+        self.assertContains(first, "Booking confirmed. Pickup has been scheduled.")
+
+        with self.assertNumQueries(4):
+            repeat = self.client.post(reverse("buyer_dashboard"), booking)
+        self.assertRedirects(repeat, reverse("buyer_dashboard"), fetch_redirect_response=False)
+        self.assertContains(self.client.get(repeat.url), "Booking confirmed. Pickup has been scheduled.")
+        self.assertEqual(PickupOrder.objects.count(), 1)
+        self.assertEqual(ScrapListing.objects.get(pk=self.listing.pk).remaining_kg, Decimal("70.00"))
+
+        # A fresh key is a new submission.
+        booking["idempotency_key"] = idempotency.new_key()
+        self.assertContains(self.client.post(reverse("buyer_dashboard"), booking, follow=True), "already booked")
+
+        self.client.logout()
+        registration = {
+            "action": "register",
+            "username": "buyer2",
+            "full_name": "Second Buyer",
+            "business_name": "Second Biz",
+            "email": "buyer2@example.com",
+            "phone_number": "5550001111",
+            "password": "buyerpass123",
+            "confirm_password": "buyerpass123",
+            "idempotency_key": idempotency.new_key(),
+        }
+        for _ in range(2):
+            response = self.client.post(reverse("buyer_auth"), registration, follow=True)
+            self.assertContains(response, "Buyer account created.")
+        self.assertEqual(BuyerProfile.objects.count(), 2)
+
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        out = StringIO()
+        call_command("sweep_marketplace", "--pause", "0", stdout=out)
+        self.assertIn("Purged 3 expired idempotency keys.", out.getvalue())
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0)
+    def test_a_submission_abandoned_mid_request_can_be_retried(self):
+        self.client.force_login(self.buyer_user)
+        booking = {
+            "action": "book_listing",
+            "listing_id": self.listing.id,
+            "quantity_kg": "30.00",
+            "scheduled_pickup_at": "2026-02-20T10:30",
+            "idempotency_key": idempotency.new_key(),
+        }
+        # The first attempt's process was killed before it could complete or release the key.
+        IdempotencyKey.objects.create(
+            scope=f"user:{self.buyer_user.pk}", key=booking["idempotency_key"], path=reverse("buyer_dashboard")
+        )
+        self.assertEqual(self.client.post(reverse("buyer_dashboard"), booking).status_code, 409)
+
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(minutes=2))
+        response = self.client.post(reverse("buyer_dashboard"), booking, follow=True)
+        self.assertContains(response, "Booking confirmed. Pickup has been scheduled.")
+        self.assertIsNotNone(IdempotencyKey.objects.get(key=booking["idempotency_key"]).completed_at)
+
+    def test_change_feed_replays_every_write_from_a_cursor(self):
+        cursor = ChangeLogEntry.objects.get(model="scraplisting", object_id=self.listing.pk).pk
+        other_buyer = BuyerProfile.objects.create(
+            user=get_user_model().objects.create_user(username="buyer2", password="buyerpass123"),
+            business_name="Other Buyer",
+            phone_number="5550000000",
+        )
+        order = book_listing(self.listing, self.buyer_profile, timezone.now() + timedelta(days=1), Decimal("30.00"))
+        book_listing(self.listing, other_buyer, timezone.now() + timedelta(days=1), Decimal("70.00"))
+
+        self.assertEqual(self.client.get(reverse("change_feed")).status_code, 404)
+        with self.settings(CHANGE_FEED_TOKEN="feed-token"):
+            self.assertEqual(self.client.get(reverse("change_feed")).status_code, 401)
+            response = self.client.get(reverse("change_feed"), {"after": cursor}, HTTP_AUTHORIZATION="Bearer feed-token")
+            caught_up = self.client.get(
+                reverse("change_feed"),
+                {"after": response["X-Change-Cursor"]},
+                HTTP_AUTHORIZATION="Bearer feed-token",
+            )
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = [json.loads(line) for line in response.content.decode().splitlines()]
+        self.assertEqual(
+            [(line["model"], line["action"]) for line in lines],
+            [("scraplisting", "updated"), ("bid", "created"), ("pickuporder", "created")] * 2,
+        )
+        self.assertEqual([line["seq"] for line in lines], sorted(line["seq"] for line in lines))
+        self.assertEqual(lines[0]["data"]["remaining_kg"], "70.00")
+        self.assertEqual(lines[2]["id"], order.pk)
+        self.assertEqual((lines[3]["data"]["remaining_kg"], lines[3]["data"]["status"]), ("0.00", "reserved"))
+        self.assertEqual(int(response["X-Change-Cursor"]), lines[-1]["seq"])
+        self.assertEqual(caught_up.content, b"")
+        self.assertEqual(caught_up["X-Change-Cursor"], response["X-Change-Cursor"])
+
+        withdrawn = ScrapListing.objects.create(
+            seller=self.seller_profile,
+            category=self.category,
+            description="Copper offcuts",
+            quantity_kg=Decimal("5.00"),
+            price_per_kg=Decimal("400.00"),
+            location="Area 17",
+        )
+        withdrawn_pk = withdrawn.pk
+        withdrawn.delete()
+        self.assertEqual(
+            list(ChangeLogEntry.objects.filter(model="scraplisting", object_id=withdrawn_pk).values_list("action", flat=True)),
+            ["created", "deleted"],
+        )
+
+        # Past the cutoff only each row's latest entry survives, and deleted rows vanish.
+        ChangeLogEntry.objects.update(created_at=timezone.now() - timedelta(days=60))
+        out = StringIO()
+        call_command("compact_change_log", "--chunk-size", "2", "--pause", "0", stdout=out)
+        self.assertIn("dropped 4 change log entries.", out.getvalue())
+        remaining = list(ChangeLogEntry.objects.values_list("model", "object_id", "data"))
+        self.assertEqual(len(remaining), len({(model, object_id) for model, object_id, _ in remaining}))
+        self.assertNotIn(withdrawn_pk, [object_id for model, object_id, _ in remaining if model == "scraplisting"])
+        self.assertEqual(ChangeLogEntry.objects.get(model="scraplisting", object_id=self.listing.pk).data["status"], "reserved")
+
+    def test_admin_bulk_and_cascaded_deletes_are_change_logged(self):
+        order = book_listing(self.listing, self.buyer_profile, timezone.now() + timedelta(days=1), Decimal("30.00"))
+        admin_user = get_user_model().objects.create_superuser("admin", "admin@example.com", "adminpass123")
+        self.client.force_login(admin_user)
+        # The order protects the listing, so it goes first; the bid then cascades from the listing.
+        for model, pk in (("pickuporder", order.pk), ("scraplisting", self.listing.pk)):
+            response = self.client.post(
+                reverse(f"admin:home_{model}_changelist"),
+                {"action": "delete_selected", "_selected_action": [pk], "post": "yes"},
+            )
+            self.assertEqual(response.status_code, 302)
+        self.assertFalse(ScrapListing.objects.exists())
+        self.assertFalse(Bid.objects.exists())
+        self.assertEqual(
+            set(ChangeLogEntry.objects.filter(action=ChangeLogEntry.Action.DELETED).values_list("model", "object_id")),
+            {("scraplisting", self.listing.pk), ("bid", order.bid_id), ("pickuporder", order.pk)},
+        )
+
+        # The log itself is append-only in the admin.
+        entry = ChangeLogEntry.objects.first()
+        self.assertEqual(self.client.get(reverse("admin:home_changelogentry_delete", args=[entry.pk])).status_code, 403)
+        response = self.client.post(
+            reverse("admin:home_changelogentry_changelist"),
+            {"action": "delete_selected", "_selected_action": [entry.pk], "post": "yes"},
+        )
+        self.assertTrue(ChangeLogEntry.objects.filter(pk=entry.pk).exists())
+
+    def test_batch_booking_books_a_pickup_run_in_one_transaction(self):
+        def make_listings(count):
+            return [
+                ScrapListing.objects.create(
+                    seller=self.seller_profile,
+                    category=self.category,
+                    description=f"Aluminium lot {index}",
+                    quantity_kg=Decimal("20.00"),
+                    price_per_kg=Decimal("120.00"),
+                    location="Area 17",
+                )
+                for index in range(count)
+            ]
+
+        def book(items):
+            return self.client.post(
+                reverse("buyer_batch_booking"),
+                json.dumps({"scheduled_pickup_at": "2026-02-20T10:30", "items": items}),
+                content_type="application/json",
+            )
+
+        self.client.force_login(self.buyer_user)
+        self.assertEqual(book("not a list").status_code, 400)
+        self.assertEqual(book([{"listing_id": self.listing.pk, "quantity_kg": "-1"}]).status_code, 400)
+
+        second, third = make_listings(2)
+        response = book(
+            [
+                {"listing_id": self.listing.pk, "quantity_kg": "30.00"},
+                {"listing_id": second.pk},
+                {"listing_id": third.pk, "quantity_kg": "25.00"},
+                {"listing_id": 999999},
+                {"listing_id": second.pk},
+            ]
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual(
+            [(result["outcome"], result["quantity_kg"]) for result in results],
+            [("booked", "30.00"), ("booked", "20.00"), ("rejected", None), ("rejected", None), ("rejected", None)],
+        )
+        self.assertEqual(results[2]["error"], "Not enough quantity is left on this listing.")
+        self.listing.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((self.listing.remaining_kg, self.listing.status), (Decimal("70.00"), ScrapListing.Status.AVAILABLE))
+        self.assertEqual((second.remaining_kg, second.status), (Decimal("0.00"), ScrapListing.Status.RESERVED))
+        order = PickupOrder.objects.get(pk=results[0]["order_id"])
+        self.assertEqual((order.status, order.total_amount, order.bid.status), (PickupOrder.Status.CONFIRMED, Decimal("1500.00"), Bid.Status.ACCEPTED))
+        self.assertEqual(NotificationOutbox.objects.filter(event=NotificationOutbox.Event.LISTING_BOOKED).count(), 2)
+        self.assertEqual(
+            list(ChangeLogEntry.objects.filter(model="pickuporder").values_list("object_id", "action")),
+            [(results[0]["order_id"], "created"), (results[1]["order_id"], "created")],
+        )
+        self.assertFalse(ListingFeedEntry.objects.filter(listing_id=second.pk).exists())
+
+        # Rebooking reports the existing booking; a cancelled one is reused.
+        order.status = PickupOrder.Status.CANCELLED
+        order.save()
+        results = book([{"listing_id": self.listing.pk, "quantity_kg": "10.00"}, {"listing_id": second.pk}]).json()["results"]
+        self.assertEqual([result["outcome"] for result in results], ["booked", "already_booked"])
+        self.assertEqual(results[0]["order_id"], order.pk)
+
+        # Thirty listings cost as many queries as one.
+        single, run = make_listings(1), make_listings(30)
+        with CaptureQueriesContext(connection) as one:
+            book([{"listing_id": listing.pk} for listing in single])
+        with CaptureQueriesContext(connection) as thirty:
+            results = book([{"listing_id": listing.pk} for listing in run]).json()["results"]
+        self.assertEqual({result["outcome"] for result in results}, {"booked"})
+        self.assertEqual(len(thirty), len(one))
+
+
+@override_settings(REGION_DATABASES={"north": "north", "south": "south"})
+class RegionShardingTests(TestCase):
+    databases = {"default", "north", "south"}
+
+    def setUp(self):
+        user_model = get_user_model()
+        self.category = ScrapCategory.objects.create(name="Metal")
+        self.sellers = {}
+        for region in ("north", "south"):
+            user = user_model.objects.create_user(username=f"{region}-seller", password="sellerpass123")
+            self.sellers[region] = SellerProfile.objects.create(
+                user=user,
+                business_name=f"{region.title()} Metals",
+                pickup_address="Yard 1",
+                region=region,
+            )
+        self.buyer_user = user_model.objects.create_user(username="north-buyer", password="buyerpass123")
+        self.buyer_profile = BuyerProfile.objects.create(
+            user=self.buyer_user,
+            business_name="North Buyer",
+            phone_number="1234567890",
+            region="north",
+        )
+
+    def create_listing(self, region, description):
+        self.client.force_login(self.sellers[region].user)
+        self.client.post(
+            reverse("seller_dashboard"),
+            {
+                "action": "create_listing",
+                "category": self.category.id,
+                "description": description,
+                "quantity_kg": "20.00",
+                "price_per_kg": "12.50",
+                "location": "Block A",
+            },
+        )
+        return ScrapListing.objects.using(region).get(description=description)
+
+    def test_reference_rows_are_copied_to_every_region(self):
+        for alias in ("north", "south"):
+            self.assertTrue(BuyerProfile.objects.using(alias).filter(pk=self.buyer_profile.pk).exists())
+            self.assertEqual(ScrapCategory.objects.using(alias).get().name, "Metal")
+
+        self.category.name = "Ferrous metal"
+        self.category.save()
+        self.assertEqual(ScrapCategory.objects.using("south").get().name, "Ferrous metal")
+
+    def test_marketplace_rows_live_in_their_regions_database(self):
+        north_listing = self.create_listing("north", "Steel offcuts")
+        south_listing = self.create_listing("south", "Copper pipes")
+        self.assertEqual(north_listing.region, "north")
+        self.assertFalse(ScrapListing.objects.using("default").exists())
+        self.assertEqual(regions.fan_out(ScrapListing.objects.count), {"north": 1, "south": 1})
+        self.assertEqual(
+            list(ListingFeedEntry.objects.using("south").values_list("listing_id", flat=True)),
+            [south_listing.pk],
+        )
+
+        self.client.force_login(self.buyer_user)
+        response = self.client.get(reverse("buyer_dashboard"))
+        self.assertContains(response, "Steel offcuts")
+        self.assertNotContains(response, "Copper pipes")
+
+        self.client.post(
+            reverse("buyer_dashboard"),
+            {"action": "book_listing", "listing_id": north_listing.pk, "scheduled_pickup_at": "2026-02-20T10:30"},
+        )
+        order = PickupOrder.objects.using("north").get()
+        self.assertEqual((order.buyer_id, order.listing_id), (self.buyer_profile.pk, north_listing.pk))
+        self.assertEqual(regions.fan_out(PickupOrder.objects.count), {"north": 1, "south": 0})
+
+    def test_admin_switches_region_and_counts_every_region(self):
+        self.create_listing("north", "Steel offcuts")
+        self.create_listing("south", "Copper pipes")
+        admin_user = get_user_model().objects.create_superuser("admin", "admin@example.com", "adminpass123")
+        self.client.force_login(admin_user)
+        changelist = reverse("admin:home_scraplisting_changelist")
+
+        response = self.client.get(changelist, {"set_region": "south"})
+        self.assertContains(response, "Copper pipes")
+        self.assertNotContains(response, "Steel offcuts")
+        self.assertContains(response, "<strong>South (1)</strong>", html=True)
+        self.assertContains(response, '<a href="?set_region=north">North (1)</a>', html=True)
+
+        response = self.client.get(changelist)
+        self.assertContains(response, "Copper pipes")
+
+
+class QueryPlanTests(TestCase):
+    """
+    Every SELECT the dashboards and reports issue must be answered from an
+    index: a SEARCH rather than a SCAN, and no temporary B-tree for ORDER
+    BY/GROUP BY. Only the tables below may be scanned: categories stay a
+    short admin-curated list, and the buyer dashboard renders the whole
+    listing feed, which exists to be read in one pass.
+    """
+
+    SCANNABLE_TABLES = {"home_scrapcategory", "home_listingfeedentry"}
+
+    def setUp(self):
+        user_model = get_user_model()
+        self.buyer_user = user_model.objects.create_user(username="buyer1", password="buyerpass123")
+        buyer_profile = BuyerProfile.objects.create(user=self.buyer_user, business_name="Buyer Biz", phone_number="1")
+        self.seller_user = user_model.objects.create_user(username="seller1", password="sellerpass123")
+        seller_profile = SellerProfile.objects.create(
+            user=self.seller_user, business_name="Seller Biz", pickup_address="Warehouse 42"
+        )
+        category = ScrapCategory.objects.create(name="Metal")
+        self.listings = [
+            ScrapListing.objects.create(
+                seller=seller_profile,
+                category=category,
+                description=f"Lot {index}",
+                quantity_kg=Decimal("10.00"),
+                price_per_kg=Decimal("5.00"),
+                location="Area 17",
+            )
+            for index in range(4)
+        ]
+        for listing in self.listings[:2]:
+            book_listing(listing, buyer_profile, timezone.now())
+        old_order = PickupOrder.objects.get(listing=self.listings[0])
+        old_order.status = PickupOrder.Status.COMPLETED
+        old_order.save()
+        old = timezone.now() - timedelta(days=120)
+        PickupOrder.objects.filter(pk=old_order.pk).update(updated_at=old)
+        ScrapListing.objects.filter(pk=self.listings[0].pk).update(status=ScrapListing.Status.SOLD, updated_at=old)
+        archive_cold_rows(days=90)
+
+    def assertIndexedPlans(self, user, url):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        # Subquery and CTE scans walk a materialised result, not a table.
+        scan_forbidden = set(connection.introspection.table_names()) - self.SCANNABLE_TABLES
+        problems = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                if not query["sql"].startswith("SELECT"):
+                    continue
+                cursor.execute("EXPLAIN QUERY PLAN " + query["sql"])
+                details = [row[-1] for row in cursor.fetchall()]
+                bad = [
+                    detail
+                    for detail in details
+                    if "TEMP B-TREE" in detail or (detail.startswith("SCAN ") and detail.split()[1] in scan_forbidden)
+                ]
+                if bad:
+                    problems.append(f"{query['sql']}\n    " + "\n    ".join(details))
+        if problems:
+            self.fail(f"{url} has unindexed queries:\n" + "\n".join(problems))
+
+    def test_buyer_dashboard_queries_use_indexes(self):
+        self.assertIndexedPlans(self.buyer_user, reverse("buyer_dashboard"))
+        self.assertIndexedPlans(self.buyer_user, reverse("buyer_dashboard") + "?status=completed&placed_from=2020-01-01")
+        self.assertIndexedPlans(self.buyer_user, reverse("buyer_dashboard") + f"?before={timezone.now().timestamp() * 1e6:.0f}-99")
+
+    def test_seller_pages_use_indexes(self):
+        self.assertIndexedPlans(self.seller_user, reverse("seller_dashboard"))
+        self.assertIndexedPlans(self.seller_user, reverse("seller_sales_report"))
+        self.assertIndexedPlans(self.seller_user, reverse("seller_listing_edit", args=[self.listings[3].pk]))
+
+
+class StaticAssetTests(TestCase):
+    def setUp(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root, ignore_errors=True)
+        storages = {
+            "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+            "staticfiles": {"BACKEND": "home.storage.CompressedManifestStaticFilesStorage"},
+        }
+        settings_override = self.settings(STATIC_ROOT=static_root, STORAGES=storages)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        call_command("collectstatic", interactive=False, verbosity=0)
+        self.stylesheet_url = staticfiles_storage.url("css/styles.css")
+
+    def test_collectstatic_writes_hashed_and_precompressed_files(self):
+        self.assertRegex(self.stylesheet_url, r"/static/css/styles\.[0-9a-f]{12}\.css$")
+        hashed_name = staticfiles_storage.stored_name("css/styles.css")
+        self.assertTrue(staticfiles_storage.exists(hashed_name + ".gz"))
+
+    def test_hashed_asset_is_served_immutable_and_precompressed(self):
+        response = self.client.get(self.stylesheet_url, HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Content-Type"], "text/css")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+
+        plain = self.client.get(self.stylesheet_url, HTTP_ACCEPT_ENCODING="gzip;q=0")
+        self.assertFalse(plain.has_header("Content-Encoding"))
+
+
+class WalJournalMixin:
+    """Run the contention tests on a WAL journal, as the benchmarks do."""
+
+    def setUp(self):
+        connection_created.connect(wal_journal)
+        self.addCleanup(connection_created.disconnect, wal_journal)
+        # Reconnect so the journal is switched before the worker threads start.
+        connection.close()
+        super().setUp()
+
+
+class AuctionContentionTests(WalJournalMixin, TransactionTestCase):
+    bidders = 200
+
+    def setUp(self):
+        super().setUp()
+        user_model = get_user_model()
+        seller_user = user_model.objects.create(username="auction-seller", email="auction-seller@example.com")
+        seller = SellerProfile.objects.create(user=seller_user, business_name="Auction Yard", pickup_address="Dock 3")
+        self.listing = ScrapListing.objects.create(
+            seller=seller,
+            category=ScrapCategory.objects.create(name="Copper"),
+            description="Copper cable drums",
+            quantity_kg=Decimal("10.00"),
+            price_per_kg=Decimal("100.00"),
+            location="Dock 3",
+            sale_mode=ScrapListing.SaleMode.AUCTION,
+            auction_ends_at=timezone.now() + timedelta(hours=1),
+        )
+        users = user_model.objects.bulk_create(
+            [user_model(username=f"bidder-{index}", email=f"bidder-{index}@example.com") for index in range(self.bidders)]
+        )
+        self.buyers = BuyerProfile.objects.bulk_create(
+            [BuyerProfile(user=user, business_name=f"Bidder {index}", phone_number="1") for index, user in enumerate(users)]
+        )
+
+    def test_concurrent_bidders_leave_the_highest_bid_on_top(self):
+        prices = [Decimal("100.00") + index for index in range(self.bidders)]
+        random.Random(5244).shuffle(prices)
+        barrier = threading.Barrier(self.bidders)
+        accepted, rejected, errors = [], [], []
+
+        def bid(buyer, price):
+            try:
+                barrier.wait()
+                place_bid(self.listing, buyer, price)
+                accepted.append(price)
+            except BidRejected:
+                rejected.append(price)
+            except Exception as exc:  # noqa: BLE001 - surfaced through the assertion below
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=bid, args=pair) for pair in zip(self.buyers, prices)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(accepted) + len(rejected), self.bidders)
+        self.listing.refresh_from_db()
+        top_price = max(prices)
+        self.assertEqual(self.listing.top_bid_price, top_price)
+        self.assertEqual(self.listing.top_bidder, self.buyers[prices.index(top_price)])
+        self.assertEqual(self.listing.bid_count, len(accepted))
+        self.assertEqual(Bid.objects.count(), len(accepted))
+
+        self.assertEqual(close_due_auctions(now=timezone.now() + timedelta(hours=2)), (1, 0))
+        order = PickupOrder.objects.get()
+        self.assertEqual(order.buyer, self.listing.top_bidder)
+        self.assertEqual(order.total_amount, top_price * Decimal("10.00"))
+        self.assertEqual(Bid.objects.filter(status=Bid.Status.ACCEPTED).count(), 1)
+        self.assertEqual(Bid.objects.filter(status=Bid.Status.REJECTED).count(), len(accepted) - 1)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.status, ScrapListing.Status.RESERVED)
+        self.assertFalse(ListingFeedEntry.objects.exists())
+
+
+class PartialBookingContentionTests(WalJournalMixin, TransactionTestCase):
+    buyers_count = 60
+
+    def test_concurrent_partial_bookings_never_oversell(self):
+        user_model = get_user_model()
+        seller = SellerProfile.objects.create(
+            user=user_model.objects.create(username="lot-seller", email="lot-seller@example.com"),
+            business_name="Big Lot Yard",
+            pickup_address="Gate 1",
+        )
+        listing = ScrapListing.objects.create(
+            seller=seller,
+            category=ScrapCategory.objects.create(name="Cardboard"),
+            description="Baled cardboard",
+            quantity_kg=Decimal("2000.00"),
+            price_per_kg=Decimal("8.00"),
+            location="Gate 1",
+        )
+        users = user_model.objects.bulk_create(
+            [user_model(username=f"lot-buyer-{index}", email=f"lot-buyer-{index}@example.com") for index in range(self.buyers_count)]
+        )
+        buyers = BuyerProfile.objects.bulk_create(
+            [BuyerProfile(user=user, business_name=f"Lot Buyer {index}", phone_number="1") for index, user in enumerate(users)]
+        )
+        barrier = threading.Barrier(self.buyers_count)
+        booked, refused, errors = [], [], []
+
+        def book(buyer):
+            try:
+                barrier.wait()
+                book_listing(listing, buyer, timezone.now(), Decimal("50.00"))
+                booked.append(buyer.pk)
+            except BookingError:
+                refused.append(buyer.pk)
+            except Exception as exc:  # noqa: BLE001 - surfaced through the assertion below
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book, args=(buyer,)) for buyer in buyers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual((len(booked), len(refused)), (40, 20))
+        listing.refresh_from_db()
+        self.assertEqual(listing.remaining_kg, Decimal("0.00"))
+        self.assertEqual(listing.status, ScrapListing.Status.RESERVED)
+        booked_kg = sum(order.bid.quantity_kg for order in PickupOrder.objects.select_related("bid"))
+        self.assertEqual(booked_kg, listing.quantity_kg)
+
+    def test_concurrent_submits_from_one_buyer_book_once(self):
+        user_model = get_user_model()
+        seller = SellerProfile.objects.create(
+            user=user_model.objects.create(username="twin-seller", email="twin-seller@example.com"),
+            business_name="Twin Yard",
+            pickup_address="Gate 2",
+        )
+        listing = ScrapListing.objects.create(
+            seller=seller,
+            category=ScrapCategory.objects.create(name="Copper"),
+            description="Copper coil",
+            quantity_kg=Decimal("100.00"),
+            price_per_kg=Decimal("400.00"),
+            location="Gate 2",
+        )
+        buyer = BuyerProfile.objects.create(
+            user=user_model.objects.create(username="twin-buyer", email="twin-buyer@example.com"),
+            business_name="Twin Buyer",
+            phone_number="1",
+        )
+        submits = 8
+        barrier = threading.Barrier(submits)
+        booked, already, errors = [], [], []
+
+        def book():
+            try:
+                barrier.wait()
+                booked.append(book_listing(listing, buyer, timezone.now(), Decimal("10.00")).pk)
+            except AlreadyBooked:
+                already.append(True)
+            except Exception as exc:  # noqa: BLE001 - surfaced through the assertion below
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book) for _ in range(submits)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual((len(booked), len(already)), (1, submits - 1))
+        listing.refresh_from_db()
+        self.assertEqual(listing.remaining_kg, Decimal("90.00"))
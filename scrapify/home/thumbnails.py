@@ -0,0 +1,82 @@
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from .models import ListingPhoto, ScrapListing
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is only needed by the worker that builds thumbnails.
+    Image = None
+    ImageOps = None
+
+# Photos that raise these are given up on: unreadable or truncated files
+# and decompression bombs.
+THUMBNAIL_ERRORS = (OSError, ValueError)
+if Image is not None:
+    THUMBNAIL_ERRORS += (Image.DecompressionBombError,)
+
+
+def render_thumbnail(fileobj):
+    """Return JPEG bytes for a resized, compressed copy of an uploaded photo."""
+    if Image is None:
+        raise RuntimeError("Pillow is required to generate listing thumbnails.")
+
+    with Image.open(fileobj) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(settings.LISTING_THUMBNAIL_SIZE)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        buffer = BytesIO()
+        image.save(
+            buffer,
+            format="JPEG",
+            quality=settings.LISTING_THUMBNAIL_QUALITY,
+            optimize=True,
+            progressive=True,
+        )
+    return buffer.getvalue()
+
+
+def process_photo(photo):
+    with photo.original.open("rb") as original:
+        data = render_thumbnail(original)
+
+    content_hash = hashlib.sha256(data).hexdigest()
+    name = f"{content_hash[:20]}.jpg"
+    storage = photo.thumbnail.storage
+    target = photo.thumbnail.field.generate_filename(photo, name)
+    if storage.exists(target):
+        photo.thumbnail.name = target
+    else:
+        photo.thumbnail.save(name, ContentFile(data), save=False)
+
+    photo.content_hash = content_hash
+    photo.processed_at = timezone.now()
+    photo.save(update_fields=["thumbnail", "content_hash", "processed_at", "updated_at"])
+    # Touch the listing so feed validators (ETags) notice the new thumbnail.
+    ScrapListing.objects.filter(pk=photo.listing_id).update(updated_at=photo.processed_at)
+    return photo
+
+
+def process_pending(batch_size=50):
+    """Build thumbnails for one batch of unprocessed photos. Returns (processed, failed)."""
+    pending = list(
+        ListingPhoto.objects.filter(processed_at__isnull=True).order_by("pk")[:batch_size]
+    )
+    processed = 0
+    failed = 0
+    for photo in pending:
+        try:
+            process_photo(photo)
+        except THUMBNAIL_ERRORS:
+            # Failed uploads are marked processed without a thumbnail so
+            # they are not retried forever; the feed simply skips them.
+            ListingPhoto.objects.filter(pk=photo.pk).update(processed_at=timezone.now())
+            failed += 1
+        else:
+            processed += 1
+    return processed, failed
@@ -8,8 +8,14 @@ urlpatterns = [
     path("buyer/", views.buyauth, name="buyer_auth"),
     path("seller/", views.sellerauth, name="seller_auth"),
     path("buyer/dashboard/", views.buyerdashboard, name="buyer_dashboard"),
+    path("buyer/bookings/batch/", views.buyer_batch_booking, name="buyer_batch_booking"),
     path("seller/dashboard/", views.sellerdashboard, name="seller_dashboard"),
     path("seller/listings/<int:listing_id>/edit/", views.seller_listing_edit, name="seller_listing_edit"),
+    path("seller/listings/bulk-edit/", views.seller_listings_bulk_edit, name="seller_listings_bulk_edit"),
+    path("seller/reports/sales/", views.seller_sales_report, name="seller_sales_report"),
+    path("seller/price-suggestion/", views.seller_price_suggestion, name="seller_price_suggestion"),
     path("about/", views.about, name="about"),
     path("logout/", views.logout_view, name="logout"),
+    path("metrics", views.metrics_view, name="metrics"),
+    path("changes", views.change_feed, name="change_feed"),
 ]
\ No newline at end of file
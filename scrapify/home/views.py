@@ -1,20 +1,51 @@
+import hmac
+import json
+from decimal import Decimal, InvalidOperation
+from urllib.parse import urlencode
+
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, get_user_model, login, logout
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
 from django.db import transaction
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils.dateparse import parse_datetime
 from django.utils import timezone
 
+from . import changelog, duplicates, geocoding, metrics, pricing, regions
+from .auctions import BidRejected, place_bid
+from .booking import AlreadyBooked, BookingError, book_listing, book_listings, bookable_listings
+from .bulk_edit import BulkEditError, apply_forms, editable_listings, patch_forms, read_patch
+from .conditional import (
+    buyer_dashboard_etag,
+    buyer_dashboard_last_modified,
+    conditional_page,
+    seller_dashboard_etag,
+    seller_dashboard_last_modified,
+    static_page,
+)
 from .forms import (
+    BatchBookingForm,
+    BookingHistoryFilterForm,
+    BookingQuantityForm,
+    BulkListingFormSet,
+    BulkListingPatchForm,
     BuyerRegistrationForm,
+    ChangeFeedForm,
     LoginForm,
+    PriceSuggestionForm,
+    SalesReportForm,
     SellerDashboardListingForm,
     SellerRegistrationForm,
     create_user_and_buyer_profile,
     create_user_and_seller_profile,
 )
-from .models import Bid, PickupOrder, ScrapCategory, ScrapListing
+from .history import buyer_order_page, buyer_order_summary, seller_listing_history, seller_order_history
+from .idempotency import idempotent
+from .models import ListingFeedEntry, ScrapCategory, ScrapListing
+from .rollups import default_report_range, sales_report
 
 
 def _ensure_default_categories():
@@ -71,10 +102,12 @@ def seller_required(view_func):
     return _wrapped
 
 
+@static_page("landing.html")
 def landing(request):
     return render(request, "landing.html")
 
 
+@idempotent
 def buyauth(request):
     login_form = LoginForm()
     register_form = BuyerRegistrationForm()
@@ -91,10 +124,13 @@ def buyauth(request):
                 user = authenticate(request, username=username, password=password)
 
                 if user is None:
+                    metrics.logins.inc(role="buyer", outcome="failure")
                     messages.error(request, "Invalid login credentials.")
                 elif not hasattr(user, "buyer_profile"):
+                    metrics.logins.inc(role="buyer", outcome="wrong_role")
                     messages.error(request, "This account is not registered as a buyer.")
                 else:
+                    metrics.logins.inc(role="buyer", outcome="success")
                     login(request, user)
                     messages.success(request, "Logged in successfully.")
                     return redirect("buyer_dashboard")
@@ -125,6 +161,7 @@ def buyauth(request):
     return render(request, "buyer_auth.html", context)
 
 
+@idempotent
 def sellerauth(request):
     login_form = LoginForm()
     register_form = SellerRegistrationForm()
@@ -141,10 +178,13 @@ def sellerauth(request):
                 user = authenticate(request, username=username, password=password)
 
                 if user is None:
+                    metrics.logins.inc(role="seller", outcome="failure")
                     messages.error(request, "Invalid login credentials.")
                 elif not hasattr(user, "seller_profile"):
+                    metrics.logins.inc(role="seller", outcome="wrong_role")
                     messages.error(request, "This account is not registered as a seller.")
                 else:
+                    metrics.logins.inc(role="seller", outcome="success")
                     login(request, user)
                     messages.success(request, "Logged in successfully.")
                     return redirect("seller_dashboard")
@@ -176,9 +216,31 @@ def sellerauth(request):
 
 
 @buyer_required
+@idempotent
+@conditional_page(buyer_dashboard_etag, buyer_dashboard_last_modified)
 def buyerdashboard(request):
     buyer_profile = request.user.buyer_profile
 
+    if request.method == "POST" and request.POST.get("action") == "place_bid":
+        listing = get_object_or_404(
+            ScrapListing,
+            pk=request.POST.get("listing_id"),
+            sale_mode=ScrapListing.SaleMode.AUCTION,
+        )
+        try:
+            bid_price_per_kg = Decimal(request.POST.get("bid_price_per_kg", "").strip())
+        except InvalidOperation:
+            messages.error(request, "Please provide a valid bid price.")
+            return redirect("buyer_dashboard")
+
+        try:
+            place_bid(listing, buyer_profile, bid_price_per_kg)
+        except BidRejected as exc:
+            messages.error(request, str(exc))
+        else:
+            messages.success(request, "Bid placed. You are the current top bidder.")
+        return redirect("buyer_dashboard")
+
     if request.method == "POST" and request.POST.get("action") == "book_listing":
         listing_id = request.POST.get("listing_id")
         scheduled_pickup_input = request.POST.get("scheduled_pickup_at", "").strip()
@@ -199,85 +261,87 @@ def buyerdashboard(request):
             )
 
         listing = get_object_or_404(
-            ScrapListing.objects.select_related("seller", "category"),
+            bookable_listings().select_related("seller", "category"),
             pk=listing_id,
-            status=ScrapListing.Status.AVAILABLE,
         )
 
-        existing_booking = PickupOrder.objects.filter(
-            buyer=buyer_profile,
-            listing=listing,
-        ).exclude(status=PickupOrder.Status.CANCELLED).first()
-
-        if existing_booking:
-            messages.info(request, "You have already booked this listing.")
+        quantity_form = BookingQuantityForm(request.POST)
+        if not quantity_form.is_valid():
+            messages.error(request, "Please provide a valid quantity.")
             return redirect("buyer_dashboard")
+        quantity_kg = quantity_form.cleaned_data["quantity_kg"]
 
-        with transaction.atomic():
-            bid, _ = Bid.objects.select_for_update().get_or_create(
-                listing=listing,
-                buyer=buyer_profile,
-                defaults={
-                    "quantity_kg": listing.quantity_kg,
-                    "bid_price_per_kg": listing.price_per_kg,
-                    "message": "Booked directly from buyer dashboard.",
-                    "status": Bid.Status.ACCEPTED,
-                },
-            )
-
-            if bid.status != Bid.Status.ACCEPTED:
-                bid.quantity_kg = listing.quantity_kg
-                bid.bid_price_per_kg = listing.price_per_kg
-                bid.status = Bid.Status.ACCEPTED
-                bid.message = "Booked directly from buyer dashboard."
-                bid.save(update_fields=["quantity_kg", "bid_price_per_kg", "status", "message", "updated_at"])
-
-            PickupOrder.objects.update_or_create(
-                bid=bid,
-                defaults={
-                    "listing": listing,
-                    "buyer": buyer_profile,
-                    "seller": listing.seller,
-                    "scheduled_pickup_at": scheduled_pickup_at,
-                    "pickup_address": listing.seller.pickup_address,
-                    "status": PickupOrder.Status.CONFIRMED,
-                    "total_amount": bid.total_value,
-                },
-            )
-
-            listing.status = ScrapListing.Status.RESERVED
-            listing.save(update_fields=["status", "updated_at"])
+        try:
+            book_listing(listing, buyer_profile, scheduled_pickup_at, quantity_kg)
+        except AlreadyBooked as exc:
+            metrics.bookings.inc(outcome="already_booked")
+            messages.info(request, str(exc))
+            return redirect("buyer_dashboard")
+        except BookingError as exc:
+            metrics.bookings.inc(outcome="rejected")
+            messages.error(request, str(exc))
+            return redirect("buyer_dashboard")
 
+        metrics.bookings.inc(outcome="booked")
         messages.success(request, "Booking confirmed. Pickup has been scheduled.")
         return redirect("buyer_dashboard")
 
-    available_listings = ScrapListing.objects.filter(
-        status=ScrapListing.Status.AVAILABLE,
-    ).select_related("seller", "category")
+    available_listings = ListingFeedEntry.objects.all()
 
-    my_bookings = PickupOrder.objects.filter(
-        buyer=buyer_profile,
-    ).exclude(status=PickupOrder.Status.CANCELLED).select_related("listing", "seller", "listing__category")
+    history_form = BookingHistoryFilterForm(request.GET or None)
+    filters = history_form.cleaned_data if history_form.is_valid() else {}
+    my_bookings, next_cursor = buyer_order_page(buyer_profile, before=request.GET.get("before"), **filters)
+    booking_summary = buyer_order_summary(buyer_profile, **filters)
+    next_page_query = None
+    if next_cursor:
+        query = {key: value for key, value in request.GET.items() if value and key != "before"}
+        next_page_query = urlencode({**query, "before": next_cursor})
 
     context = {
         "available_listings": available_listings,
         "my_bookings": my_bookings,
+        "history_form": history_form,
+        "booking_summary": booking_summary,
+        "booking_totals": {
+            "count": sum(row["count"] for row in booking_summary),
+            "quantity": sum((row["quantity"] for row in booking_summary), Decimal("0.00")),
+            "amount": sum((row["amount"] for row in booking_summary), Decimal("0.00")),
+        },
+        "next_page_query": next_page_query,
     }
     return render(request, "buyer_dashboard.html", context)
 
 
 @seller_required
+@idempotent
+@conditional_page(seller_dashboard_etag, seller_dashboard_last_modified)
 def sellerdashboard(request):
     seller_profile = request.user.seller_profile
     _ensure_default_categories()
 
     if request.method == "POST" and request.POST.get("action") == "create_listing":
-        listing_form = SellerDashboardListingForm(request.POST)
+        listing_form = SellerDashboardListingForm(request.POST, request.FILES)
+        if listing_form.is_valid() and not listing_form.cleaned_data["post_duplicate"]:
+            reposts = duplicates.find_duplicates(
+                seller_profile.pk,
+                listing_form.cleaned_data["category"].pk,
+                listing_form.cleaned_data["description"],
+                listing_form.cleaned_data["location"],
+            )
+            if reposts:
+                listing_ids = ", ".join(f"#{listing_id}" for _, listing_id in reposts[:5])
+                listing_form.add_error(
+                    None,
+                    f"This looks like a repost of your open listing {listing_ids}. "
+                    "Edit that listing instead, or tick \"Post anyway\" if this is a separate lot.",
+                )
         if listing_form.is_valid():
             listing = listing_form.save(commit=False)
             listing.seller = seller_profile
             listing.status = ScrapListing.Status.AVAILABLE
             listing.save()
+            listing_form.save_photo(listing)
+            metrics.listings_created.inc(sale_mode=listing.sale_mode)
             messages.success(request, "Listing added successfully.")
             return redirect("seller_dashboard")
         for errors in listing_form.errors.values():
@@ -286,14 +350,15 @@ def sellerdashboard(request):
     else:
         listing_form = SellerDashboardListingForm()
 
-    listings = ScrapListing.objects.filter(seller=seller_profile).select_related("category")
-    bookings = PickupOrder.objects.filter(
-        seller=seller_profile,
-    ).exclude(status=PickupOrder.Status.CANCELLED).select_related("listing", "buyer")
+    listings = seller_listing_history(seller_profile)
+    bookings = seller_order_history(seller_profile)
 
     context = {
         "total_listings_count": listings.count(),
-        "available_listings_count": listings.filter(status=ScrapListing.Status.AVAILABLE).count(),
+        "available_listings_count": ScrapListing.objects.filter(
+            seller=seller_profile,
+            status=ScrapListing.Status.AVAILABLE,
+        ).count(),
         "bookings_count": bookings.count(),
         "listings": listings,
         "bookings": bookings[:10],
@@ -302,6 +367,100 @@ def sellerdashboard(request):
     return render(request, "seller_dashboard.html", context)
 
 
+@seller_required
+def seller_sales_report(request):
+    start, end = default_report_range()
+    form = SalesReportForm(request.GET or None, initial={"start": start, "end": end})
+    if form.is_bound:
+        if form.is_valid():
+            start, end = form.cleaned_data["start"], form.cleaned_data["end"]
+        else:
+            for errors in form.errors.values():
+                for error in errors:
+                    messages.error(request, error)
+
+    months, categories = sales_report(request.user.seller_profile, start, end)
+    context = {
+        "form": form,
+        "start": start,
+        "end": end,
+        "months": months,
+        "categories": categories,
+    }
+    return render(request, "seller_sales_report.html", context)
+
+
+@seller_required
+def seller_price_suggestion(request):
+    form = PriceSuggestionForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    if pricing.np is None:
+        return JsonResponse({"errors": {"__all__": ["Price suggestions are unavailable."]}}, status=503)
+    seller_profile = request.user.seller_profile
+    place = geocoding.geocode(form.cleaned_data["location"]) if form.cleaned_data["location"] else None
+    latitude, longitude = (place.latitude, place.longitude) if place else (seller_profile.latitude, seller_profile.longitude)
+    suggestion = pricing.suggest_price(
+        form.cleaned_data["category"],
+        form.cleaned_data["quantity_kg"],
+        latitude,
+        longitude,
+    )
+    if suggestion is None:
+        return JsonResponse({"price_per_kg": None, "trades": 0})
+    return JsonResponse(
+        {
+            "price_per_kg": str(suggestion.price_per_kg),
+            "low": str(suggestion.low),
+            "high": str(suggestion.high),
+            "trades": suggestion.trades,
+        }
+    )
+
+
+@buyer_required
+def buyer_batch_booking(request):
+    if request.method != "POST":
+        return JsonResponse({"errors": {"__all__": ["Use POST."]}}, status=405)
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict):
+        return JsonResponse({"errors": {"__all__": ["Send a JSON object."]}}, status=400)
+    form = BatchBookingForm(payload)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+
+    try:
+        results = book_listings(
+            request.user.buyer_profile,
+            form.cleaned_data["scheduled_pickup_at"],
+            form.cleaned_data["items"],
+        )
+    except BookingError as exc:
+        return JsonResponse({"errors": {"__all__": [str(exc)]}}, status=409)
+
+    for result in results:
+        metrics.bookings.inc(outcome=result.outcome)
+    return JsonResponse(
+        {
+            "results": [
+                {
+                    "listing_id": result.listing_id,
+                    "outcome": result.outcome,
+                    "order_id": result.order.pk if result.order else None,
+                    "quantity_kg": str(result.order.bid.quantity_kg) if result.order else None,
+                    "total_amount": str(result.order.total_amount) if result.order else None,
+                    "error": result.error,
+                }
+                for result in results
+            ]
+        }
+    )
+
+
+@static_page("about.html")
 def about(request):
     return render(request, "about.html")
 
@@ -311,17 +470,105 @@ def seller_listing_edit(request, listing_id):
     listing = get_object_or_404(ScrapListing, pk=listing_id, seller=request.user.seller_profile)
 
     if request.method == "POST":
-        form = SellerDashboardListingForm(request.POST, instance=listing)
+        form = SellerDashboardListingForm(request.POST, request.FILES, instance=listing)
         if form.is_valid():
-            form.save()
-            messages.success(request, "Listing updated successfully.")
-            return redirect("seller_dashboard")
+            try:
+                form.save()
+            except ValidationError as exc:
+                form.add_error("quantity_kg", exc)
+            else:
+                form.save_photo(listing)
+                messages.success(request, "Listing updated successfully.")
+                return redirect("seller_dashboard")
     else:
         form = SellerDashboardListingForm(instance=listing)
 
     return render(request, "seller_listing_form.html", {"form": form, "mode": "edit", "listing": listing})
 
 
+def _apply_bulk_edit(request, forms):
+    try:
+        updated = apply_forms(forms)
+    except BulkEditError as exc:
+        messages.error(request, str(exc))
+        return redirect("seller_listings_bulk_edit")
+    messages.success(request, f"Updated {updated} listing{'' if updated == 1 else 's'}.")
+    return redirect("seller_dashboard")
+
+
+@seller_required
+def seller_listings_bulk_edit(request):
+    seller_profile = request.user.seller_profile
+    listings = editable_listings(seller_profile)
+    formset = BulkListingFormSet(queryset=listings)
+    patch_form = BulkListingPatchForm()
+
+    if request.method == "POST" and request.POST.get("action") == "save_listings":
+        formset = BulkListingFormSet(request.POST, queryset=listings)
+        if formset.is_valid():
+            return _apply_bulk_edit(request, formset.forms)
+        messages.error(request, "Some listings could not be saved; see the highlighted rows.")
+
+    elif request.method == "POST" and request.POST.get("action") == "apply_patch":
+        patch_form = BulkListingPatchForm(request.POST, request.FILES)
+        if patch_form.is_valid():
+            try:
+                forms, errors = patch_forms(seller_profile, read_patch(patch_form.cleaned_data["patch"]))
+            except BulkEditError as exc:
+                messages.error(request, str(exc))
+            else:
+                if not errors:
+                    return _apply_bulk_edit(request, forms)
+                for line_number, error in errors[:50]:
+                    messages.error(request, f"Line {line_number}: {error}")
+                messages.error(request, "Nothing was changed; fix the patch and upload it again.")
+        else:
+            for errors in patch_form.errors.values():
+                for error in errors:
+                    messages.error(request, error)
+
+    context = {
+        "formset": formset,
+        "patch_form": patch_form,
+    }
+    return render(request, "seller_listings_bulk_edit.html", context)
+
+
+def metrics_view(request):
+    # Per-view traffic and latency are not for the public: off without a token.
+    if not settings.METRICS_TOKEN:
+        raise Http404
+    if not hmac.compare_digest(
+        request.headers.get("Authorization", "").encode(),
+        f"Bearer {settings.METRICS_TOKEN}".encode(),
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def change_feed(request):
+    # The entries carry addresses and prices, so the feed is off without a token.
+    if not settings.CHANGE_FEED_TOKEN:
+        raise Http404
+    if not hmac.compare_digest(
+        request.headers.get("Authorization", "").encode(),
+        f"Bearer {settings.CHANGE_FEED_TOKEN}".encode(),
+    ):
+        return HttpResponse(status=401)
+    form = ChangeFeedForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    with regions.use_region(form.cleaned_data["region"]):
+        entries = changelog.entries_after(form.cleaned_data["after"], form.cleaned_data["limit"])
+    response = HttpResponse(
+        "".join(changelog.to_json(entry) + "\n" for entry in entries),
+        content_type="application/x-ndjson",
+    )
+    # Where the next request resumes; unchanged when there is nothing new.
+    response["X-Change-Cursor"] = entries[-1].pk if entries else form.cleaned_data["after"]
+    return response
+
+
 @login_required
 def logout_view(request):
     logout(request)
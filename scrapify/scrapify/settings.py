@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
 import os
+from datetime import timedelta
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,10 +47,15 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'home.middleware.StaticAssetMiddleware',
+    'home.middleware.ProfilingMiddleware',
+    'home.middleware.MetricsMiddleware',
+    'home.middleware.HtmlGZipMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'home.middleware.RegionMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -60,12 +66,23 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / "templates"],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Cache compiled templates in every environment, not only when
+            # Django would pick the cached loader for us.
+            'loaders': [
+                (
+                    'django.template.loaders.cached.Loader',
+                    [
+                        'django.template.loaders.filesystem.Loader',
+                        'django.template.loaders.app_directories.Loader',
+                    ],
+                ),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'home.idempotency.idempotency_key',
             ],
         },
     },
@@ -81,9 +98,77 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock at BEGIN so concurrent writers queue on the
+            # busy timeout instead of failing on a read-to-write lock upgrade.
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        'TEST': {
+            # A file rather than shared-cache memory, so threaded concurrency
+            # tests get real SQLite locking semantics.
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
+# Regions
+# DJANGO_REGIONS lists the cities we operate in, e.g. "north,south". Each
+# region gets its own SQLite file holding its listings, bids, orders and
+# everything derived from them, so cities no longer share one write lock
+# (see home.routers.RegionRouter). Users, profiles and categories stay in
+# 'default' and are copied into every region database. Without
+# DJANGO_REGIONS there is a single region stored in 'default'.
+
+REGIONS = [region.strip() for region in os.getenv('DJANGO_REGIONS', '').split(',') if region.strip()]
+REGION_DATABASES = {region: region for region in REGIONS} or {'local': 'default'}
+
+for _alias in REGIONS:
+    DATABASES[_alias] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / f'db_{_alias}.sqlite3',
+        'TEST': {'NAME': BASE_DIR / f'test_db_{_alias}.sqlite3'},
+    }
+
+DATABASE_ROUTERS = ['home.routers.RegionRouter']
+
+
+# Caches, sessions and flash messages
+# DJANGO_SESSION_BACKEND selects where sessions live:
+#   db             - one session row read per request and written on change (default)
+#   cache          - shared file cache, no database traffic
+#   cached_db      - cache reads with database write-through
+#   signed_cookies - stateless, stored client-side and signed with SECRET_KEY
+# DJANGO_MESSAGE_STORAGE selects where flash messages live: "fallback"
+# (cookie, spilling into the session when too large), "cookie" or "session".
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sessions': {
+        # File-based so every worker process on the host shares it.
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'sessions',
+    },
+}
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[os.getenv("DJANGO_SESSION_BACKEND", "db")]
+SESSION_CACHE_ALIAS = 'sessions'
+
+MESSAGE_STORAGES = {
+    'fallback': 'django.contrib.messages.storage.fallback.FallbackStorage',
+    'cookie': 'django.contrib.messages.storage.cookie.CookieStorage',
+    'session': 'django.contrib.messages.storage.session.SessionStorage',
+}
+MESSAGE_STORAGE = MESSAGE_STORAGES[os.getenv("DJANGO_MESSAGE_STORAGE", "fallback")]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -121,3 +206,156 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Outside DEBUG, collectstatic writes content-hashed names plus .gz/.br
+# variants, and home.middleware.StaticAssetMiddleware serves them with
+# immutable caching. DEBUG keeps plain names so no collectstatic is needed.
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": (
+            "django.contrib.staticfiles.storage.StaticFilesStorage"
+            if DEBUG
+            else "home.storage.CompressedManifestStaticFilesStorage"
+        ),
+    },
+}
+STATIC_HASHED_MAX_AGE = 60 * 60 * 24 * 365
+STATIC_UNHASHED_MAX_AGE = 60 * 5
+
+
+# Uploaded media (listing photos)
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+LISTING_PHOTO_MAX_BYTES = 10 * 1024 * 1024
+LISTING_THUMBNAIL_SIZE = (480, 480)
+LISTING_THUMBNAIL_QUALITY = 72
+
+
+# Bulk listing editor
+# Each formset row posts five fields, so Django's default cap of 1000 fields
+# would reject an edit of more than ~200 listings.
+
+DATA_UPLOAD_MAX_NUMBER_FIELDS = 10000
+BULK_EDIT_BATCH_SIZE = 500
+
+
+# Geocoding
+# Addresses are resolved offline against a CSV gazetteer of pincode and
+# locality centroids (name,latitude,longitude). Without the file, listings
+# and profiles simply have no coordinates. `manage.py geocode_addresses`
+# backfills existing rows.
+
+GEOCODER_GAZETTEER = Path(os.getenv("DJANGO_GEOCODER_GAZETTEER", BASE_DIR / "gazetteer.csv"))
+
+
+# Price suggestions
+# The seller dashboard suggests a price per kg from the nearest recent
+# trades (home.pricing, needs NumPy). Each worker keeps the last
+# PRICE_SUGGESTION_WINDOW_DAYS of trades in memory and rebuilds that copy
+# in the background once it is PRICE_SUGGESTION_REFRESH_SECONDS old.
+
+PRICE_SUGGESTION_WINDOW_DAYS = int(os.getenv("DJANGO_PRICE_SUGGESTION_WINDOW_DAYS", "180"))
+PRICE_SUGGESTION_REFRESH_SECONDS = float(os.getenv("DJANGO_PRICE_SUGGESTION_REFRESH_SECONDS", "600"))
+PRICE_SUGGESTION_NEIGHBOURS = 15
+
+
+# Duplicate listings
+# A new listing whose description and address are at least this similar
+# (estimated Jaccard similarity of character shingles, home.duplicates) to
+# an open listing of the same seller and category is held back as a repost
+# unless the seller confirms it is a separate lot.
+
+DUPLICATE_LISTING_THRESHOLD = float(os.getenv("DJANGO_DUPLICATE_LISTING_THRESHOLD", "0.8"))
+
+
+# Archival
+# `manage.py archive_cold_rows` moves COMPLETED/CANCELLED orders and
+# SOLD/INACTIVE listings untouched for this many days into archive tables.
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("DJANGO_ARCHIVE_AFTER_DAYS", "90"))
+
+
+# Marketplace sweeper
+# `manage.py sweep_marketplace` (run it every few minutes) cancels confirmed
+# orders whose pickup is NO_SHOW_GRACE_HOURS overdue, releasing their
+# quantity, and deactivates fixed-price listings untouched for
+# LISTING_TTL_DAYS.
+
+LISTING_TTL_DAYS = int(os.getenv("DJANGO_LISTING_TTL_DAYS", "60"))
+NO_SHOW_GRACE_HOURS = int(os.getenv("DJANGO_NO_SHOW_GRACE_HOURS", "48"))
+
+
+# Idempotency keys
+# Repeated booking, bid, listing and sign-up POSTs replay the first
+# outcome for this long instead of running again (home.idempotency).
+
+IDEMPOTENCY_KEY_TTL = timedelta(hours=int(os.getenv("DJANGO_IDEMPOTENCY_KEY_TTL_HOURS", "24")))
+IDEMPOTENCY_WAIT_SECONDS = 5.0
+# A submission still running after this long is taken to have died with its
+# process; a repeat then runs it again instead of answering 409.
+IDEMPOTENCY_LEASE = timedelta(seconds=int(os.getenv("DJANGO_IDEMPOTENCY_LEASE_SECONDS", "60")))
+
+
+# Notifications
+# Booking and listing events are written to the outbox table inside the
+# request transaction and delivered later by `manage.py dispatch_notifications`.
+
+DEFAULT_FROM_EMAIL = os.getenv("DJANGO_DEFAULT_FROM_EMAIL", "ScrapiFy <no-reply@scrapify.local>")
+NOTIFICATION_EMAIL_BACKEND = os.getenv(
+    "DJANGO_NOTIFICATION_EMAIL_BACKEND",
+    "django.core.mail.backends.console.EmailBackend",
+)
+EMAIL_FILE_PATH = BASE_DIR / "sent_emails"
+NOTIFICATION_BATCH_SIZE = int(os.getenv("DJANGO_NOTIFICATION_BATCH_SIZE", "200"))
+# A dispatcher's claim on a batch expires after this long, so rows held by
+# one that crashed mid-send are picked up again.
+NOTIFICATION_CLAIM_LEASE = timedelta(minutes=int(os.getenv("DJANGO_NOTIFICATION_CLAIM_LEASE_MINUTES", "10")))
+
+
+# Request profiling
+# ProfilingMiddleware runs cProfile on a random PROFILING_SAMPLE_RATE share
+# of requests, and on any request whose X-Profile header matches
+# PROFILING_TOKEN. Dumps land in PROFILING_DIR as <url_name>.*.prof;
+# `manage.py profile_report` ranks hot functions across them.
+
+PROFILING_DIR = Path(os.getenv("DJANGO_PROFILING_DIR", BASE_DIR / ".profiles"))
+PROFILING_SAMPLE_RATE = float(os.getenv("DJANGO_PROFILING_SAMPLE_RATE", "0"))
+PROFILING_TOKEN = os.getenv("DJANGO_PROFILING_TOKEN", "")
+
+
+# Metrics
+# Every worker process snapshots its counters and histograms into
+# METRICS_DIR; /metrics sums them in the Prometheus text format. Point
+# METRICS_DIR at a directory shared by all workers of one server and empty
+# it on deploy. /metrics answers 404 until METRICS_TOKEN is set, and then
+# scrapes must send it as a bearer token.
+
+METRICS_DIR = Path(os.getenv("DJANGO_METRICS_DIR", BASE_DIR / ".metrics"))
+METRICS_FLUSH_INTERVAL = float(os.getenv("DJANGO_METRICS_FLUSH_INTERVAL", "1.0"))
+METRICS_TOKEN = os.getenv("DJANGO_METRICS_TOKEN", "")
+
+
+# Change log
+# Every write to a listing, bid or order appends a numbered entry to its
+# region's change log (home.changelog). GET /changes?after=<seq>&region=
+# returns the entries that follow, as JSON lines, at most
+# CHANGE_FEED_PAGE_SIZE per request; it answers 404 until CHANGE_FEED_TOKEN
+# is set and then requires it as a bearer token. `manage.py
+# compact_change_log` drops superseded entries older than
+# CHANGE_LOG_COMPACT_AFTER_DAYS, so consumers must not fall further behind.
+
+CHANGE_FEED_TOKEN = os.getenv("DJANGO_CHANGE_FEED_TOKEN", "")
+CHANGE_FEED_PAGE_SIZE = int(os.getenv("DJANGO_CHANGE_FEED_PAGE_SIZE", "1000"))
+CHANGE_LOG_COMPACT_AFTER_DAYS = int(os.getenv("DJANGO_CHANGE_LOG_COMPACT_AFTER_DAYS", "30"))
+
+
+# Batch booking
+# POST /buyer/bookings/batch/ books up to BATCH_BOOKING_MAX_ITEMS listings
+# for one pickup in a single transaction (home.booking.book_listings).
+
+BATCH_BOOKING_MAX_ITEMS = int(os.getenv("DJANGO_BATCH_BOOKING_MAX_ITEMS", "50"))
@@ -0,0 +1,15 @@
+"""
+Settings for `manage.py test`: the production settings plus the "north" and
+"south" region databases, so the sharding tests can turn routing on with
+override_settings.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES
+
+for _alias in ('north', 'south'):
+    DATABASES.setdefault(_alias, {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / f'db_{_alias}.sqlite3',
+        'TEST': {'NAME': BASE_DIR / f'test_db_{_alias}.sqlite3'},
+    })